@@ -0,0 +1,236 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Lookups move an entry to the most recently used end, inserts evict from the
+    least recently used end once ``maxsize`` is reached. Counters for hits,
+    misses, evictions and expirations are kept so they can be reported.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (value, expires_at)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SharedCache:
+    """TTL cache in a SQLite table, shared by every process that opens the same file.
+
+    Keys and values are stored as JSON, so both must be JSON serializable
+    (tuples come back as lists). In WAL mode a lookup is a primary key read that
+    never waits on writers, and a value one worker sets is visible to the others
+    as soon as it commits. Expired rows are deleted every ``prune_every`` sets.
+
+    Lookups run on the event loop, so a lock held by another process is only
+    waited on for ``busy_timeout`` seconds; after that a get counts as a miss
+    and a set is dropped (both are counted in ``errors``).
+    """
+
+    def __init__(self, path: str, table: str = "shared_cache", ttl: float = 3600.0,
+                 prune_every: int = 1000, busy_timeout: float = 0.05, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._clock = clock
+        self._lock = Lock()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+                    (json.dumps(key), self._clock()),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                self.errors += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        encoded = json.dumps(value)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (json.dumps(key), encoded, expires_at),
+                )
+                self._sets += 1
+                if self._sets % self.prune_every == 0:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (self._clock(),))
+            except sqlite3.OperationalError:
+                # Another worker holds the write lock; the value is still in this process's tier
+                self.errors += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self.get(key, _MISSING)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (json.dumps(key),))
+        return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """An in-process TTLCache in front of a SharedCache
+
+    Hits in the local tier cost nothing extra; local misses are looked up in
+    the shared tier (and copied into the local one), so anything one worker
+    process generated is a hit in all the others. Sets go to both tiers.
+    """
+
+    def __init__(self, local: TTLCache, shared: SharedCache):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        self.local.pop(key)
+        return self.shared.pop(key, default)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.shared.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def stats(self) -> Dict[str, Any]:
+        local, shared = self.local.stats(), self.shared.stats()
+        hits = local["hits"] + shared["hits"]
+        lookups = local["hits"] + local["misses"]
+        return {
+            "size": local["size"],
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "local": local,
+            "shared": shared,
+        }
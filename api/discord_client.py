@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .metrics import span
+
+if TYPE_CHECKING:
+    import aiohttp
+
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v10")
+
+
+class _Bucket:
+    """Rate limit state for one Discord bucket (per route and webhook)"""
+    __slots__ = ("lock", "remaining", "reset_at", "last_used")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.last_used = time.monotonic()
+
+
+class DiscordWebhookClient:
+    """Async client for interaction follow-up webhooks.
+
+    One aiohttp session (and its keep-alive connection pool) is shared by every
+    send. Discord's per-route rate limit headers are tracked per bucket: a send
+    whose bucket is exhausted waits for the reset instead of failing, and 429
+    responses are retried after ``retry_after``. Requests to the same bucket are
+    sent one at a time in the order they were queued.
+
+    Webhook buckets are per interaction token, and a token is only valid for
+    15 minutes, so buckets left idle for ``bucket_ttl`` seconds are dropped
+    (along with the token in their key) instead of piling up.
+    """
+
+    def __init__(self, base_url: str = DISCORD_API_BASE, max_connections: int = 50,
+                 timeout: float = 10.0, max_retries: int = 5, bucket_ttl: float = 900.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._route_buckets: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._global_reset_at = 0.0
+        self.bucket_ttl = bucket_ttl
+        self._next_sweep = time.monotonic() + bucket_ttl
+        self.sent = 0
+        self.rate_limited = 0
+        self.evicted = 0
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            # Imported here so processes that never send a follow-up don't pay for it at startup
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def send_follow_up(self, app_id: str, token: str, message_data: Dict[str, Any],
+                             wait: bool = False) -> Optional[Dict[str, Any]]:
+        """Send a follow-up message. With ``wait=True`` Discord returns the created message"""
+        params = {"wait": "true"} if wait else None
+        return await self.request("POST", f"/webhooks/{app_id}/{token}", "POST /webhooks/{id}/{token}",
+                                  major=app_id + token, json=message_data, params=params)
+
+    async def edit_message(self, app_id: str, token: str, message_id: str,
+                           message_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Edit a message sent through the webhook ("@original" edits the interaction response)"""
+        return await self.request("PATCH", f"/webhooks/{app_id}/{token}/messages/{message_id}",
+                                  "PATCH /webhooks/{id}/{token}/messages/{message_id}",
+                                  major=app_id + token, json=message_data)
+
+    async def request(self, method: str, path: str, route: str, major: str = "",
+                      json: Any = None, params: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        # Includes time spent waiting out rate limits, that is part of what the user waits for
+        with span("discord_post"):
+            return await self._request(method, path, route, major, json, params)
+
+    async def _request(self, method: str, path: str, route: str, major: str,
+                       json: Any, params: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        session = await self._get_session()
+        bucket = self._get_bucket(route, major)
+
+        async with bucket.lock:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_capacity(bucket)
+
+                async with session.request(method, self.base_url + path, json=json, params=params) as response:
+                    self._update_bucket(route, major, bucket, response.headers)
+
+                    if response.status == 429:
+                        self.rate_limited += 1
+                        retry_after = await self._retry_after(response)
+                        if response.headers.get("X-RateLimit-Global", "").lower() == "true":
+                            self._global_reset_at = time.monotonic() + retry_after
+                        else:
+                            bucket.remaining = 0
+                            bucket.reset_at = time.monotonic() + retry_after
+                        continue
+
+                    response.raise_for_status()
+                    self.sent += 1
+                    if response.status == 204:
+                        return None
+                    return await response.json(content_type=None)
+
+        raise RuntimeError(f"Gave up on {method} {route} after {self.max_retries} rate limited retries")
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "rate_limited": self.rate_limited, "buckets": len(self._buckets),
+                "evicted": self.evicted}
+
+    def _get_bucket(self, route: str, major: str) -> _Bucket:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._evict_idle(now)
+        # Until Discord tells us the bucket hash for a route, the route itself is the key
+        key = (self._route_buckets.get(route, route), major)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        bucket.last_used = now
+        return bucket
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop buckets nobody has used for bucket_ttl, unless a send holds them or they are still limited"""
+        self._next_sweep = now + min(self.bucket_ttl, 60.0)
+        idle = [key for key, bucket in self._buckets.items()
+                if now - bucket.last_used > self.bucket_ttl and not bucket.lock.locked() and bucket.reset_at <= now]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+
+    def _update_bucket(self, route: str, major: str, bucket: _Bucket, headers) -> None:
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash and self._route_buckets.get(route) != bucket_hash:
+            self._route_buckets[route] = bucket_hash
+            self._buckets.setdefault((bucket_hash, major), bucket)
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None:
+            bucket.remaining = int(remaining)
+        if reset_after is not None:
+            bucket.reset_at = time.monotonic() + float(reset_after)
+
+    async def _wait_for_capacity(self, bucket: _Bucket) -> None:
+        now = time.monotonic()
+        if self._global_reset_at > now:
+            await asyncio.sleep(self._global_reset_at - now)
+            now = time.monotonic()
+        if bucket.remaining == 0 and bucket.reset_at > now:
+            await asyncio.sleep(bucket.reset_at - now)
+        if bucket.reset_at <= time.monotonic():
+            bucket.remaining = None
+
+    @staticmethod
+    async def _retry_after(response: "aiohttp.ClientResponse") -> float:
+        try:
+            body = await response.json(content_type=None)
+            return float(body.get("retry_after", 1.0))
+        except Exception:
+            return float(response.headers.get("Retry-After", 1.0))
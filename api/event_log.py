@@ -0,0 +1,266 @@
+import json
+import os
+import struct
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+# Each record is a 4-byte big-endian payload length followed by the JSON payload
+_HEADER = struct.Struct(">I")
+_SEGMENT_SUFFIX = ".log"
+
+
+def _segment_name(base_offset: int) -> str:
+    return f"{base_offset:020d}{_SEGMENT_SUFFIX}"
+
+
+class EventLog:
+    """Embedded, append-only event log for one topic (a directory of segment files).
+
+    Works like a single Kafka partition without the broker:
+
+    * ``append`` gives every event the next offset and buffers it. It returns
+      right away, so the request path never waits on disk.
+    * A background thread writes whatever has accumulated every
+      ``flush_interval`` seconds with one write and one fsync (group commit).
+      ``sync`` blocks until an offset is durable.
+    * Files are rolled into a new segment, named after its first offset, once
+      they grow past ``segment_bytes``.
+    * Consumers only ever see events that have been written out.
+    * At most ``max_pending`` events wait for a commit. If the writer falls
+      that far behind, or a write or fsync fails (which stops the writer),
+      ``append`` and ``sync`` raise instead of buffering or waiting forever.
+
+    A Kafka-backed implementation only needs to provide the same
+    append/sync/close and Consumer.poll/commit methods.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 flush_interval: float = 0.005, fsync: bool = True, max_pending: int = 100_000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_pending = max_pending
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = sorted(
+            int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(_SEGMENT_SUFFIX)
+        ) or [0]
+        self._next_offset = self._recover(self._segments[-1])
+        self._durable_offset = self._next_offset
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+
+        self._lock = threading.Lock()
+        self._has_data = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._pending: List[bytes] = []
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self.batches = 0
+        self._thread = threading.Thread(target=self._flush_loop, name=f"event-log-{os.path.basename(directory)}", daemon=True)
+        self._thread.start()
+
+    @property
+    def next_offset(self) -> int:
+        return self._next_offset
+
+    @property
+    def durable_offset(self) -> int:
+        """Offsets below this have been written (and fsynced) to disk"""
+        return self._durable_offset
+
+    def append(self, event: Any) -> int:
+        """Buffer an event for the next group commit and return its offset"""
+        data = json.dumps(event, separators=(",", ":")).encode()
+        record = _HEADER.pack(len(data)) + data
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Event log is closed")
+            self._raise_if_failed()
+            if len(self._pending) >= self.max_pending:
+                raise RuntimeError(f"Event log has {len(self._pending)} events waiting to be written")
+            offset = self._next_offset
+            self._next_offset += 1
+            self._pending.append(record)
+            if len(self._pending) == 1:
+                self._has_data.notify()
+        return offset
+
+    def sync(self, offset: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until ``offset`` (default: everything appended so far) is durable"""
+        with self._lock:
+            target = self._next_offset if offset is None else offset + 1
+            durable = self._durable.wait_for(lambda: self._durable_offset >= target or self._error is not None, timeout)
+            if self._durable_offset < target:
+                self._raise_if_failed()
+            return durable
+
+    def segments(self) -> List[int]:
+        with self._lock:
+            return list(self._segments)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._has_data.notify()
+        self._thread.join()
+        self._file.close()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Event log writer for {self.directory} stopped: {self._error}") from self._error
+
+    def _segment_path(self, base_offset: int) -> str:
+        return os.path.join(self.directory, _segment_name(base_offset))
+
+    def _recover(self, base_offset: int) -> int:
+        """Count the records in the last segment and cut off a torn write at the end"""
+        path = self._segment_path(base_offset)
+        count, good_end = 0, 0
+        if os.path.exists(path):
+            with open(path, "rb") as segment:
+                while True:
+                    header = segment.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    (length,) = _HEADER.unpack(header)
+                    if len(segment.read(length)) < length:
+                        break
+                    count += 1
+                    good_end = segment.tell()
+            if good_end < os.path.getsize(path):
+                with open(path, "r+b") as segment:
+                    segment.truncate(good_end)
+        return base_offset + count
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._has_data.wait()
+                if self._closed and not self._pending:
+                    return
+            # Give concurrent appenders a moment to join this group commit
+            if not self._closed:
+                time.sleep(self.flush_interval)
+
+            with self._lock:
+                batch, self._pending = self._pending, []
+                first_offset = self._durable_offset
+                end_offset = self._next_offset
+
+            try:
+                if self._file.tell() >= self.segment_bytes:
+                    self._roll(first_offset)
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except Exception as e:
+                # The file may now end in a torn record (cut off on the next open), so stop
+                # writing; appenders and waiters see the error instead of hanging
+                with self._lock:
+                    self._error = e
+                    self._pending = []
+                    self._durable.notify_all()
+                return
+
+            with self._lock:
+                self._durable_offset = end_offset
+                self.batches += 1
+                self._durable.notify_all()
+
+    def _roll(self, base_offset: int) -> None:
+        self._file.close()
+        self._file = open(self._segment_path(base_offset), "ab")
+        with self._lock:
+            self._segments.append(base_offset)
+
+
+class Consumer:
+    """Reads a topic from a committed offset onward; one offset file per consumer group"""
+
+    def __init__(self, log: EventLog, group: str):
+        self.log = log
+        self.group = group
+        self._offset_path = os.path.join(log.directory, "offsets", f"{group}.offset")
+        os.makedirs(os.path.dirname(self._offset_path), exist_ok=True)
+        self.offset = self._load_offset()
+        self._committed = self.offset
+        self._file = None
+        self._file_offset = None  # offset of the next record at the file's current position
+
+    def poll(self, max_records: int = 1000) -> List[Tuple[int, Any]]:
+        """Return up to ``max_records`` (offset, event) pairs past the current position"""
+        end = self.log.durable_offset
+        records = []
+        while self.offset < end and len(records) < max_records:
+            if self._file is None or self._file_offset != self.offset:
+                self._seek(self.offset)
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                # End of this segment; the next record lives in the next one
+                self._open_segment(self.offset)
+                if self._file_offset != self.offset:
+                    raise RuntimeError(f"Record {self.offset} is missing from {self.log.directory}")
+                continue
+            (length,) = _HEADER.unpack(header)
+            records.append((self.offset, json.loads(self._file.read(length))))
+            self.offset += 1
+            self._file_offset = self.offset
+        return records
+
+    def commit(self, offset: Optional[int] = None) -> None:
+        """Remember that everything before ``offset`` (default: the current position) is processed"""
+        offset = self.offset if offset is None else offset
+        if offset == self._committed:
+            return
+        tmp_path = self._offset_path + ".tmp"
+        with open(tmp_path, "w") as offset_file:
+            offset_file.write(str(offset))
+        os.replace(tmp_path, self._offset_path)
+        self._committed = offset
+
+    def seek(self, offset: int) -> None:
+        self.offset = offset
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def lag(self) -> int:
+        return self.log.durable_offset - self.offset
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self._offset_path) as offset_file:
+                return int(offset_file.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _open_segment(self, offset: int) -> None:
+        bases = [base for base in self.log.segments() if base <= offset]
+        if not bases:
+            raise ValueError(f"Offset {offset} is before the start of the log")
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.log.directory, _segment_name(bases[-1])), "rb")
+        self._file_offset = bases[-1]
+
+    def _seek(self, offset: int) -> None:
+        """Position the file at ``offset`` by skipping record headers from the segment start"""
+        self._open_segment(offset)
+        while self._file_offset < offset:
+            header = self._file.read(_HEADER.size)
+            (length,) = _HEADER.unpack(header)
+            self._file.seek(length, os.SEEK_CUR)
+            self._file_offset += 1
+
+
+def open_topic(root: str, topic: str, **kwargs) -> EventLog:
+    """Open (or create) the event log for ``topic`` under ``root``"""
+    return EventLog(os.path.join(root, topic), **kwargs)
@@ -0,0 +1,189 @@
+import asyncio
+import base64
+import logging
+import sqlite3
+import time
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+def encode_cursor(favorite_id: int) -> str:
+    """Opaque pagination cursor for the favorite row a page ended on"""
+    return base64.urlsafe_b64encode(f"fav:{favorite_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of encode_cursor; raises ValueError for cursors we didn't make"""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, favorite_id = text.split(":")
+        if prefix != "fav":
+            raise ValueError
+        return int(favorite_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+class FavoritesStore:
+    """Persistent user favorites in SQLite (WAL mode).
+
+    Only (user_id, recipe_id) references are stored; the recipe itself lives in
+    the recipe store. A unique index on (user_id, recipe_id) makes duplicate
+    checks an index lookup, and a (user_id, id) index serves a user's list in
+    insertion order without scanning other users' rows.
+
+    ``add`` is meant for bursty reaction traffic: adds are queued and written
+    in one transaction per batch instead of one commit each.
+    """
+
+    def __init__(self, path: str = "recipes.db", batch_size: int = 256, batch_interval: float = 0.005):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS favorites (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                recipe_id INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS favorites_user_recipe ON favorites (user_id, recipe_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS favorites_user_order ON favorites (user_id, id)")
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self.batches = 0
+
+    async def add(self, user_id: str, recipe_id: int) -> bool:
+        """Queue a favorite for the next batch; returns False if the user already had it"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((user_id, recipe_id, future))
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.batch_interval)
+        return await future
+
+    def add_many(self, rows: Iterable[Tuple[str, int]]) -> int:
+        """Insert many (user_id, recipe_id) pairs in one transaction, returns how many were new"""
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO favorites (user_id, recipe_id, created_at) VALUES (?, ?, ?)",
+                    ((user_id, recipe_id, now) for user_id, recipe_id in rows),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def recipe_ids(self, user_id: str) -> List[int]:
+        """A user's favorite recipe IDs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT recipe_id FROM favorites WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def page(self, user_id: str, limit: int = 20, after: Optional[str] = None) -> Tuple[List[int], Optional[str]]:
+        """One page of a user's favorite recipe IDs, oldest first, and the cursor for the next page
+
+        Keyset pagination on the (user_id, id) index: every page is one index
+        range scan of ``limit`` rows, no matter how deep into the list it is.
+        """
+        after_id = decode_cursor(after) if after else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, recipe_id FROM favorites WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, after_id, limit + 1),
+            ).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return [row[1] for row in rows[:limit]], next_cursor
+
+    def contains(self, user_id: str, recipe_id: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM favorites WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id)
+            ).fetchone()
+        return row is not None
+
+    def count(self, user_id: Optional[str] = None) -> int:
+        with self._lock:
+            if user_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM favorites").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM favorites WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    async def flush(self) -> None:
+        """Write every queued favorite now"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        await self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        task = asyncio.ensure_future(self._flush())
+        # Keep a reference so the task isn't garbage collected while it runs
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task) -> None:
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Error flushing favorites: %s", task.exception(), extra={"event": "favorites_flush_failed"})
+
+    async def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            # The commit (and its fsync) happens off the event loop
+            results = await asyncio.to_thread(self._write_batch, [(user_id, recipe_id) for user_id, recipe_id, _ in batch])
+        except Exception as e:
+            log.error("Error writing %d favorites: %s", len(batch), e, extra={"event": "favorites_flush_failed"})
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), added in zip(batch, results):
+            if not future.done():
+                future.set_result(added)
+
+    def _write_batch(self, rows: List[Tuple[str, int]]) -> List[bool]:
+        now = time.time()
+        results = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for user_id, recipe_id in rows:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO favorites (user_id, recipe_id, created_at) VALUES (?, ?, ?)",
+                        (user_id, recipe_id, now),
+                    )
+                    results.append(cursor.rowcount == 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.batches += 1
+        return results
@@ -0,0 +1,176 @@
+import math
+import re
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .ingredients import normalize_ingredient, singularize
+from .models import missing_ingredient_names
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+class IndexMatch(NamedTuple):
+    recipe_id: int
+    used: int  # how many of the query's ingredients the recipe uses
+    missed: List[str]  # ingredients the recipe needs that weren't in the query
+
+
+def _bitset(docs: Iterable[int], size: int) -> int:
+    """Build an int with bit n set for every doc n, in one pass instead of one OR per doc"""
+    buffer = bytearray((size + 7) // 8)
+    for doc in docs:
+        buffer[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def recipe_ingredients(recipe: Dict, query: Sequence[str]) -> List[str]:
+    """The ingredients a search result is known to use: query ingredients its title names, plus the missed ones
+
+    Search results only say *how many* of the query's ingredients a recipe uses,
+    not which, so the rest are not guessed. The index may then under-count what
+    a recipe uses, but it never claims an ingredient the recipe doesn't name.
+    """
+    words = [singularize(word) for word in _WORD_PATTERN.findall((recipe.get("title") or "").lower())]
+    title = f" {' '.join(words)} "
+    used = [item for item in query if item and f" {item} " in title]
+    missed = [normalize_ingredient(name) for name in missing_ingredient_names(recipe)]
+    return sorted(set(used) | set(missed))
+
+
+class IngredientIndex:
+    """In-memory inverted index from normalized ingredient to the recipes that use it.
+
+    Recipes get dense document numbers and every posting list is a bitset (a
+    Python int, bit n = document n), so a query is a handful of big-int AND/XOR
+    operations instead of a scan:
+
+    * the query's posting lists are added up bit-sliced, giving for every
+      recipe how many of the query ingredients it uses
+    * recipes are ranked by used ingredients (most first), then by missed
+      ingredients (fewest first), using one bitset per recipe size, so only
+      the returned matches are ever decoded
+
+    ``add`` updates the index in place; a recipe that is added again gets a new
+    document number and the old one is masked out until the next ``rebuild``.
+    Searches can run on worker threads while the event loop adds recipes, so
+    reads and writes hold a lock.
+    """
+
+    def __init__(self):
+        self._recipe_ids: List[int] = []  # document -> recipe ID
+        self._ingredients: List[Tuple[str, ...]] = []  # document -> its ingredients
+        self._docs: Dict[int, int] = {}  # recipe ID -> live document
+        self._postings: Dict[str, int] = {}  # ingredient -> bitset of documents
+        self._sizes: Dict[int, int] = {}  # ingredient count -> bitset of documents
+        self._size_order: List[int] = []
+        self._alive = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def rebuild(self, rows: Iterable[Tuple[int, Iterable[str]]]) -> None:
+        """Replace the whole index with (recipe_id, ingredients) rows, dropping stale documents"""
+        latest = {recipe_id: self._normalize(ingredients) for recipe_id, ingredients in rows}
+        with self._lock:
+            self._recipe_ids = list(latest)
+            self._ingredients = list(latest.values())
+            self._docs = {recipe_id: doc for doc, recipe_id in enumerate(self._recipe_ids)}
+
+            postings, sizes = defaultdict(list), defaultdict(list)
+            for doc, ingredients in enumerate(self._ingredients):
+                sizes[len(ingredients)].append(doc)
+                for ingredient in ingredients:
+                    postings[ingredient].append(doc)
+            count = len(self._recipe_ids)
+            self._postings = {ingredient: _bitset(docs, count) for ingredient, docs in postings.items()}
+            self._sizes = {size: _bitset(docs, count) for size, docs in sizes.items()}
+            self._size_order = sorted(self._sizes)
+            self._alive = (1 << count) - 1
+
+    def add(self, recipe_id: int, ingredients: Iterable[str]) -> None:
+        """Index one recipe, replacing what was indexed for it before"""
+        ingredients = self._normalize(ingredients)
+        with self._lock:
+            old = self._docs.get(recipe_id)
+            if old is not None:
+                if self._ingredients[old] == ingredients:
+                    return
+                self._alive &= ~(1 << old)
+
+            doc = len(self._recipe_ids)
+            bit = 1 << doc
+            self._recipe_ids.append(recipe_id)
+            self._ingredients.append(ingredients)
+            self._docs[recipe_id] = doc
+            self._alive |= bit
+            for ingredient in ingredients:
+                self._postings[ingredient] = self._postings.get(ingredient, 0) | bit
+            size = len(ingredients)
+            if size not in self._sizes:
+                self._size_order = sorted(self._size_order + [size])
+            self._sizes[size] = self._sizes.get(size, 0) | bit
+
+    def remove(self, recipe_id: int) -> None:
+        with self._lock:
+            doc = self._docs.pop(recipe_id, None)
+            if doc is not None:
+                self._alive &= ~(1 << doc)
+
+    def search(self, ingredients: Iterable[str], limit: int = 5, min_coverage: float = 1.0) -> List[IndexMatch]:
+        """The best ``limit`` recipes that use at least ``min_coverage`` of these ingredients"""
+        query = set(self._normalize(ingredients))
+        if not query or limit <= 0:
+            return []
+        needed = max(1, math.ceil(min_coverage * len(query) - 1e-9))
+        if needed > len(query):
+            return []
+
+        with self._lock:
+            # Bit-sliced counter: planes[i] holds bit i of each document's match count
+            planes: List[int] = []
+            for ingredient in query:
+                carry = self._postings.get(ingredient, 0)
+                for i in range(len(planes)):
+                    if not carry:
+                        break
+                    planes[i], carry = planes[i] ^ carry, planes[i] & carry
+                if carry:
+                    planes.append(carry)
+
+            matches: List[IndexMatch] = []
+            for used in range(len(query), needed - 1, -1):
+                if used >> len(planes):
+                    continue
+                tier = self._alive
+                for i, plane in enumerate(planes):
+                    tier &= plane if used >> i & 1 else ~plane
+                if not tier:
+                    continue
+                for size in self._size_order:
+                    if size < used:
+                        continue
+                    candidates = tier & self._sizes[size]
+                    while candidates:
+                        lowest = candidates & -candidates
+                        candidates ^= lowest
+                        doc = lowest.bit_length() - 1
+                        missed = [item for item in self._ingredients[doc] if item not in query]
+                        matches.append(IndexMatch(self._recipe_ids[doc], used, missed))
+                        if len(matches) >= limit:
+                            return matches
+            return matches
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recipes": len(self._docs),
+            "documents": len(self._recipe_ids),
+            "ingredients": len(self._postings),
+        }
+
+    @staticmethod
+    def _normalize(ingredients: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        normalized = {normalize_ingredient(item) for item in ingredients or []}
+        normalized.discard("")
+        return tuple(sorted(normalized))
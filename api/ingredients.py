@@ -0,0 +1,45 @@
+import re
+from typing import List
+
+# Words that end in "s" but are already singular (or have no useful singular form)
+_SINGULAR_EXCEPTIONS = {"asparagus", "couscous", "hummus", "molasses", "swiss", "brussels"}
+
+_SPLIT_PATTERN = re.compile(r"[,;\n]+")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def singularize(word: str) -> str:
+    """Fold simple English plurals so "tomatoes" and "tomato" match"""
+    if len(word) <= 3 or word in _SINGULAR_EXCEPTIONS:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "xes", "sses", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(ingredient: str) -> str:
+    """Lowercase, trim, collapse spaces and singularize the last word"""
+    ingredient = _SPACE_PATTERN.sub(" ", ingredient.strip().lower())
+    if not ingredient:
+        return ""
+    words = ingredient.split(" ")
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+def parse_ingredients(ingredients: str) -> List[str]:
+    """Split a user supplied ingredient string into a sorted, de-duplicated list"""
+    normalized = {normalize_ingredient(part) for part in _SPLIT_PATTERN.split(ingredients or "")}
+    normalized.discard("")
+    return sorted(normalized)
+
+
+def canonical_key(ingredients: str) -> str:
+    """Canonical form of an ingredient list: "Chicken, rice" and "rice,chicken" give the same key"""
+    return ",".join(parse_ingredients(ingredients))
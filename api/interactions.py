@@ -0,0 +1,116 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import nacl.signing
+import nacl.exceptions
+
+from .metrics import span
+
+# Discord interaction types
+PING = 1
+APPLICATION_COMMAND = 2
+
+# Pre-serialized responses that never change, so we don't re-encode them per request
+PONG_RESPONSE = b'{"type":1}'
+DEFERRED_RESPONSE = b'{"type":5}'
+
+
+class InvalidSignature(Exception):
+    """Raised when a request is missing or fails the Ed25519 signature check"""
+
+
+@dataclass
+class CommandOption:
+    name: str
+    value: Any = None
+
+
+@dataclass
+class Interaction:
+    """Typed view of a Discord interaction payload, decoded once from the raw body"""
+    type: int
+    id: Optional[str] = None
+    application_id: Optional[str] = None
+    token: Optional[str] = None
+    guild_id: Optional[str] = None
+    command_name: Optional[str] = None
+    options: List[CommandOption] = field(default_factory=list)
+    user_id: str = "unknown"
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Interaction":
+        command = data.get("data") or {}
+        options = [
+            CommandOption(name=option.get("name"), value=option.get("value"))
+            for option in command.get("options") or []
+        ]
+
+        # Guild interactions carry the user under "member", DMs carry it directly
+        user = (data.get("member") or {}).get("user") or data.get("user") or {}
+
+        return cls(
+            type=data.get("type"),
+            id=data.get("id"),
+            application_id=data.get("application_id"),
+            token=data.get("token"),
+            guild_id=data.get("guild_id"),
+            command_name=command.get("name"),
+            options=options,
+            user_id=user.get("id", "unknown"),
+            raw=data,
+        )
+
+    def option(self, name: str, default: Any = None) -> Any:
+        """Return the value of a slash command option by name"""
+        for option in self.options:
+            if option.name == name:
+                return option.value
+        return default
+
+
+class InteractionVerifier:
+    """Verifies Discord request signatures with a key that is built only once.
+
+    Building a ``VerifyKey`` from hex on every request is wasted work, so the
+    key is decoded when the verifier is created and reused for every call.
+    """
+
+    def __init__(self, public_key_hex: Optional[str]):
+        self._verify_key = None
+        if public_key_hex:
+            self._verify_key = nacl.signing.VerifyKey(bytes.fromhex(public_key_hex))
+
+    @property
+    def configured(self) -> bool:
+        return self._verify_key is not None
+
+    def verify(self, signature: Optional[str], timestamp: Optional[str], body: bytes) -> None:
+        """Check the signature against the raw request bytes"""
+        if not signature or not timestamp:
+            raise InvalidSignature("Missing signature or timestamp")
+        if self._verify_key is None:
+            raise RuntimeError("DISCORD_PUBLIC_KEY is not configured")
+
+        try:
+            self._verify_key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+        except (nacl.exceptions.BadSignatureError, ValueError) as e:
+            # ValueError covers signatures that aren't valid hex or have the wrong length
+            raise InvalidSignature(str(e) or "Invalid request signature")
+
+    def verify_and_decode(self, signature: Optional[str], timestamp: Optional[str], body: bytes) -> Interaction:
+        """Verify the raw body and decode it exactly once into an Interaction"""
+        with span("verify"):
+            self.verify(signature, timestamp, body)
+        with span("decode"):
+            return Interaction.from_dict(json.loads(body))
+
+    async def verify_request(self, request) -> Interaction:
+        """Read the body of a Starlette request once, verify it and decode it"""
+        body = await request.body()
+        return self.verify_and_decode(
+            request.headers.get("X-Signature-Ed25519"),
+            request.headers.get("X-Signature-Timestamp"),
+            body,
+        )
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .metrics import observe
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the queue is at its depth limit and new work should be shed"""
+
+
+@dataclass
+class Job:
+    kind: str
+    payload: Dict[str, Any]
+    guild_id: str = "direct"
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class JobQueue:
+    """Bounded worker pool for background work such as recipe generation.
+
+    * At most ``workers`` jobs run at once; everything else waits in the queue.
+    * Waiting jobs are kept per guild and served round-robin, so one busy guild
+      can't starve the others.
+    * ``submit`` raises QueueFull once ``max_depth`` jobs are waiting, so the
+      caller can shed load with a quick reply instead of piling up work.
+    * Every job is written to an append-only journal when it is queued and
+      again when it finishes. On start, unfinished jobs younger than
+      ``max_age`` seconds are queued again. Discord interaction tokens expire
+      after 15 minutes, so older jobs are dropped.
+    * Writes are fsynced in groups: the first write after a sync schedules
+      the next one ``fsync_delay`` seconds later, on a worker thread.
+    * After ``compact_every`` finished jobs the journal is rewritten with only
+      the unfinished jobs still within ``max_age``, so it stays small and
+      expired interaction tokens don't linger on disk.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[..., Awaitable[Any]]], workers: int = 8,
+                 max_depth: int = 200, journal_path: Optional[str] = None, max_age: float = 14 * 60,
+                 compact_every: int = 500, fsync_delay: float = 0.01):
+        self.handlers = handlers
+        self.workers = workers
+        self.max_depth = max_depth
+        self.journal_path = journal_path
+        self.max_age = max_age
+        self.compact_every = compact_every
+        self.fsync_delay = fsync_delay
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._depth = 0
+        self._ready: Optional[asyncio.Condition] = None
+        self._tasks = []
+        self._journal = None
+        # Held while the journal file is synced off the loop, or closed and swapped on it
+        self._journal_lock = threading.Lock()
+        self._journaled: Dict[str, Job] = {}  # queued or running jobs the journal holds
+        self._done_since_compact = 0
+        self._sync_pending = False
+        self._notify_tasks = set()
+        self._running = False
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.shed = 0
+        self.resumed = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._ready = asyncio.Condition()
+        self._running = True
+        if self.journal_path:
+            pending = self._replay_journal()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journaled = {job.id: job for job in pending}
+            for job in pending:
+                self._push(job)
+            self.resumed = len(pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let running jobs finish (up to ``timeout``), then stop the workers
+
+        Jobs still waiting stay in the journal and are resumed on the next start.
+        """
+        self._running = False
+        if self._ready is not None:
+            async with self._ready:
+                self._ready.notify_all()
+        if self._tasks:
+            done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        if self._journal is not None:
+            with self._journal_lock:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+
+    def submit(self, kind: str, payload: Dict[str, Any], guild_id: Optional[str] = None) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for job kind {kind!r}")
+        if self._depth >= self.max_depth:
+            self.shed += 1
+            raise QueueFull(f"{self._depth} jobs already waiting")
+
+        job = Job(kind=kind, payload=payload, guild_id=guild_id or "direct")
+        if self._journal is not None:
+            self._journaled[job.id] = job
+        self._write_journal({"op": "enqueue", "job": asdict(job)})
+        self._push(job)
+        if self._ready is not None:
+            task = asyncio.ensure_future(self._notify())
+            # Keep a reference so the task isn't garbage collected before it runs
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_done)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.failed + self.in_progress
+        return {
+            "depth": self._depth,
+            "max_depth": self.max_depth,
+            "workers": self.workers,
+            "in_progress": self.in_progress,
+            "guilds_waiting": len(self._queues),
+            "completed": self.completed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "resumed": self.resumed,
+            "wait_time_avg": self.wait_time_total / started if started else 0.0,
+            "wait_time_max": self.wait_time_max,
+        }
+
+    def _push(self, job: Job) -> None:
+        queue = self._queues.get(job.guild_id)
+        if queue is None:
+            queue = self._queues[job.guild_id] = deque()
+        queue.append(job)
+        self._depth += 1
+
+    def _pop(self) -> Optional[Job]:
+        """Take the next job from the guild at the front, then send that guild to the back"""
+        if not self._queues:
+            return None
+        guild_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(guild_id)
+        else:
+            del self._queues[guild_id]
+        self._depth -= 1
+        return job
+
+    async def _notify(self) -> None:
+        async with self._ready:
+            self._ready.notify()
+
+    def _notify_done(self, task: asyncio.Task) -> None:
+        self._notify_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Error waking a job worker: %s", task.exception(), extra={"event": "job_notify_failed"})
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._ready:
+                while self._running and not self._queues:
+                    await self._ready.wait()
+                if not self._running:
+                    return
+                job = self._pop()
+
+            wait_time = max(0.0, time.time() - job.enqueued_at)
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+            observe("queue_wait", wait_time)
+            self.in_progress += 1
+            try:
+                await self.handlers[job.kind](**job.payload)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # Cut off by shutdown: leave it unfinished in the journal so it is resumed
+                self.in_progress -= 1
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.error("Job %s (%s) failed: %s", job.id, job.kind, e, extra={"event": "job_failed"})
+            self.in_progress -= 1
+            self._finish_journal(job)
+
+    def _write_journal(self, record: Dict[str, Any]) -> None:
+        if self._journal is not None:
+            self._journal.write(json.dumps(record) + "\n")
+            self._journal.flush()
+            if not self._sync_pending:
+                self._sync_pending = True
+                asyncio.get_running_loop().call_later(self.fsync_delay, self._sync_journal)
+
+    def _sync_journal(self) -> None:
+        """One fsync for every write since the last one, off the event loop"""
+        self._sync_pending = False
+        if self._journal is not None:
+            asyncio.get_running_loop().run_in_executor(None, self._fsync_journal, self._journal)
+
+    def _fsync_journal(self, journal) -> None:
+        with self._journal_lock:
+            if journal is not self._journal:
+                # Compacted or closed since this sync was scheduled; the replacement was synced when written
+                return
+            try:
+                os.fsync(journal.fileno())
+            except OSError as e:
+                log.error("Error syncing the job journal: %s", e, extra={"event": "journal_sync_failed"})
+
+    def _finish_journal(self, job: Job) -> None:
+        if self._journal is None:
+            return
+        self._journaled.pop(job.id, None)
+        self._done_since_compact += 1
+        if self._done_since_compact < self.compact_every:
+            self._write_journal({"op": "done", "id": job.id})
+            return
+        # Rewrite rather than append: only unfinished jobs whose tokens are still valid are kept
+        cutoff = time.time() - self.max_age
+        self._journaled = {job_id: job for job_id, job in self._journaled.items() if job.enqueued_at >= cutoff}
+        with self._journal_lock:
+            self._journal.close()
+            self._compact(self._journaled.values())
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._done_since_compact = 0
+
+    def _compact(self, jobs) -> None:
+        """Swap in a journal holding only ``jobs`` in one atomic rename"""
+        compacted = self.journal_path + ".tmp"
+        with open(compacted, "w", encoding="utf-8") as journal:
+            for job in jobs:
+                journal.write(json.dumps({"op": "enqueue", "job": asdict(job)}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(compacted, self.journal_path)
+
+    def _replay_journal(self):
+        """Read back jobs that were queued but never finished, and compact the journal"""
+        if not os.path.exists(self.journal_path):
+            return []
+
+        pending: Dict[str, Job] = {}
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                if record.get("op") == "enqueue":
+                    job = Job(**record["job"])
+                    pending[job.id] = job
+                elif record.get("op") == "done":
+                    pending.pop(record.get("id"), None)
+
+        cutoff = time.time() - self.max_age
+        fresh = [job for job in pending.values() if job.enqueued_at >= cutoff and job.kind in self.handlers]
+
+        self._compact(fresh)
+        return fresh
+
@@ -0,0 +1,167 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+from typing import Any, Dict, Optional
+
+# LOG_LEVEL=DEBUG shows every interaction; INFO is meant for production
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for reading in a terminal, "json" (one object per line) for a log collector
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Records waiting for the writer thread; past this they are dropped rather than blocking a request
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Keep 1 in N records of noisy events, e.g. "interaction_received=100,follow_up_sent=10"
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "interaction_received=10,follow_up_sent=10")
+
+# Fields whose values never reach the log output
+REDACTED_FIELDS = {"token", "interaction_token", "api_key", "authorization", "signature"}
+REDACTED = "[redacted]"
+# Interaction tokens also travel inside webhook URLs (/webhooks/{app_id}/{token})
+_WEBHOOK_TOKEN = re.compile(r"(/webhooks/\d+/)[\w.-]+")
+_TOKEN_TEXT = re.compile(r"""(['"]?(?:token|api_key|authorization)['"]?\s*[:=]\s*['"]?)[^'",}\s]+""", re.IGNORECASE)
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DeferredQueueHandler"] = None
+_configure_lock = threading.Lock()
+
+
+def redact(value: Any) -> Any:
+    """Copy of ``value`` with secret fields and tokens in text replaced"""
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return _TOKEN_TEXT.sub(r"\1" + REDACTED, _WEBHOOK_TOKEN.sub(r"\1" + REDACTED, value))
+    return value
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats a record plus its ``extra=`` fields, with secrets redacted
+
+    Runs on the writer thread, so the %-formatting of the message, the JSON
+    encoding and the redaction never happen inside a request.
+    """
+
+    def __init__(self, as_json: bool = False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = redact(record.getMessage())
+        fields = redact(_fields(record))
+        if self.as_json:
+            entry = {
+                "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+                **fields,
+            }
+            if record.exc_info:
+                entry["exception"] = redact(self.formatException(record.exc_info))
+            return json.dumps(entry, default=str)
+
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + redact(self.formatException(record.exc_info))
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records for events listed in ``rates`` ({event: N}); others always pass"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {event: rate for event, rate in rates.items() if rate > 1}
+        self._counters = {event: itertools.count() for event in self.rates}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        counter = self._counters.get(event)
+        if counter is None:
+            return True
+        # Warnings and errors are never sampled away
+        return record.levelno >= logging.WARNING or next(counter) % self.rates[event] == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that hands records to the writer thread unformatted
+
+    The stock QueueHandler formats the message in the calling thread before
+    queueing it. Here the record goes on the queue as is (arguments are only
+    read later, so log immutable values) and a full queue drops the record.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(text: str) -> Dict[str, int]:
+    rates = {}
+    for part in text.split(","):
+        event, _, rate = part.partition("=")
+        if event.strip() and rate.strip():
+            rates[event.strip()] = int(rate)
+    return rates
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample: str = LOG_SAMPLE) -> None:
+    """Send all logging through one queue to a background writer thread (safe to call again)"""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler()
+        output.setFormatter(StructuredFormatter(as_json=fmt == "json"))
+
+        _queue_handler = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter(parse_sample_rates(sample)))
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Write out whatever is still queued and stop the writer thread"""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger().removeHandler(_queue_handler)
+            _listener = _queue_handler = None
+
+
+def logging_stats() -> Dict[str, int]:
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
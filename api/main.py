@@ -1,20 +1,47 @@
-from fastapi import FastAPI, HTTPException, Request, Response, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import os
 import asyncio
-from .recipe_client import search_recipes_by_ingredients, get_recipe_information
-from .recipe_client import mock_search_recipes, mock_recipe_information  # Import mock functions
-import nacl.signing
-import nacl.exceptions
+import time
+from .recipe_client import search_recipes_by_ingredients, get_recipe_information, cache_stats, coalescing_stats
+from .recipe_client import provider_stats, index_stats
+from .recipe_client import find_recipe_with_details, prefetch_recipe_details, stream_recipe
+from .recipe_client import recipe_store, RECIPE_DB_PATH, cached_recipe
+from .recipe_store import stable_recipe_id
+from .favorites_store import FavoritesStore
+from .jobs import JobQueue, QueueFull
+from .ratelimit import Admission, AdmissionControl, SharedTokenBucketLimiter, TokenBucketLimiter
+from .event_log import open_topic
+from .cache import TTLCache
+from .models import missing_ingredient_names
+from .interactions import InteractionVerifier, InvalidSignature, PING, APPLICATION_COMMAND
+from .interactions import PONG_RESPONSE, DEFERRED_RESPONSE
+from .discord_client import DiscordWebhookClient
+from .serve import slot_path
+from .metrics import add_collector, instrument_app, span
+from .logs import configure_logging, logging_stats
 from dotenv import load_dotenv
+import importlib
 import json
+import logging
+import math
+
+if TYPE_CHECKING:
+    from .meal_plan import MealPlanner
 
 # Load environment variables
 load_dotenv()
 
+# Log records are formatted and written on a background thread (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE)
+configure_logging()
+log = logging.getLogger(__name__)
+
 app = FastAPI()
 
+# Request timings plus GET /metrics for Prometheus (METRICS_ENABLED=false turns it off)
+instrument_app(app)
+
 # Define the request model
 class RecipeRequest(BaseModel):
     ingredients: str
@@ -23,65 +50,81 @@ class RecipeRequest(BaseModel):
 # Discord public key from the Developer Portal
 DISCORD_PUBLIC_KEY = os.getenv("DISCORD_PUBLIC_KEY")
 
-# Set this to True to use mock data for faster testing
-USE_MOCK_DATA = False
+# Build the signature verifier once at startup instead of on every request
+verifier = InteractionVerifier(DISCORD_PUBLIC_KEY)
+
+# Shared async client for follow-up messages (one keep-alive connection pool)
+webhook_client = DiscordWebhookClient()
+
+@app.on_event("shutdown")
+async def close_webhook_client():
+    await webhook_client.close()
+
+# Stream the recipe into the follow-up message as it is generated
+RECIPE_STREAMING = os.getenv("RECIPE_STREAMING", "false").lower() == "true"
+
+# Minimum seconds between edits of a streaming follow-up message
+STREAM_EDIT_INTERVAL = float(os.getenv("RECIPE_STREAM_EDIT_INTERVAL", "1.0"))
 
 @app.post("/api/discord-interactions")
-async def discord_interactions(request: Request, background_tasks: BackgroundTasks):
-    # Get the signature and timestamp from the headers
-    signature = request.headers.get('X-Signature-Ed25519')
-    timestamp = request.headers.get('X-Signature-Timestamp')
-    
-    # Get the request body as bytes
-    body = await request.body()
-    
-    # Verify the request
-    if not signature or not timestamp:
-        raise HTTPException(status_code=401, detail="Invalid request signature")
-    
+async def discord_interactions(request: Request):
+    received = time.perf_counter()
     try:
-        # Create a verify key using your Discord application's public key
-        verify_key = nacl.signing.VerifyKey(bytes.fromhex(DISCORD_PUBLIC_KEY))
-        
-        # Verify the signature
-        verify_key.verify(f"{timestamp}".encode() + body, bytes.fromhex(signature))
-        
-        # Parse the request body as JSON
-        data = await request.json()
+        # Verify against the raw bytes and decode the body only once
+        interaction = await verifier.verify_request(request)
         
         # Respond to Discord's ping
-        if data.get("type") == 1:  # PING
-            return {"type": 1}  # PONG
+        if interaction.type == PING:
+            return Response(content=PONG_RESPONSE, media_type="application/json")
             
         # Handle slash commands
-        if data.get("type") == 2:  # APPLICATION_COMMAND
-            command_name = data.get("data", {}).get("name")
-            
+        if interaction.type == APPLICATION_COMMAND:
             # Handle the findrecipe command
-            if command_name == "findrecipe":
+            if interaction.command_name == "findrecipe":
                 # Extract options (ingredients)
-                options = data.get("data", {}).get("options", [])
-                ingredients = ""
-                for option in options:
-                    if option.get("name") == "ingredients":
-                        ingredients = option.get("value", "")
+                ingredients = interaction.option("ingredients", "")
+                
+                # Already known: reply with the embed right away, skipping the deferred
+                # reply and the follow-up webhook call. Doesn't count against the rate limits
+                cached = await lookup_inline(ingredients, received)
+                if cached is not None:
+                    record_event("recipe_answered_inline", user_id=interaction.user_id,
+                                 guild_id=interaction.guild_id, ingredients=ingredients)
+                    return cached_recipe_response(cached)
                 
-                user_id = data.get("member", {}).get("user", {}).get("id", "unknown")
+                # Over their user or guild budget: nothing cached either, so ask them to slow down
+                admission = await admit(interaction.user_id, interaction.guild_id)
+                if not admission.allowed:
+                    record_event("recipe_rate_limited", user_id=interaction.user_id,
+                                 guild_id=interaction.guild_id, scope=admission.scope)
+                    return slow_down_response(admission)
                 
                 # We need to respond quickly to Discord
-                # Return a loading message immediately, then process in background
-                background_tasks.add_task(
-                    process_recipe_request, 
-                    ingredients=ingredients, 
-                    user_id=user_id,
-                    application_id=data.get("application_id"),
-                    token=data.get("token")
-                )
+                # Queue the work for the worker pool and return a loading message immediately.
+                # When the queue is full, shed the request with a friendly reply instead
+                try:
+                    job_queue.submit(
+                        "findrecipe",
+                        {
+                            "ingredients": ingredients,
+                            "user_id": interaction.user_id,
+                            "application_id": interaction.application_id,
+                            "token": interaction.token,
+                        },
+                        guild_id=interaction.guild_id,
+                    )
+                except QueueFull:
+                    record_event("recipe_shed", user_id=interaction.user_id, guild_id=interaction.guild_id)
+                    return {
+                        "type": 4,
+                        "data": {"content": BUSY_MESSAGE, "flags": 64}  # 64 = only visible to the user
+                    }
+                
+                record_event("recipe_requested", user_id=interaction.user_id,
+                             guild_id=interaction.guild_id, ingredients=ingredients)
                 
-                # Immediate response to Discord
-                return {
-                    "type": 5,  # DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE - "Bot is thinking..."
-                }
+                # Immediate response to Discord - DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE - "Bot is thinking..."
+                return Response(content=DEFERRED_RESPONSE, media_type="application/json")
         
         # Default response for other interaction types
         return {
@@ -91,116 +134,340 @@ async def discord_interactions(request: Request, background_tasks: BackgroundTas
             }
         }
     
-    except nacl.exceptions.BadSignatureError:
+    except InvalidSignature:
         raise HTTPException(status_code=401, detail="Invalid request signature")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # Function to process recipe request in background
 async def process_recipe_request(ingredients: str, user_id: str, application_id: str, token: str):
-    import requests
+    try:
+        # One or two provider calls depending on RECIPE_MODE (set RECIPE_PROVIDER=local
+        # for fast offline testing). Details for the top hit are served as soon as
+        # they're ready, the next few are generated in the background for follow-up lookups
+        recipes, detailed_recipe = await find_recipe_with_details(ingredients)
+        if not recipes or len(recipes) == 0:
+            # Send "no recipes found" response to Discord
+            await send_follow_up_message(
+                application_id, 
+                token, 
+                {"content": "No recipes found with those ingredients. Try different ingredients!"}
+            )
+            return
+            
+        recipe = recipes[0]
+        
+        # Create the response
+        response = {"embeds": [build_recipe_embed(recipe, detailed_recipe.get("instructions", "No instructions available."))]}
+        
+        # Send the follow-up message to Discord
+        await send_follow_up_message(application_id, token, response)
+        
+    except Exception as e:
+        log.error("Error processing recipe request: %s", e, extra={"event": "recipe_failed", "user_id": user_id})
+        # Send error message to Discord
+        await send_follow_up_message(
+            application_id, 
+            token, 
+            {"content": f"Error finding recipes: {str(e)}"}
+        )
+
+def build_recipe_embed(recipe: Dict[str, Any], instructions: str) -> Dict[str, Any]:
+    """Build the Discord embed for a recipe"""
+    with span("embed_build"):
+        return _recipe_embed(recipe, instructions)
+
+def _recipe_embed(recipe: Dict[str, Any], instructions: str) -> Dict[str, Any]:
+    # Format instructions
+    if len(instructions) > 1800:  # Discord has a 2000 char limit
+        instructions = instructions[:1800] + "..."
+    
+    # Missing ingredients (older stored recipes may have plain strings instead of {"name": ...})
+    missing_ingredient_text = ", ".join(missing_ingredient_names(recipe)) or "None"
+    
+    return {
+        "title": recipe["title"],
+        "description": f"Uses {recipe.get('usedIngredientCount', 0)} of your ingredients",
+        "color": 3066993,  # Green color
+        "thumbnail": {"url": recipe.get("image", "")},
+        "fields": [
+            {
+                "name": "Missing Ingredients",
+                "value": missing_ingredient_text,
+                "inline": False
+            },
+            {
+                "name": "Instructions",
+                "value": instructions,
+                "inline": False
+            }
+        ],
+        "footer": {
+            "text": f"Recipe ID: {recipe['id']} | React with 👍 to save this recipe to your favorites"
+        }
+    }
+
+# Streaming variant of process_recipe_request: the embed goes out as soon as the
+# title and missing ingredients are known, then the instructions are filled in
+async def process_recipe_request_streaming(ingredients: str, user_id: str, application_id: str, token: str):
+    start = time.perf_counter()
+    message_id = None
+    last_edit = 0.0
     
     try:
-        # Choose between mock data or real API
-        if USE_MOCK_DATA:
-            recipes = await mock_search_recipes(ingredients)
-            recipe = recipes[0]
-            detailed_recipe = await mock_recipe_information(recipe['id'])
-        else:
-            # Real API call
-            recipes = await search_recipes_by_ingredients(ingredients)
-            if not recipes or len(recipes) == 0:
-                # Send "no recipes found" response to Discord
-                send_follow_up_message(
+        async for partial in stream_recipe(ingredients):
+            top = partial.get("top") or {}
+            done = partial.get("done", False)
+            
+            # Fields are streamed in order, so once "instructions" appears the header is complete
+            if not done and (not top.get("title") or "instructions" not in top):
+                continue
+            if done and not partial.get("recipes"):
+                await send_follow_up_message(
                     application_id, 
                     token, 
                     {"content": "No recipes found with those ingredients. Try different ingredients!"}
                 )
                 return
-                
-            recipe = recipes[0]
-            detailed_recipe = await get_recipe_information(recipe['id'])
-        
-        # Format instructions
-        instructions = detailed_recipe.get("instructions", "No instructions available.")
-        if len(instructions) > 1800:  # Discord has a 2000 char limit
-            instructions = instructions[:1800] + "..."
-        
-        # Handle missing ingredients
-        missing_ingredients = recipe.get("missedIngredients", [])
-        missing_ingredient_text = "None"
-        if missing_ingredients:
-            # Handle both formats OpenAI might return
-            if isinstance(missing_ingredients[0], dict) and "name" in missing_ingredients[0]:
-                missing_ingredient_text = ", ".join([ing["name"] for ing in missing_ingredients])
-            elif isinstance(missing_ingredients, list) and all(isinstance(item, str) for item in missing_ingredients):
-                missing_ingredient_text = ", ".join(missing_ingredients)
-        
-        # Create the response
-        response = {
-            "embeds": [
-                {
-                    "title": recipe["title"],
-                    "description": f"Uses {recipe.get('usedIngredientCount', 0)} of your ingredients",
-                    "color": 3066993,  # Green color
-                    "thumbnail": {"url": recipe.get("image", "")},
-                    "fields": [
-                        {
-                            "name": "Missing Ingredients",
-                            "value": missing_ingredient_text,
-                            "inline": False
-                        },
-                        {
-                            "name": "Instructions",
-                            "value": instructions,
-                            "inline": False
-                        }
-                    ],
-                    "footer": {
-                        "text": f"Recipe ID: {recipe['id']} | React with 👍 to save this recipe to your favorites"
-                    }
-                }
-            ]
-        }
-        
-        # Send the follow-up message to Discord
-        send_follow_up_message(application_id, token, response)
+            
+            recipe = dict(top)
+            if "id" not in recipe:
+                recipe["id"] = stable_recipe_id(recipe["title"])
+            instructions = top.get("instructions") or ""
+            if not done:
+                instructions += " …"
+            message = {"embeds": [build_recipe_embed(recipe, instructions or "No instructions available.")]}
+            
+            now = time.perf_counter()
+            if message_id is None:
+                sent = await webhook_client.send_follow_up(application_id, token, message, wait=True)
+                message_id = sent["id"]
+                last_edit = now
+                log.info("First recipe content sent after %.2fs", now - start, extra={"event": "stream_first_content"})
+            elif done or now - last_edit >= STREAM_EDIT_INTERVAL:
+                # Throttle edits so a long stream doesn't burn through the rate limit
+                await webhook_client.edit_message(application_id, token, message_id, message)
+                last_edit = now
         
     except Exception as e:
-        print(f"Error processing recipe request: {e}")
-        # Send error message to Discord
-        send_follow_up_message(
+        log.error("Error processing recipe request: %s", e, extra={"event": "recipe_failed", "user_id": user_id})
+        await send_follow_up_message(
             application_id, 
             token, 
             {"content": f"Error finding recipes: {str(e)}"}
         )
 
-def send_follow_up_message(app_id, token, message_data):
+async def send_follow_up_message(app_id, token, message_data):
     """Send a follow-up message to Discord"""
-    import requests
-    
     try:
-        url = f"https://discord.com/api/v10/webhooks/{app_id}/{token}"
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(url, json=message_data, headers=headers)
-        response.raise_for_status()
-        print("Successfully sent follow-up message to Discord")
+        await webhook_client.send_follow_up(app_id, token, message_data)
+        log.info("Sent follow-up message to Discord", extra={"event": "follow_up_sent"})
+    except Exception as e:
+        log.error("Error sending follow-up message to Discord: %s", e, extra={"event": "follow_up_failed"})
+
+async def run_recipe_job(**payload):
+    """Worker pool handler for /findrecipe interactions"""
+    if RECIPE_STREAMING:
+        await process_recipe_request_streaming(**payload)
+    else:
+        await process_recipe_request(**payload)
+
+# Recipe generation runs on a bounded worker pool with per-guild fairness.
+# Queued jobs are journaled so they survive a restart
+RECIPE_WORKERS = int(os.getenv("RECIPE_WORKERS", "8"))
+RECIPE_QUEUE_MAX_DEPTH = int(os.getenv("RECIPE_QUEUE_MAX_DEPTH", "200"))
+# Each worker process journals to its own file (jobs.journal, jobs.journal.1, ...)
+JOB_JOURNAL_PATH = slot_path(os.getenv("JOB_JOURNAL_PATH", "jobs.journal"))
+# Seconds running jobs get to finish on shutdown; the rest are resumed from the journal
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "10"))
+BUSY_MESSAGE = "I'm cooking up a lot of recipes right now! Please try again in a minute."
+
+job_queue = JobQueue(
+    {"findrecipe": run_recipe_job},
+    workers=RECIPE_WORKERS,
+    max_depth=RECIPE_QUEUE_MAX_DEPTH,
+    journal_path=JOB_JOURNAL_PATH or None,
+)
+
+# Admission control: token buckets per user and per guild, checked before any work is queued.
+# Rates are requests per minute, bursts are how many can be made back to back
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "5"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "3"))
+RATE_LIMIT_GUILD_PER_MINUTE = float(os.getenv("RATE_LIMIT_GUILD_PER_MINUTE", "60"))
+RATE_LIMIT_GUILD_BURST = float(os.getenv("RATE_LIMIT_GUILD_BURST", "20"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# The limits are global: with ``api.serve --workers N`` the buckets live in the recipe database so
+# the workers draw from one budget instead of N. An in-memory database can't be shared, so then
+# (or with RATE_LIMIT_SHARED=false) every process keeps its own buckets and gets the full limits
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "true").lower() != "false" and RECIPE_DB_PATH != ":memory:"
+
+def _limiter(table: str, per_minute: float, burst: float):
+    if RATE_LIMIT_SHARED:
+        return SharedTokenBucketLimiter(RECIPE_DB_PATH, table, per_minute / 60, burst, max_keys=RATE_LIMIT_MAX_KEYS)
+    return TokenBucketLimiter(per_minute / 60, burst, max_keys=RATE_LIMIT_MAX_KEYS)
+
+admission_control = AdmissionControl(
+    _limiter("rate_limit_users", RATE_LIMIT_USER_PER_MINUTE, RATE_LIMIT_USER_BURST),
+    _limiter("rate_limit_guilds", RATE_LIMIT_GUILD_PER_MINUTE, RATE_LIMIT_GUILD_BURST),
+)
+rate_limited_replies = {"cached": 0, "slow_down": 0}
+
+async def admit(user_id: Optional[str], guild_id: Optional[str]) -> Admission:
+    if not RATE_LIMIT_ENABLED:
+        return Admission(True)
+    if RATE_LIMIT_SHARED:
+        # A shared check writes to the recipe database, which may wait on another worker
+        return await asyncio.to_thread(admission_control.admit, user_id, guild_id)
+    return admission_control.admit(user_id, guild_id)
+
+def slow_down_response(admission: Admission) -> Dict[str, Any]:
+    """Instant reply for a request over its rate limit"""
+    rate_limited_replies["slow_down"] += 1
+    wait = max(1, math.ceil(admission.retry_after))
+    if admission.scope == "guild":
+        content = f"This server is asking for a lot of recipes right now! Please try again in {wait}s."
+    else:
+        content = f"Slow down a little! You can ask for another recipe in {wait}s."
+    return {"type": 4, "data": {"content": content, "flags": 64}}  # 64 = only visible to the user
+
+# Cached answers are sent inline (type 4) when the lookup finishes within this many
+# milliseconds of the interaction arriving; otherwise the request takes the deferred
+# path. Discord drops replies after 3 seconds, so keep well below that
+INLINE_REPLY_ENABLED = os.getenv("INLINE_REPLY_ENABLED", "true").lower() != "false"
+INLINE_REPLY_BUDGET_MS = float(os.getenv("INLINE_REPLY_BUDGET_MS", "250"))
+inline_lookups = {"hit": 0, "miss": 0, "timeout": 0, "error": 0}
+
+async def lookup_inline(ingredients: str, received: float):
+    """Cached (recipes, detail) for an interaction, or None on a miss, an error or once the time budget is spent"""
+    if not INLINE_REPLY_ENABLED:
+        return None
+    remaining = INLINE_REPLY_BUDGET_MS / 1000 - (time.perf_counter() - received)
+    if remaining <= 0:
+        inline_lookups["timeout"] += 1
+        return None
+    try:
+        # The lookup can touch SQLite, so it runs off the event loop
+        with span("inline_lookup"):
+            cached = await asyncio.wait_for(asyncio.to_thread(cached_recipe, ingredients), remaining)
+    except asyncio.TimeoutError:
+        inline_lookups["timeout"] += 1
+        return None
     except Exception as e:
-        print(f"Error sending follow-up message to Discord: {e}")
+        # e.g. "database is locked" with several workers: the deferred path can still answer
+        inline_lookups["error"] += 1
+        log.warning("Inline cache lookup failed: %s", e, extra={"event": "inline_lookup_failed"})
+        return None
+    inline_lookups["hit" if cached is not None else "miss"] += 1
+    return cached
+
+def cached_recipe_response(cached) -> Dict[str, Any]:
+    """Type 4 reply carrying the same embed the follow-up message would have"""
+    recipes, detail = cached
+    embed = build_recipe_embed(recipes[0], detail.get("instructions", "No instructions available."))
+    return {"type": 4, "data": {"embeds": [embed]}}
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+# Heavy modules that are imported on first use (the OpenAI SDK, aiohttp for follow-ups,
+# numpy for meal plans). Once the app is serving they are loaded on a background
+# thread, so neither startup nor the first request waits for them
+PRELOAD_MODULES = [name.strip() for name in os.getenv("PRELOAD_MODULES", "openai,aiohttp,numpy").split(",") if name.strip()]
+
+def _preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            log.warning("Could not preload %s: %s", name, e)
+
+@app.on_event("startup")
+async def preload_modules():
+    if PRELOAD_MODULES:
+        asyncio.get_running_loop().run_in_executor(None, _preload_modules)
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop(timeout=JOB_DRAIN_TIMEOUT)
+
+def collect_service_metrics():
+    """Queue and follow-up gauges for /metrics, read when it is scraped"""
+    queue = job_queue.stats()
+    yield "recipe_queue_depth", "Recipe jobs waiting for a worker", {}, queue["depth"]
+    yield "recipe_jobs_in_progress", "Recipe jobs being worked on", {}, queue["in_progress"]
+    yield "recipe_jobs", "Recipe jobs by outcome", {"outcome": "completed"}, queue["completed"]
+    yield "recipe_jobs", "Recipe jobs by outcome", {"outcome": "failed"}, queue["failed"]
+    yield "recipe_jobs", "Recipe jobs by outcome", {"outcome": "shed"}, queue["shed"]
+    webhook = webhook_client.stats()
+    yield "discord_requests_sent", "Discord webhook requests that succeeded", {}, webhook["sent"]
+    yield "discord_rate_limited", "Discord webhook requests that got a 429", {}, webhook["rate_limited"]
+    for scope, stats in admission_control.stats().items():
+        yield "recipe_admission_allowed", "Requests let through admission control", {"scope": scope}, stats["allowed"]
+        yield "recipe_admission_rejected", "Requests over their rate limit", {"scope": scope}, stats["rejected"]
+        yield "recipe_admission_buckets", "Token buckets currently tracked", {"scope": scope}, stats["buckets"]
+    for result, count in inline_lookups.items():
+        yield "recipe_inline_lookups", "Cache lookups for inline interaction replies", {"result": result}, count
+    for reply, count in rate_limited_replies.items():
+        yield "recipe_rate_limited_replies", "Replies sent to rate limited requests", {"reply": reply}, count
+    logs = logging_stats()
+    yield "log_records_queued", "Log records waiting for the writer thread", {}, logs["queued"]
+    yield "log_records_dropped", "Log records dropped because the log queue was full", {}, logs["dropped"]
+
+add_collector(collect_service_metrics)
+
+@app.get("/api/queue/stats")
+async def get_queue_stats():
+    """Queue depth, worker usage and wait-time metrics for recipe jobs"""
+    return job_queue.stats()
 
-# In-memory storage for favorite recipes
-favorite_recipes = {}
+@app.get("/api/inline/stats")
+async def get_inline_stats():
+    """How often /findrecipe was answered inline from the cache instead of deferred"""
+    return {"enabled": INLINE_REPLY_ENABLED, "budget_ms": INLINE_REPLY_BUDGET_MS, **inline_lookups}
+
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """Per-user and per-guild rate limit counters and what rejected requests got back"""
+    return {"enabled": RATE_LIMIT_ENABLED, "shared": RATE_LIMIT_SHARED, **admission_control.stats(),
+            "replies": rate_limited_replies}
+
+@app.get("/api/provider/stats")
+async def get_provider_stats():
+    """Which recipe provider is answering, with token usage and hedging counters"""
+    return provider_stats()
+
+@app.get("/api/index/stats")
+async def get_index_stats():
+    """Size of the local ingredient index and how many searches it answered without the provider"""
+    return index_stats()
+
+# Favorites are (user, recipe) references in SQLite; the recipes live in the recipe store
+FAVORITES_DB_PATH = os.getenv("FAVORITES_DB_PATH", RECIPE_DB_PATH)
+favorites_store = FavoritesStore(FAVORITES_DB_PATH)
+
+@app.on_event("shutdown")
+async def flush_favorites():
+    await favorites_store.flush()
 
 @app.post("/api/findrecipe")
 async def find_recipe(request: RecipeRequest):
     """Find recipes based on provided ingredients"""
+    # Same per-user budget as the slash command; over it, only cached answers are served
+    admission = await admit(request.user_id, None)
+    if not admission.allowed:
+        cached = await asyncio.to_thread(cached_recipe, request.ingredients)
+        if cached is not None:
+            rate_limited_replies["cached"] += 1
+            return cached[0]
+        rate_limited_replies["slow_down"] += 1
+        raise HTTPException(status_code=429, detail="Too many recipe requests, slow down",
+                            headers={"Retry-After": str(max(1, math.ceil(admission.retry_after)))})
     try:
-        # Choose between mock data or real API
-        if USE_MOCK_DATA:
-            recipes = await mock_search_recipes(request.ingredients)
-        else:
-            # Real API call
-            recipes = await search_recipes_by_ingredients(request.ingredients)
+        recipes = await search_recipes_by_ingredients(request.ingredients)
+        # Warm up details for the top hits, the bot asks for the first one next
+        prefetch_recipe_details(recipes)
         return recipes
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -209,34 +476,156 @@ async def find_recipe(request: RecipeRequest):
 async def get_recipe(recipe_id: int):
     """Get detailed information for a specific recipe"""
     try:
-        # Choose between mock data or real API
-        if USE_MOCK_DATA:
-            recipe = await mock_recipe_information(recipe_id)
-        else:
-            # Real API call
-            recipe = await get_recipe_information(recipe_id)
+        recipe = await get_recipe_information(recipe_id)
         return recipe
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Append-only log of user interactions (the Sprint 3 stream), for the favorites
+# pipeline and analytics to tail with event_log.Consumer
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "events")
+# One writer per log, so every worker process appends to its own partition
+interaction_log = open_topic(EVENT_LOG_DIR, slot_path("interactions"))
+
+@app.on_event("shutdown")
+async def close_interaction_log():
+    interaction_log.close()
+
+def record_event(event_type: str, **fields):
+    """Append an interaction event; buffered, so it never waits on disk"""
+    try:
+        interaction_log.append({"type": event_type, "ts": time.time(), **fields})
+    except RuntimeError as e:
+        # Losing an analytics event shouldn't fail the interaction it describes
+        log.warning("Dropped %s event: %s", event_type, e, extra={"event": "event_log_failed"})
+
+# Fields shown when browsing favorites; instructions only come back with full=true
+FAVORITE_SUMMARY_FIELDS = ("id", "title", "image", "usedIngredientCount", "missedIngredients")
+MAX_FAVORITES_PAGE = 100
+
 @app.post("/api/favorites/add")
 async def add_favorite(recipe_data: Dict[str, Any], user_id: str):
     """Save a recipe to user's favorites"""
-    if user_id not in favorite_recipes:
-        favorite_recipes[user_id] = []
+    try:
+        recipe_id = int(recipe_data["id"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Recipe data needs a numeric id")
     
-    # Check if recipe already exists in favorites
-    if not any(recipe["id"] == recipe_data["id"] for recipe in favorite_recipes[user_id]):
-        favorite_recipes[user_id].append(recipe_data)
+    # Only a reference is stored, so make sure the recipe itself is in the recipe store
+    if recipe_store.get_summary(recipe_id) is None and recipe_data.get("title"):
+        summary = {field: recipe_data[field] for field in FAVORITE_SUMMARY_FIELDS if field in recipe_data}
+        await asyncio.to_thread(recipe_store.save_recipes, [{**summary, "id": recipe_id}])
+        if recipe_data.get("instructions"):
+            await asyncio.to_thread(recipe_store.save_detail, recipe_id, {**recipe_data, "id": recipe_id})
     
+    added = await favorites_store.add(user_id, recipe_id)
+    if added:
+        record_event("favorite_added", user_id=user_id, recipe_id=recipe_id)
+    if not added:
+        return {"status": "success", "message": "Recipe already in favorites"}
     return {"status": "success", "message": "Recipe added to favorites"}
 
 @app.get("/api/favorites/{user_id}")
-async def get_favorites(user_id: str):
-    """Get a user's favorite recipes"""
-    if user_id not in favorite_recipes:
-        return []
-    return favorite_recipes[user_id]
+async def get_favorites(user_id: str, limit: int = 20, after: Optional[str] = None, full: bool = False):
+    """Get one page of a user's favorite recipes
+
+    Pass the returned ``next_cursor`` as ``after`` to get the next page.
+    """
+    limit = max(1, min(limit, MAX_FAVORITES_PAGE))
+    try:
+        recipe_ids, next_cursor = favorites_store.page(user_id, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    recipes = recipe_store.get_recipes(recipe_ids, include_detail=full)
+    items = []
+    for recipe_id in recipe_ids:
+        recipe = recipes.get(recipe_id, {"id": recipe_id})
+        if not full:
+            recipe = {field: recipe[field] for field in FAVORITE_SUMMARY_FIELDS if field in recipe}
+        items.append(recipe)
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters for the recipe search cache, plus coalesced calls"""
+    return {"search": cache_stats(), "coalescing": coalescing_stats()}
+
+# Meal plans (Sprint 4) are built from a user's favorites. Each user's favorites are
+# encoded once and kept until they save another recipe; the current plan is kept
+# so single days can be swapped without planning the whole week again
+MEAL_PLAN_CACHE_SIZE = int(os.getenv("MEAL_PLAN_CACHE_SIZE", "256"))
+MEAL_PLAN_TTL = float(os.getenv("MEAL_PLAN_TTL", "3600"))
+meal_planners = TTLCache(maxsize=MEAL_PLAN_CACHE_SIZE, ttl=MEAL_PLAN_TTL)  # user_id -> (favorites count, planner)
+meal_plans = TTLCache(maxsize=MEAL_PLAN_CACHE_SIZE, ttl=MEAL_PLAN_TTL)  # user_id -> MealPlan
+
+class MealPlanRequest(BaseModel):
+    user_id: str
+    days: int = 7
+    diet: List[str] = []
+
+def _build_meal_planner(user_id: str):
+    from .meal_plan import MealPlanner, planning_ingredients  # numpy is only needed once someone plans meals
+
+    recipe_ids = favorites_store.recipe_ids(user_id)
+    recipes = recipe_store.get_recipes(recipe_ids)
+    indexed = recipe_store.get_ingredients(recipe_ids)
+    saved = [recipes.get(recipe_id, {"id": recipe_id}) for recipe_id in recipe_ids]
+    return MealPlanner(saved, [planning_ingredients(recipe, indexed.get(recipe["id"])) for recipe in saved])
+
+async def get_meal_planner(user_id: str) -> "MealPlanner":
+    """The user's encoded favorites, rebuilt when their favorites have changed"""
+    count = favorites_store.count(user_id)
+    cached = meal_planners.get(user_id)
+    if cached is not None and cached[0] == count:
+        return cached[1]
+    # Encoding a few thousand favorites is CPU work, keep it off the event loop
+    planner = await asyncio.to_thread(_build_meal_planner, user_id)
+    meal_planners.set(user_id, (count, planner))
+    return planner
+
+def meal_plan_response(planner: "MealPlanner", plan) -> Dict[str, Any]:
+    recipes = {recipe["id"]: recipe for recipe in planner.recipes}
+    return {
+        "days": [
+            {"day": day + 1, "recipe": {field: recipes[recipe_id][field] for field in ("id", "title", "image")
+                                        if field in recipes[recipe_id]}}
+            for day, recipe_id in enumerate(plan.recipe_ids)
+        ],
+        "diet": list(plan.diet),
+        "shared_ingredients": planner.shared_ingredients(plan),
+        "shopping_list": planner.shopping_list(plan),
+        "score": round(plan.score, 2),
+    }
+
+@app.post("/api/mealplan")
+async def create_meal_plan(request: MealPlanRequest):
+    """Plan ``days`` meals from the user's favorites, reusing ingredients across the week"""
+    if not 1 <= request.days <= 14:
+        raise HTTPException(status_code=400, detail="A meal plan covers 1 to 14 days")
+    planner = await get_meal_planner(request.user_id)
+    try:
+        plan = planner.plan(request.days, request.diet)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    meal_plans.set(request.user_id, (planner, plan))
+    record_event("meal_plan_created", user_id=request.user_id, days=request.days, diet=request.diet)
+    return meal_plan_response(planner, plan)
+
+@app.post("/api/mealplan/{user_id}/replace")
+async def replace_meal(user_id: str, day: int):
+    """Swap one day (1-based) of the user's current plan for the next best recipe"""
+    current = meal_plans.get(user_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="No meal plan yet, create one first")
+    planner, plan = current
+    if not 1 <= day <= len(plan.recipe_ids):
+        raise HTTPException(status_code=400, detail=f"Day must be between 1 and {len(plan.recipe_ids)}")
+    try:
+        planner.replace(plan, day - 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return meal_plan_response(planner, plan)
 
 # Health check endpoint
 @app.get("/health")
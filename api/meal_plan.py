@@ -0,0 +1,244 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .ingredients import normalize_ingredient
+from .models import missing_ingredient_names
+
+# Diet tags are worked out from ingredient names, one keyword list per thing a diet rules out
+_MEAT = {"chicken", "beef", "pork", "lamb", "bacon", "ham", "sausage", "turkey", "duck", "veal", "chorizo",
+         "prosciutto", "salami", "mince", "steak", "meatball", "pancetta"}
+_FISH = {"salmon", "tuna", "cod", "shrimp", "prawn", "fish", "anchovy", "crab", "lobster", "mussel", "clam",
+         "scallop", "sardine", "trout", "squid", "halibut", "mackerel"}
+_DAIRY = {"milk", "cheese", "butter", "cream", "yogurt", "yoghurt", "parmesan", "mozzarella", "cheddar", "feta",
+          "ghee", "ricotta", "mascarpone", "buttermilk"}
+_ANIMAL_OTHER = {"egg", "honey", "gelatin", "mayonnaise"}
+_GLUTEN = {"flour", "bread", "pasta", "noodle", "couscous", "barley", "wheat", "tortilla", "breadcrumb", "bun",
+           "pita", "cracker", "spaghetti", "macaroni", "penne", "farro", "bulgur", "seitan"}
+
+DIET_TAGS = ("vegetarian", "vegan", "pescatarian", "gluten-free", "dairy-free")
+
+# "2 cups of diced tomatoes" -> "diced tomatoes"
+_QUANTITY = re.compile(
+    r"^[\d\s/.,½¼¾-]*(cups?|tbsps?|tablespoons?|tsps?|teaspoons?|g|kg|ml|l|oz|ounces?|lbs?|pounds?|cloves?|"
+    r"cans?|pinch(es)?|handfuls?|slices?|bunch(es)?)?\.?\s+(of\s+)?",
+    re.IGNORECASE,
+)
+
+
+def _term_flags(ingredient: str) -> List[bool]:
+    """[meat, fish, dairy, other animal product, gluten] for one ingredient name"""
+    words = set(re.split(r"[\s-]+", normalize_ingredient(ingredient)))
+    return [bool(words & group) for group in (_MEAT, _FISH, _DAIRY, _ANIMAL_OTHER, _GLUTEN)]
+
+
+def _tags_from_flags(flags: np.ndarray) -> np.ndarray:
+    """Per-recipe [meat, fish, dairy, other, gluten] counts -> boolean columns in DIET_TAGS order"""
+    meat, fish, dairy, other, gluten = (flags[:, i] == 0 for i in range(5))
+    vegetarian = meat & fish
+    return np.stack([vegetarian, vegetarian & dairy & other, meat, gluten, dairy], axis=1)
+
+
+def diet_tags(ingredients: Iterable[str]) -> List[str]:
+    """Which of DIET_TAGS a recipe with these ingredients fits"""
+    flags = np.array([_term_flags(item) for item in ingredients] or [[False] * 5]).sum(axis=0, keepdims=True)
+    return [tag for tag, fits in zip(DIET_TAGS, _tags_from_flags(flags)[0]) if fits]
+
+
+def planning_ingredients(recipe: Dict[str, Any], indexed: Optional[Sequence[str]] = None) -> List[str]:
+    """Ingredients to plan with: what the ingredient index knows, else what the recipe lists"""
+    if indexed:
+        return list(indexed)
+    names = missing_ingredient_names(recipe)
+    names += [_QUANTITY.sub("", ing.get("original", "")) for ing in recipe.get("extendedIngredients") or []
+              if isinstance(ing, dict)]
+    return sorted({normalize_ingredient(name) for name in names if name and name.strip()})
+
+
+def dish_type(title: str) -> str:
+    """Last word of the title ("... Chicken Stew" -> "stew"), so a week doesn't get five stews"""
+    words = (title or "").lower().split()
+    return words[-1] if words else ""
+
+
+@dataclass
+class MealPlan:
+    """A plan over a planner's candidate pool; ``members`` are pool positions, one per day"""
+
+    members: List[int]
+    score: float
+    diet: tuple = ()
+    recipe_ids: List[int] = field(default_factory=list)
+    # P[:, members], kept so single-day edits don't need the whole week again
+    columns: Optional[np.ndarray] = None
+    rejected: set = field(default_factory=set)
+
+
+class MealPlanner:
+    """Builds weekly meal plans from a user's saved recipes.
+
+    Each recipe is encoded once as a row of a binary ingredient matrix plus a
+    diet-tag matrix. For the best ``pool_size`` candidates (the recipes that
+    share the most ingredients with the rest of the user's favorites) a pair
+    score matrix is computed with a single matrix product:
+
+        P[i, j] = shared(i, j) * (1 - variety * jaccard(i, j)) - same_dish * [dish(i) == dish(j)]
+
+    Sharing ingredients makes the shopping list shorter and is rewarded, but
+    once two recipes are mostly the same (high Jaccard similarity) the pair
+    counts against the week, as does repeating a dish type. A week's score is
+    the sum over its pairs. Thousands of random weeks are scored at once by
+    indexing into P, and the best few are improved by vectorized swap search.
+    """
+
+    def __init__(self, recipes: Sequence[Dict[str, Any]], ingredients: Sequence[Sequence[str]],
+                 pool_size: int = 256, variety: float = 1.5, same_dish: float = 2.0):
+        self.recipes = list(recipes)
+        self.recipe_ids = np.array([recipe["id"] for recipe in self.recipes], dtype=np.int64)
+        self.pool_size = pool_size
+        self.variety = variety
+        self.same_dish = same_dish
+
+        vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, items in enumerate(ingredients):
+            for item in set(items):
+                rows.append(row)
+                cols.append(vocabulary.setdefault(item, len(vocabulary)))
+        self.vocabulary = list(vocabulary)
+        self.features = np.zeros((len(self.recipes), max(1, len(vocabulary))), dtype=np.float32)
+        self.features[rows, cols] = 1.0
+
+        # Diet rules are checked once per distinct ingredient, then for all recipes in one product
+        term_flags = np.array([_term_flags(term) for term in self.vocabulary] or [[False] * 5], dtype=np.float32)
+        self.tags = _tags_from_flags(self.features @ term_flags)
+
+        dishes: Dict[str, int] = {}
+        self.dishes = np.array([dishes.setdefault(dish_type(recipe.get("title", "")), len(dishes))
+                                for recipe in self.recipes], dtype=np.int32)
+
+        self._pool_key = None
+        self._pool = np.zeros(0, dtype=np.int64)
+        self._pair_scores = np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def plan(self, days: int = 7, diet: Sequence[str] = (), candidates: int = 2048, refine: int = 8,
+             seed: Optional[int] = None) -> MealPlan:
+        """Pick ``days`` different recipes that fit every tag in ``diet``"""
+        pool, pair_scores = self._prepare(tuple(sorted(diet)))
+        if len(pool) < days:
+            raise ValueError(f"Only {len(pool)} saved recipes fit this diet, need {days}")
+
+        # Score many random weeks at once: each week's score is the sum of its pair scores
+        rng = np.random.default_rng(seed)
+        weeks = np.argsort(rng.random((candidates, len(pool))), axis=1)[:, :days]
+        scores = pair_scores[weeks[:, :, None], weeks[:, None, :]].sum(axis=(1, 2)) / 2
+
+        best = None
+        for week in weeks[np.argsort(scores)[-refine:]]:
+            plan = self._improve(list(week), pair_scores)
+            if best is None or plan.score > best.score:
+                best = plan
+        best.diet = tuple(sorted(diet))
+        best.recipe_ids = [int(recipe_id) for recipe_id in self.recipe_ids[pool[best.members]]]
+        return best
+
+    def replace(self, plan: MealPlan, day: int) -> MealPlan:
+        """Swap one day's recipe for the best alternative given the other days
+
+        Only that day's column of the cached pair scores changes, so this is one
+        pass over the candidate pool rather than planning the week again.
+        Recipes swapped out of this plan before are not suggested again. Raises
+        ValueError, leaving the plan as it was, if no other recipe fits the diet.
+        """
+        pool, pair_scores = self._prepare(plan.diet)
+        if plan.columns is None:
+            plan.columns = pair_scores[:, plan.members]
+        others = [i for i in range(len(plan.members)) if i != day]
+        gain = plan.columns[:, others].sum(axis=1)
+        old = plan.members[day]
+        rejected = plan.rejected | {old}
+        gain[list(rejected | set(plan.members))] = -np.inf
+        if not np.isfinite(gain).any():
+            # Every candidate has been tried, start over with only this week's recipes blocked
+            rejected = {old}
+            gain = plan.columns[:, others].sum(axis=1)
+            gain[plan.members] = -np.inf
+            if not np.isfinite(gain).any():
+                raise ValueError("No alternative recipe fits this diet, save a few more recipes first")
+        new = int(np.argmax(gain))
+        plan.rejected = rejected
+
+        plan.score += float(gain[new] - plan.columns[old, others].sum())
+        plan.members[day] = new
+        plan.columns[:, day] = pair_scores[:, new]
+        plan.recipe_ids[day] = int(self.recipe_ids[pool[new]])
+        return plan
+
+    def shared_ingredients(self, plan: MealPlan, minimum: int = 2) -> List[str]:
+        """Ingredients that appear in at least ``minimum`` of the plan's recipes, most used first"""
+        rows = [self._row(recipe_id) for recipe_id in plan.recipe_ids]
+        counts = self.features[rows].sum(axis=0)
+        order = np.argsort(-counts, kind="stable")
+        return [self.vocabulary[i] for i in order if counts[i] >= minimum]
+
+    def shopping_list(self, plan: MealPlan) -> List[str]:
+        rows = [self._row(recipe_id) for recipe_id in plan.recipe_ids]
+        used = self.features[rows].any(axis=0)
+        return sorted(self.vocabulary[i] for i in np.flatnonzero(used))
+
+    def _row(self, recipe_id: int) -> int:
+        return int(np.flatnonzero(self.recipe_ids == recipe_id)[0])
+
+    def _prepare(self, diet):
+        """Candidate pool and its pair score matrix for a diet, cached until the diet changes"""
+        if self._pool_key == diet:
+            return self._pool, self._pair_scores
+
+        unknown = set(diet) - set(DIET_TAGS)
+        if unknown:
+            raise ValueError(f"Unknown diet {', '.join(sorted(unknown))}; use {', '.join(DIET_TAGS)}")
+        mask = np.ones(len(self.recipes), dtype=bool)
+        for tag in diet:
+            mask &= self.tags[:, DIET_TAGS.index(tag)]
+        eligible = np.flatnonzero(mask)
+
+        # Recipes made of ingredients the user cooks with a lot make the best anchors
+        features = self.features[eligible]
+        popularity = features @ features.sum(axis=0)
+        sizes = features.sum(axis=1)
+        centrality = popularity / np.maximum(sizes, 1)
+        pool = eligible[np.argsort(-centrality, kind="stable")[:self.pool_size]]
+
+        pool_features = self.features[pool]
+        shared = pool_features @ pool_features.T
+        pool_sizes = np.diag(shared)
+        union = pool_sizes[:, None] + pool_sizes[None, :] - shared
+        jaccard = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        pair_scores = shared * (1 - self.variety * jaccard)
+        pair_scores -= self.same_dish * (self.dishes[pool][:, None] == self.dishes[pool][None, :])
+        np.fill_diagonal(pair_scores, 0)
+
+        self._pool_key, self._pool, self._pair_scores = diet, pool, pair_scores.astype(np.float32)
+        return self._pool, self._pair_scores
+
+    def _improve(self, members: List[int], pair_scores: np.ndarray, max_rounds: int = 50) -> MealPlan:
+        """Hill-climb by swapping single days while any swap raises the week's score"""
+        columns = pair_scores[:, members].copy()
+        for _ in range(max_rounds):
+            totals = columns.sum(axis=1)
+            # gains[j, d]: change in score when day d's recipe is replaced by candidate j
+            current = totals[members] - columns[members, range(len(members))]
+            gains = (totals[:, None] - columns) - current[None, :]
+            gains[members, :] = -np.inf
+            candidate, day = np.unravel_index(np.argmax(gains), gains.shape)
+            if gains[candidate, day] <= 1e-6:
+                break
+            members[day] = int(candidate)
+            columns[:, day] = pair_scores[:, candidate]
+        score = float(pair_scores[np.ix_(members, members)].sum() / 2)
+        return MealPlan(members=members, score=score, columns=columns)
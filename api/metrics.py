@@ -0,0 +1,236 @@
+import os
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Set METRICS_ENABLED=false to turn every span, counter and gauge into a no-op
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+
+# Seconds; covers everything from a signature check to a slow OpenAI completion
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NOOP = nullcontext()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), registry: "Registry" = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        if ENABLED:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [per-bucket counts..., overflow, sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * (len(self.buckets) + 3)
+        # Counts are stored per bucket and only made cumulative when rendered
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def time(self, **labels):
+        """Context manager that observes how long its body took"""
+        if not ENABLED:
+            return _NOOP
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    """Holds metrics plus collector callbacks that report gauges computed at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]) -> None:
+        """``collector()`` yields (name, help, labels, value) gauge samples when /metrics is scraped"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        described = set()
+        for collector in self._collectors:
+            for name, help_text, labels, value in collector():
+                if name not in described:
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                    described.add(name)
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Where the seconds go, one histogram labelled by stage:
+# verify, decode, queue_wait, openai, model_parse, embed_build, discord_post, ...
+STAGE_SECONDS = Histogram("recipe_stage_seconds", "Time spent in each stage of handling a request", ["stage"])
+OPENAI_TOKENS = Counter("recipe_openai_tokens_total", "OpenAI tokens used", ["kind"])
+OPENAI_CALLS = Counter("recipe_openai_calls_total", "OpenAI completions requested", ["operation"])
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+
+
+def span(stage: str):
+    """Time a block of code as one stage: ``with span("openai"): ...``"""
+    if not ENABLED:
+        return _NOOP
+    return _Timer(STAGE_SECONDS, {"stage": stage})
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere (e.g. time spent waiting in a queue)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def add_collector(collector) -> None:
+    REGISTRY.add_collector(collector)
+
+
+def instrument_app(app, registry: Optional[Registry] = None) -> None:
+    """Add request timing middleware and a Prometheus-text GET /metrics route to a FastAPI app"""
+    from fastapi import Response
+
+    registry = registry or REGISTRY
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        if not ENABLED:
+            return Response("# metrics are disabled (METRICS_ENABLED=false)\n", media_type="text/plain")
+        return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+    if not ENABLED:
+        return
+
+    @app.middleware("http")
+    async def time_requests(request, call_next):
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template (/api/recipe/{recipe_id}), not the raw path, to keep the series bounded
+            route = request.scope.get("route")
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                 route=getattr(route, "path", "unmatched"), status=str(status))
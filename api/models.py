@@ -1,41 +1,252 @@
-@bot.event
-async def on_reaction_add(reaction, user):
-    # Ignore bot's own reactions
-    if user.id == bot.user.id:
-        return
-    
-    # Check if the reaction is 👍 on a recipe message
-    if str(reaction.emoji) == "👍" and reaction.message.author.id == bot.user.id:
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
+from .partial_json import parse_partial_json
+
+
+def missing_ingredient_names(recipe: Dict[str, Any]) -> List[str]:
+    """Names in a recipe's missedIngredients, whether stored as {"name": ...} dicts or plain strings"""
+    names = []
+    for ing in recipe.get("missedIngredients") or recipe.get("missing") or []:
+        name = ing.get("name") if isinstance(ing, dict) else ing
+        if name and str(name).strip():
+            names.append(str(name).strip())
+    return names
+
+
+class Ingredient(BaseModel):
+    name: str
+
+
+class ExtendedIngredient(BaseModel):
+    original: str
+
+
+class RecipeSummary(BaseModel):
+    """A recipe search result, the shape stored, cached and returned by the API
+
+    Accepts the compact keys the model is asked to write ("uses", "missing")
+    as well as the full ones, and missing ingredients as strings or dicts.
+    """
+
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+
+    id: int = 0
+    title: str = Field(min_length=1)
+    image: str = ""
+    usedIngredientCount: int = Field(0, ge=0, validation_alias=AliasChoices("usedIngredientCount", "uses"))
+    missedIngredients: List[Ingredient] = Field(
+        default_factory=list, validation_alias=AliasChoices("missedIngredients", "missing"))
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _any_id(cls, value):
+        # The model's IDs are replaced by stable ones anyway, so a bad one isn't worth failing over
         try:
-            # Extract recipe data from the embed
-            embed = reaction.message.embeds[0]
-            recipe_title = embed.title
-            
-            # Call FastAPI to save the favorite
-            # Note: You'll need to extract the recipe ID from the embed or message
-            # This is simplified, you may need to adjust based on your message format
-            recipe_id = extract_recipe_id_from_message(reaction.message)
-            if recipe_id:
-                response = requests.get(f"{FASTAPI_URL}/api/recipe/{recipe_id}")
-                recipe_data = response.json()
-                
-                requests.post(
-                    f"{FASTAPI_URL}/api/favorites/add",
-                    json=recipe_data,
-                    params={"user_id": str(user.id)}
-                )
-                
-                # Notify the user
-                await user.send(f"Added '{recipe_title}' to your favorites!")
-        except Exception as e:
-            print(f"Error saving favorite: {e}")
-
-def extract_recipe_id_from_message(message):
-    """Helper function to extract recipe ID from message
-    
-    You'll need to implement this based on how you're storing the recipe ID
-    in your message. One approach is to use a custom footer or hidden field.
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    @field_validator("missedIngredients", mode="before")
+    @classmethod
+    def _ingredient_dicts(cls, value):
+        if not isinstance(value, list):
+            return []
+        return [{"name": name} for name in missing_ingredient_names({"missedIngredients": value})]
+
+
+class RecipeDetail(BaseModel):
+    """Detailed recipe information; only the instructions are rendered"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    id: int = 0
+    title: str = ""
+    instructions: str = ""
+    extendedIngredients: List[ExtendedIngredient] = Field(default_factory=list)
+    summary: str = ""
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _any_id(cls, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    @field_validator("extendedIngredients", mode="before")
+    @classmethod
+    def _ingredient_lines(cls, value):
+        if not isinstance(value, list):
+            return []
+        return [item if isinstance(item, dict) else {"original": str(item)} for item in value]
+
+
+class StreamedTop(RecipeSummary):
+    instructions: str = ""
+
+
+class SearchOutput(BaseModel):
+    recipes: List[RecipeSummary]
+
+
+class CombinedOutput(BaseModel):
+    recipes: List[RecipeSummary]
+    top: Optional[RecipeDetail] = None
+
+
+class StreamedOutput(BaseModel):
+    top: Optional[StreamedTop] = None
+    recipes: List[RecipeSummary] = Field(default_factory=list)
+
+
+# Validators are built once here; pydantic compiles them, and validate_json
+# parses and validates in one pass without building an intermediate dict
+_OUTPUTS = {"search": SearchOutput, "detail": RecipeDetail, "combined": CombinedOutput, "stream": StreamedOutput}
+_SUMMARY = TypeAdapter(RecipeSummary)
+
+
+# Structured output schemas sent with each completion. They ask only for what the
+# embed shows, with short keys: the ID is replaced by a stable one, image URLs made
+# up by the model don't load, and the ingredient list and summary are never shown
+def _strict(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def _response_format(name: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": _strict(properties)}}
+
+
+_IDEA = {
+    "title": {"type": "string"},
+    "uses": {"type": "integer"},
+    "missing": {"type": "array", "items": {"type": "string"}},
+}
+_IDEAS = {"type": "array", "items": _strict(_IDEA)}
+_INSTRUCTIONS = {"type": "string"}
+
+RESPONSE_FORMATS = {
+    "search": _response_format("recipe_search", {"recipes": _IDEAS}),
+    "detail": _response_format("recipe_detail", {"instructions": _INSTRUCTIONS}),
+    "combined": _response_format("recipe_combined", {"recipes": _IDEAS, "top": _strict({"instructions": _INSTRUCTIONS})}),
+    # Keys in the order the streaming embed needs them: everything but the instructions comes first
+    "stream": _response_format("recipe_stream", {"top": _strict({**_IDEA, "instructions": _INSTRUCTIONS}),
+                                                 "recipes": _IDEAS}),
+}
+
+# How model output got through validation
+output_counts = {"valid": 0, "repaired": 0, "failed": 0}
+
+
+class OutputError(ValueError):
+    """Raised when model output can't be validated, even after repair"""
+
+
+def parse_output(kind: str, text: str):
+    """Validate model output for ``kind`` (search, detail, combined or stream)
+
+    Returns plain dicts in the stored shape: a list of recipes for search, a
+    detail dict for detail, and {"recipes", "top"} for combined and stream.
+    Output that doesn't validate as is gets a cheap repair step. When nothing
+    usable is left (no recipes, or a detail without instructions) this raises
+    OutputError, so an empty answer is never cached or stored.
     """
-    # Implementation depends on your message structure
-    # This is just a placeholder
-    return None
\ No newline at end of file
+    try:
+        output = _OUTPUTS[kind].model_validate_json(text)
+        result = "valid"
+    except ValidationError:
+        output = _repair(kind, text)
+        result = "repaired"
+    _require_content(kind, output)
+    output_counts[result] += 1
+    return _dump(kind, output)
+
+
+def wire_fields(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename the compact keys of a partial streamed recipe to the stored ones, without validating"""
+    if "uses" not in recipe and "missing" not in recipe:
+        return recipe
+    recipe = dict(recipe)
+    if "uses" in recipe:
+        recipe["usedIngredientCount"] = recipe.pop("uses")
+    if "missing" in recipe:
+        recipe["missedIngredients"] = [{"name": name} for name in missing_ingredient_names(recipe)]
+        del recipe["missing"]
+    return recipe
+
+
+def _require_content(kind: str, output: BaseModel) -> None:
+    if kind == "detail":
+        missing = not output.instructions.strip()
+    elif kind == "stream":
+        missing = output.top is None and not output.recipes
+    else:
+        missing = not output.recipes
+    if missing:
+        output_counts["failed"] += 1
+        raise OutputError(f"Model output for {kind} has no {'instructions' if kind == 'detail' else 'recipes'}")
+
+
+def _dump(kind: str, output: BaseModel):
+    if kind == "search":
+        return [recipe.model_dump() for recipe in output.recipes]
+    if kind == "detail":
+        return output.model_dump()
+    data = output.model_dump()
+    if kind == "combined" and output.top is not None and not output.top.instructions:
+        data["top"] = None
+    return data
+
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def _decode(text: str) -> Any:
+    """Cheap fixes for the usual ways JSON goes wrong: code fences, chatter around it, a cut-off end"""
+    text = _FENCE.sub("", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if starts:
+        text = text[min(starts):]
+    try:
+        return json.loads(text)
+    except ValueError:
+        # Cut off at max_tokens: close whatever is still open
+        return parse_partial_json(text)
+
+
+def _recipe_list(data: Any) -> List[Dict[str, Any]]:
+    """Recipes that validate on their own, wherever the list ended up"""
+    if isinstance(data, dict):
+        data = data.get("recipes", next((value for value in data.values() if isinstance(value, list)), []))
+    recipes = []
+    for item in data if isinstance(data, list) else []:
+        try:
+            recipes.append(_SUMMARY.validate_python(item))
+        except ValidationError:
+            continue
+    return recipes
+
+
+def _repair(kind: str, text: str) -> BaseModel:
+    data = _decode(text)
+    try:
+        if data is None:
+            raise OutputError("no JSON found")
+        if kind == "search":
+            return SearchOutput(recipes=_recipe_list(data))
+        if not isinstance(data, dict):
+            raise OutputError(f"Expected a JSON object for {kind}, got {type(data).__name__}")
+        if kind == "detail":
+            return RecipeDetail.model_validate(data)
+        top = data.get("top") if isinstance(data.get("top"), dict) else None
+        if kind == "combined":
+            return CombinedOutput(recipes=_recipe_list(data),
+                                  top=RecipeDetail.model_validate(top) if top else None)
+        return StreamedOutput(recipes=_recipe_list(data),
+                              top=StreamedTop.model_validate(top) if top and top.get("title") else None)
+    except (ValidationError, OutputError) as e:
+        output_counts["failed"] += 1
+        raise OutputError(f"Model output for {kind} could not be repaired: {e}") from None
@@ -0,0 +1,69 @@
+import json
+from typing import Any, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """Parse the longest usable prefix of an incomplete JSON document.
+
+    Used while a completion is still streaming in: open objects and arrays are
+    closed, a string value that is still being written is cut off where it is,
+    and half-written keys, numbers or literals are dropped. Returns None when
+    nothing usable has arrived yet.
+    """
+    stack = []           # open "{" / "[" containers
+    expect_key = []      # for each open container: is the next string an object key?
+    safe_end = 0         # text[:safe_end] ends on a complete value or an open container
+    safe_stack = ()
+    in_string = False
+    string_is_key = False
+    escape = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if not string_is_key:
+                    safe_end, safe_stack = i + 1, tuple(stack)
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == "{" and expect_key[-1]
+        elif ch in "{[":
+            stack.append(ch)
+            expect_key.append(ch == "{")
+            safe_end, safe_stack = i + 1, tuple(stack)
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            expect_key.pop()
+            safe_end, safe_stack = i + 1, tuple(stack)
+        elif ch == ":":
+            if expect_key:
+                expect_key[-1] = False
+        elif ch == ",":
+            # A comma always follows a complete value
+            safe_end, safe_stack = i, tuple(stack)
+            if stack and stack[-1] == "{":
+                expect_key[-1] = True
+
+    candidates = []
+    if in_string and not string_is_key:
+        # Keep the partial string value; drop a dangling escape so it stays valid
+        partial = text[:-1] if escape else text
+        candidates.append(partial + '"' + "".join(_CLOSERS[c] for c in reversed(stack)))
+    candidates.append(text[:safe_end] + "".join(_CLOSERS[c] for c in reversed(safe_stack)))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
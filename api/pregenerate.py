@@ -0,0 +1,166 @@
+"""Warm the recipe store and search cache from a corpus of pantry combinations.
+
+    python -m api.pregenerate pantries.txt --concurrency 8
+    python -m api.pregenerate pantries.txt --provider local --db recipes.db
+
+The corpus has one ingredient list per line ("chicken, rice, garlic"); blank
+lines and lines starting with # are skipped. Lists that are the same once
+canonicalized ("Rice,chicken" and "chicken, rice") are generated once.
+
+Every list goes through ``find_recipe_with_details``, the same path as a user
+request, so the search results, the top recipe's details and the ingredient
+index land in the recipe database (and its shared cache tier) that the API
+serves from. Lists the store can already answer cost nothing.
+
+Finished lists are appended to a checkpoint file (``<corpus>.done`` unless
+``--checkpoint`` says otherwise) as soon as they are stored. A rerun skips
+them, so an interrupted run carries on where it stopped. Failures are retried
+with exponential backoff, and lists that still fail are left out of the
+checkpoint so the next run tries them again.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from .ingredients import canonical_key
+
+
+def load_corpus(path: str) -> List[str]:
+    """Canonical keys of the ingredient lists in ``path``, de-duplicated, in file order"""
+    keys = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key = canonical_key(line)
+            if key:
+                keys.setdefault(key, None)
+    return list(keys)
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+class Pregenerator:
+    """Runs ingredient lists through the recipe client with bounded concurrency and retries"""
+
+    def __init__(self, checkpoint_path: Optional[str], concurrency: int = 8, retries: int = 3,
+                 backoff: float = 1.0, limit: int = 5, mode: Optional[str] = None):
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.limit = limit
+        self.mode = mode
+        self.counts = {"lists": 0, "recipes": 0, "details": 0, "retries": 0, "failed": 0}
+        self.failed: List[str] = []
+
+    async def run(self, keys: Iterable[str]) -> Dict[str, int]:
+        from .recipe_client import drain_prefetches
+
+        pending = iter(keys)
+        checkpoint = open(self.checkpoint_path, "a", encoding="utf-8") if self.checkpoint_path else None
+        try:
+            # Workers share one iterator, so at most ``concurrency`` lists are in flight
+            await asyncio.gather(*[self._worker(pending, checkpoint) for _ in range(self.concurrency)])
+            # Details for the runners-up are generated in the background; let them finish before exiting
+            await drain_prefetches()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        return self.counts
+
+    async def _worker(self, pending, checkpoint) -> None:
+        for key in pending:
+            recipes, detail = await self._generate(key)
+            if recipes is None:
+                self.failed.append(key)
+                self.counts["failed"] += 1
+                continue
+            self.counts["lists"] += 1
+            self.counts["recipes"] += len(recipes)
+            self.counts["details"] += detail is not None
+            if checkpoint is not None:
+                # One line per finished list, flushed right away so an interrupted run loses nothing
+                checkpoint.write(key + "\n")
+                checkpoint.flush()
+
+    async def _generate(self, key: str):
+        from .recipe_client import find_recipe_with_details
+
+        for attempt in range(self.retries + 1):
+            try:
+                return await find_recipe_with_details(key, self.limit, self.mode)
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Giving up on {key!r}: {e}")
+                    break
+                self.counts["retries"] += 1
+                # Exponential backoff with jitter, so retries after a provider hiccup don't all land at once
+                await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="file with one ingredient list per line")
+    parser.add_argument("--checkpoint", help="file of finished lists (default: <corpus>.done)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="don't read or write a checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="ingredient lists generated at once")
+    parser.add_argument("--retries", type=int, default=3, help="retries per list after a failure")
+    parser.add_argument("--backoff", type=float, default=1.0, help="seconds before the first retry, doubled each time")
+    parser.add_argument("--limit", type=int, default=5, help="recipes per search, as the API asks for")
+    parser.add_argument("--mode", choices=["two_call", "combined"], help="default: RECIPE_MODE")
+    parser.add_argument("--provider", help="recipe provider (default: RECIPE_PROVIDER); \"local\" needs no API key")
+    parser.add_argument("--db", help="recipe database to fill (default: RECIPE_DB_PATH)")
+    args = parser.parse_args()
+
+    # The recipe client reads its settings on import, so apply these first
+    if args.provider:
+        os.environ["RECIPE_PROVIDER"] = args.provider
+    if args.db:
+        os.environ["RECIPE_DB_PATH"] = args.db
+    from .logs import configure_logging
+    from .recipe_client import RECIPE_DB_PATH, provider_stats, recipe_store
+
+    configure_logging()
+    checkpoint_path = None if args.no_checkpoint else args.checkpoint or args.corpus + ".done"
+    keys = load_corpus(args.corpus)
+    done = load_checkpoint(checkpoint_path) if checkpoint_path else set()
+    todo = [key for key in keys if key not in done]
+    print(f"{len(keys)} distinct ingredient lists, {len(keys) - len(todo)} already done, {len(todo)} to generate "
+          f"into {RECIPE_DB_PATH} with the {provider_stats()['name']} provider")
+
+    pregenerator = Pregenerator(checkpoint_path, concurrency=args.concurrency, retries=args.retries,
+                                backoff=args.backoff, limit=args.limit, mode=args.mode)
+    started = time.perf_counter()
+    try:
+        counts = asyncio.run(pregenerator.run(todo))
+    except KeyboardInterrupt:
+        counts = pregenerator.counts
+        print("Interrupted; run the same command again to resume")
+    elapsed = time.perf_counter() - started
+    recipe_store.close()
+
+    print(f"Cached {counts['recipes']} recipes and {counts['details']} top recipe details for "
+          f"{counts['lists']} lists in {elapsed:.1f}s: {counts['recipes'] / max(elapsed, 1e-9):.1f} recipes/s, "
+          f"{counts['lists'] / max(elapsed, 1e-9):.1f} lists/s")
+    print(f"Provider calls: {provider_stats().get('calls', 0)}, retries: {counts['retries']}, failed: {counts['failed']}")
+    if pregenerator.failed:
+        print("Failed lists (not checkpointed, a rerun tries them again):")
+        for key in pregenerator.failed:
+            print(f"  {key}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from .ingredients import canonical_key
+from .models import RESPONSE_FORMATS, missing_ingredient_names, parse_output
+from .metrics import OPENAI_CALLS, OPENAI_TOKENS, observe, span
+
+log = logging.getLogger(__name__)
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo-0125")
+# Structured outputs (a JSON schema the completion must follow) need gpt-4o-mini or newer;
+# other models get plain JSON mode. "true" or "false" overrides the guess from the model name
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "auto").lower()
+
+
+def use_structured_output(model: str) -> bool:
+    if OPENAI_STRUCTURED_OUTPUT in ("true", "false"):
+        return OPENAI_STRUCTURED_OUTPUT == "true"
+    return model.startswith(STRUCTURED_OUTPUT_MODELS)
+
+
+# The embed shows at most ~1800 characters of instructions (~4 characters per token),
+# so there is no point paying for more output than that
+MAX_INSTRUCTION_CHARS = 1800
+DETAIL_MAX_TOKENS = MAX_INSTRUCTION_CHARS // 4 + 100
+
+# Every completion starts with the same static system prompt so OpenAI's prompt
+# prefix caching can reuse it; only the short user message changes per call.
+# Answers only carry what the embed shows, with short keys, to keep output tokens down
+SYSTEM_PROMPT = """You are a helpful assistant that writes recipe ideas from a list of ingredients.
+Always answer with a single JSON object and nothing else.
+
+A recipe idea looks like this:
+{"title": "Recipe Name", "uses": 3, "missing": ["ingredient1", "ingredient2"]}
+"uses" counts how many of the user's ingredients the recipe uses and "missing" lists
+the ingredients it needs that weren't in the user's list.
+
+Instructions are a single string of numbered steps: "1. Chop the onion. 2. ..." """
+
+
+class ProviderError(Exception):
+    """Raised when a provider can't produce an answer"""
+
+
+class RecipeProvider:
+    """Where recipe ideas and details come from.
+
+    The recipe client handles caching, IDs and storage; a provider only turns
+    ingredients into recipe JSON:
+
+    * ``search``   -> list of recipe search results
+    * ``detail``   -> detailed recipe information for one recipe
+    * ``combined`` -> {"recipes": [...], "top": {...details of recipes[0]}}
+    * ``stream``   -> JSON text of {"top": {..., "instructions"}, "recipes": [...]} in pieces
+    """
+
+    name = "base"
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        recipes = await self.search(ingredients, limit)
+        top = await self.detail(recipes[0].get("id", 0), recipes[0]) if recipes else None
+        return {"recipes": recipes, "top": top}
+
+    async def stream(self, ingredients: str, limit: int) -> AsyncIterator[str]:
+        """Providers without real streaming send the finished answer in a few pieces"""
+        result = await self.combined(ingredients, limit)
+        recipes = result.get("recipes") or []
+        top = dict(recipes[0]) if recipes else {}
+        top.pop("id", None)
+        if top:
+            top["instructions"] = (result.get("top") or {}).get("instructions", "")
+        text = json.dumps({"top": top, "recipes": recipes[1:]})
+        for start in range(0, len(text), 256):
+            yield text[start:start + 256]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class OpenAIProvider(RecipeProvider):
+    """Recipes written by an OpenAI chat model in JSON mode"""
+
+    name = "openai"
+
+    def __init__(self, client=None, api_key: Optional[str] = None, model: str = OPENAI_MODEL,
+                 combined_max_tokens: int = 1000, structured_output: Optional[bool] = None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.combined_max_tokens = combined_max_tokens
+        self.structured_output = use_structured_output(model) if structured_output is None else structured_output
+        if client is None and not self.api_key:
+            log.warning("OPENAI_API_KEY not found in environment variables!")
+        # Built on first use: importing openai takes longer than the rest of startup
+        self._client = client
+        # Running totals of OpenAI token usage
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        prompt = f"""Generate {limit} unique recipe ideas using these ingredients: {ingredients}.
+        Respond with {{"recipes": [...]}} holding the {limit} recipe ideas."""
+        return await self._chat_json(prompt, "search")
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if summary and summary.get("title"):
+            missed = missing_ingredient_names(summary)
+            description = f'the recipe "{summary["title"]}"'
+            if missed:
+                description += f" (it also needs: {', '.join(missed)})"
+        else:
+            description = "a recipe"
+
+        prompt = f"""Write step-by-step instructions for {description}.
+        Keep them under {MAX_INSTRUCTION_CHARS} characters.
+        Respond with {{"instructions": "..."}}."""
+        return await self._chat_json(prompt, "detail", max_tokens=DETAIL_MAX_TOKENS)
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        prompt = f"""Generate {limit} unique recipe ideas using these ingredients: {ingredients}.
+        Respond with {{"recipes": [...], "top": {{"instructions": "..."}}}} where "recipes" holds the {limit} recipe ideas
+        and "top" has the instructions for the first one, under {MAX_INSTRUCTION_CHARS} characters."""
+        return await self._chat_json(prompt, "combined", max_tokens=self.combined_max_tokens)
+
+    async def stream(self, ingredients: str, limit: int) -> AsyncIterator[str]:
+        prompt = f"""Generate {limit} unique recipe ideas using these ingredients: {ingredients}.
+        Respond with {{"top": {{...}}, "recipes": [...]}} where "top" is the best recipe idea with its
+        "instructions" added after "missing", and "recipes" holds {limit - 1} other recipe ideas.
+        Keep the instructions under {MAX_INSTRUCTION_CHARS} characters."""
+        self._check_configured()
+        started = time.perf_counter()
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format=self._response_format("stream"),
+            stream=True,
+            stream_options={"include_usage": True},
+            max_tokens=self.combined_max_tokens,
+        )
+        self.usage["calls"] += 1
+        OPENAI_CALLS.inc(operation="stream")
+        first_token = True
+        async for chunk in stream:
+            # With include_usage the last chunk carries the token counts and no choices
+            self._record_usage(getattr(chunk, "usage", None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token:
+                    observe("openai_first_token", time.perf_counter() - started)
+                    first_token = False
+                yield chunk.choices[0].delta.content
+        observe("openai", time.perf_counter() - started)
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                from openai import AsyncOpenAI
+                self._client = AsyncOpenAI(api_key=self.api_key)
+            except Exception as e:
+                log.error("Error initializing OpenAI client: %s", e)
+        return self._client
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "model": self.model, **self.usage}
+
+    def _check_configured(self) -> None:
+        if not self.api_key or not self.client:
+            raise ProviderError("OpenAI API key not configured properly")
+
+    def _response_format(self, kind: str) -> Dict[str, Any]:
+        return RESPONSE_FORMATS[kind] if self.structured_output else {"type": "json_object"}
+
+    async def _chat_json(self, prompt: str, kind: str, max_tokens: int = None):
+        """Run one chat completion for ``kind`` with the shared system prompt and validate the result"""
+        self._check_configured()
+        kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        with span("openai"):
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format=self._response_format(kind),
+                **kwargs
+            )
+        self.usage["calls"] += 1
+        OPENAI_CALLS.inc(operation=kind)
+        self._record_usage(getattr(response, "usage", None))
+        with span("model_parse"):
+            return parse_output(kind, response.choices[0].message.content or "")
+
+    def _record_usage(self, usage) -> None:
+        if usage is not None:
+            self.usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self.usage["completion_tokens"] += usage.completion_tokens or 0
+            OPENAI_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+            OPENAI_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+
+
+# Building blocks for the local generator
+_STYLES = ["Rustic", "Quick", "Spicy", "Creamy", "Crispy", "Smoky", "Zesty", "Herby", "Golden", "Hearty",
+           "Garlicky", "One-Pan", "Sheet-Pan", "Slow-Cooked", "Honey-Glazed", "Lemony"]
+_DISHES = ["Stir-Fry", "Skillet", "Stew", "Salad", "Bake", "Bowl", "Soup", "Curry", "Tacos", "Frittata",
+           "Pasta", "Risotto", "Wraps", "Casserole", "Pilaf", "Traybake"]
+_PANTRY = ["garlic", "onion", "olive oil", "butter", "lemon", "parsley", "paprika", "cream", "thyme", "ginger",
+           "soy sauce", "chili flakes", "cumin", "honey", "parmesan", "scallions", "coriander", "stock",
+           "tomato paste", "black pepper"]
+_UNITS = ["1 cup", "2 cups", "1 tbsp", "2 tbsp", "1 tsp", "200 g", "400 g", "2", "1 handful of", "1 pinch of"]
+_HEAT = ["low", "medium-low", "medium", "medium-high", "high"]
+_VESSELS = ["large skillet", "heavy pot", "wok", "roasting tin", "deep pan", "Dutch oven"]
+_COOK_VERBS = ["sear", "saute", "roast", "simmer", "toss", "brown", "braise", "stir-fry"]
+_FINISHES = ["a squeeze of lemon", "fresh herbs", "a drizzle of olive oil", "toasted seeds", "grated cheese",
+             "a spoonful of yogurt"]
+
+
+class LocalProvider(RecipeProvider):
+    """Generates varied but deterministic recipes without any network calls.
+
+    The same ingredients (or recipe ID) always give the same answer, which makes
+    it useful for development, demos, load tests and bulk generation.
+    """
+
+    name = "local"
+
+    def __init__(self, seed: int = 0, latency: float = 0.0):
+        self.seed = seed
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        await self._wait()
+        return self._recipes(ingredients, limit)
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._wait()
+        return self._detail(recipe_id, summary)
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        await self._wait()
+        recipes = self._recipes(ingredients, limit)
+        return {"recipes": recipes, "top": self._detail(recipes[0]["id"], recipes[0]) if recipes else None}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "calls": self.calls}
+
+    async def _wait(self) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _rng(self, *parts) -> random.Random:
+        digest = hashlib.blake2b(":".join(str(part) for part in (self.seed,) + parts).encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, "big"))
+
+    def _recipes(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        have = [item for item in canonical_key(ingredients).split(",") if item] or ["pantry staples"]
+        rng = self._rng("search", ",".join(have), limit)
+        missing_pool = [item for item in _PANTRY if item not in have]
+        recipes, titles = [], set()
+        # Each ingredient can head len(_STYLES) * len(_DISHES) titles of its own and as many with each
+        # partner, so never ask for more than that. Titles are drawn at random, which still makes the
+        # last few slow to find, hence the cap on draws; past it the search returns fewer recipes
+        limit = min(limit, len(have) * len(have) * len(_STYLES) * len(_DISHES))
+        for _ in range(limit * 50):
+            if len(recipes) >= limit:
+                break
+            main = have[len(recipes) % len(have)]
+            uses = rng.randint(1, len(have))
+            title = f"{rng.choice(_STYLES)} {main.title()} {rng.choice(_DISHES)}"
+            if uses > 1:
+                partner = rng.choice([item for item in have if item != main])
+                title = f"{rng.choice(_STYLES)} {main.title()} and {partner.title()} {rng.choice(_DISHES)}"
+            if title in titles:
+                continue
+            titles.add(title)
+            recipes.append({
+                "id": rng.randint(10000, 99999),
+                "title": title,
+                "image": f"https://via.placeholder.com/312x231?text={title.replace(' ', '+')}",
+                "usedIngredientCount": uses,
+                "missedIngredients": [{"name": name} for name in rng.sample(missing_pool, min(len(missing_pool), rng.randint(1, 3)))],
+            })
+        return recipes
+
+    def _detail(self, recipe_id: int, summary: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        rng = self._rng("detail", recipe_id, (summary or {}).get("title", ""))
+        title = (summary or {}).get("title") or f"{rng.choice(_STYLES)} {rng.choice(_DISHES)}"
+        missed = missing_ingredient_names(summary or {})
+        words = [word for word in title.lower().split() if word.title() not in _STYLES + _DISHES and word != "and"]
+        main = " and ".join(words) or "vegetables"
+        fat, spice = rng.choice(["olive oil", "butter", "sesame oil"]), rng.choice(["paprika", "cumin", "thyme", "chili flakes"])
+
+        steps = [
+            f"Prepare the {main}: wash, trim and cut everything into even, bite-sized pieces.",
+            f"Heat the {fat} in a {rng.choice(_VESSELS)} over {rng.choice(_HEAT)} heat.",
+            f"{rng.choice(_COOK_VERBS).capitalize()} the {main} for {rng.randint(4, 12)} minutes, stirring now and then.",
+        ]
+        if missed:
+            steps.append(f"Add the {', '.join(missed)} and cook for another {rng.randint(2, 6)} minutes.")
+        steps += [
+            f"Season with {spice}, salt and pepper, then let everything {rng.choice(['simmer', 'rest', 'settle'])} "
+            f"for {rng.randint(2, 10)} minutes so the flavours come together.",
+            f"Taste, adjust the seasoning and serve hot with {rng.choice(_FINISHES)}.",
+        ]
+        instructions = " ".join(f"{number}. {step}" for number, step in enumerate(steps, 1))
+
+        return {
+            "id": recipe_id,
+            "title": title,
+            "instructions": instructions[:MAX_INSTRUCTION_CHARS],
+            "extendedIngredients": [
+                {"original": f"{rng.choice(_UNITS)} {item}"} for item in words + missed + [fat, spice]
+            ],
+            "summary": f"A {rng.choice(['simple', 'comforting', 'bright', 'weeknight'])} dish built around {main}.",
+        }
+
+
+def _replay_key(op: str, *args) -> str:
+    if op == "detail":
+        return str(args[0])
+    ingredients, limit = args
+    return f"{canonical_key(ingredients)}|{limit}"
+
+
+class ReplayProvider(RecipeProvider):
+    """Answers from a recording made by RecordingProvider (one JSON object per line)
+
+    Requests that weren't recorded go to ``fallback`` if there is one, otherwise
+    they raise ProviderError.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, fallback: Optional[RecipeProvider] = None):
+        self.path = path
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self._answers: Dict[tuple, Any] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as recording:
+                for line in recording:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._answers[(record["op"], record["key"])] = record["result"]
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        return await self._answer("search", ingredients, limit)
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._answer("detail", recipe_id, summary)
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        return await self._answer("combined", ingredients, limit)
+
+    async def stream(self, ingredients: str, limit: int) -> AsyncIterator[str]:
+        text = self._answers.get(("stream", _replay_key("stream", ingredients, limit)))
+        if text is None:
+            # Not recorded as a stream; a recorded combined answer (or the fallback) still works
+            async for piece in super().stream(ingredients, limit):
+                yield piece
+            return
+        self.hits += 1
+        for start in range(0, len(text), 256):
+            yield text[start:start + 256]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "recorded": len(self._answers), "hits": self.hits, "misses": self.misses}
+
+    async def _answer(self, op: str, *args):
+        key = _replay_key(op, *args)
+        if (op, key) in self._answers:
+            self.hits += 1
+            # Hand out a copy, the recipe client adds IDs to what it gets back
+            return json.loads(json.dumps(self._answers[(op, key)]))
+        self.misses += 1
+        if self.fallback is None:
+            raise ProviderError(f"No recorded answer for {op} {key}")
+        return await getattr(self.fallback, op)(*args)
+
+
+class RecordingProvider(RecipeProvider):
+    """Passes requests through to another provider and appends every answer to a replay file"""
+
+    def __init__(self, inner: RecipeProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = inner.name
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        return self._record("search", _replay_key("search", ingredients, limit), await self.inner.search(ingredients, limit))
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._record("detail", _replay_key("detail", recipe_id), await self.inner.detail(recipe_id, summary))
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        return self._record("combined", _replay_key("combined", ingredients, limit), await self.inner.combined(ingredients, limit))
+
+    async def stream(self, ingredients: str, limit: int) -> AsyncIterator[str]:
+        pieces = []
+        async for piece in self.inner.stream(ingredients, limit):
+            pieces.append(piece)
+            yield piece
+        # Only reached when the stream ran to the end, so a half-read answer is never recorded
+        self._record("stream", _replay_key("stream", ingredients, limit), "".join(pieces))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.inner.stats(), "recording_to": self.path}
+
+    def _record(self, op: str, key: str, result):
+        with open(self.path, "a", encoding="utf-8") as recording:
+            recording.write(json.dumps({"op": op, "key": key, "result": result}) + "\n")
+        return result
+
+
+class HedgedProvider(RecipeProvider):
+    """Sends a second, backup request when the primary is slow, and takes whichever answers first.
+
+    LLM latency has a long tail: most answers take a couple of seconds, a few
+    take much longer. If the primary hasn't answered after ``delay`` seconds
+    (or has already failed), the same request goes to ``backup`` too. The
+    first successful answer wins and the other request is cancelled. For
+    streams the race is for the first piece of text.
+    """
+
+    def __init__(self, primary: RecipeProvider, backup: RecipeProvider, delay: float = 3.0):
+        self.primary = primary
+        self.backup = backup
+        self.delay = delay
+        self.name = f"{primary.name}+hedge:{backup.name}"
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    async def search(self, ingredients: str, limit: int) -> List[Dict[str, Any]]:
+        return (await self._race(lambda p: p.search(ingredients, limit)))[1]
+
+    async def detail(self, recipe_id: int, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return (await self._race(lambda p: p.detail(recipe_id, summary)))[1]
+
+    async def combined(self, ingredients: str, limit: int) -> Dict[str, Any]:
+        return (await self._race(lambda p: p.combined(ingredients, limit)))[1]
+
+    async def stream(self, ingredients: str, limit: int) -> AsyncIterator[str]:
+        streams = {self.primary: self.primary.stream(ingredients, limit), self.backup: self.backup.stream(ingredients, limit)}
+        try:
+            winner, first = await self._race(lambda p: streams[p].__anext__())
+            yield first
+            async for piece in streams[winner]:
+                yield piece
+        finally:
+            for stream in streams.values():
+                await stream.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "delay": self.delay,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "backup_wins": self.backup_wins,
+            "primary": self.primary.stats(),
+            "backup": self.backup.stats(),
+        }
+
+    async def _race(self, call: Callable[[RecipeProvider], Any]):
+        """Returns (provider, result) for the first provider to answer successfully"""
+        self.requests += 1
+        tasks = {asyncio.ensure_future(call(self.primary)): self.primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay)
+            first = next(iter(tasks))
+            if done and _task_error(first) is None:
+                return self.primary, first.result()
+
+            self.hedged += 1
+            tasks[asyncio.ensure_future(call(self.backup))] = self.backup
+            pending = {task for task in tasks if not task.done()}
+            error = _task_error(first) if first.done() else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if _task_error(task) is None:
+                        if tasks[task] is self.backup:
+                            self.backup_wins += 1
+                        return tasks[task], task.result()
+                    error = _task_error(task)
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+
+
+def _task_error(task: asyncio.Future) -> Optional[BaseException]:
+    """The exception a finished task ended with; exception() itself raises for a cancelled task"""
+    if task.cancelled():
+        return asyncio.CancelledError()
+    return task.exception()
+
+
+def build_provider(name: str, replay_path: Optional[str] = None, **kwargs) -> RecipeProvider:
+    """Create a provider by name: "openai", "local" or "replay" (falls back to local)"""
+    if name == "openai":
+        return OpenAIProvider(**kwargs)
+    if name == "local":
+        return LocalProvider(**kwargs)
+    if name == "replay":
+        return ReplayProvider(replay_path or "recipes.replay.jsonl", fallback=LocalProvider())
+    raise ValueError(f"Unknown recipe provider {name!r}")
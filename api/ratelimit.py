@@ -0,0 +1,264 @@
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by e.g. user ID: ``burst`` requests at once, refilled at ``rate`` per second.
+
+    Buckets are refilled lazily when they are checked, so ``allow`` is O(1).
+    They live in an LRU dict; a bucket left alone for ``burst / rate`` seconds
+    is full again, exactly like a bucket that was never created, so idle
+    buckets are dropped from the cold end without changing any decision. On
+    top of that at most ``max_keys`` buckets are kept, evicting the least
+    recently used ones first.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_after = burst / rate
+        self._clock = clock
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        """Take ``cost`` tokens from ``key``'s bucket if it has them"""
+        now = self._clock()
+        with self._lock:
+            bucket = self._refill(key, now)
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def refund(self, key: Hashable, cost: float = 1.0) -> None:
+        """Give back tokens taken by ``allow`` when the request was turned away further on"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+                self.allowed -= 1
+
+    def retry_after(self, key: Hashable, cost: float = 1.0) -> float:
+        """Seconds until ``key`` could spend ``cost`` tokens"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            tokens = min(self.burst, bucket[0] + (self._clock() - bucket[1]) * self.rate)
+            return max(0.0, (cost - tokens) / self.rate)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
+
+    def _refill(self, key: Hashable, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            self._evict(now)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict(self, now: float) -> None:
+        # Amortized O(1): every bucket is evicted at most once after being created
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_keys and now - updated < self.idle_after:
+                break
+            del self._buckets[key]
+            self.evicted += 1
+
+
+class SharedTokenBucketLimiter:
+    """TokenBucketLimiter whose buckets live in a SQLite table shared by every worker process
+
+    With ``python -m api.serve --workers N`` each process would otherwise
+    grant the full rate and burst on its own, N times the configured budget.
+    A check is one UPSERT that refills the bucket and takes the tokens
+    atomically, so concurrent workers never both spend the last one. If the
+    database stays locked past ``busy_timeout`` the check falls back to an
+    in-process limiter with the same settings. Even so a check is a write
+    to a shared file, so callers on the event loop run ``allow`` (or
+    ``AdmissionControl.admit``) in a thread.
+
+    Every ``prune_every`` checks, buckets idle for ``burst / rate`` seconds
+    (full again, so no different from a missing one) are deleted, and then
+    the least recently used ones past ``max_keys``.
+    """
+
+    def __init__(self, path: str, table: str, rate: float, burst: float, max_keys: int = 100_000,
+                 busy_timeout: float = 0.05, prune_every: int = 1000, clock: Callable[[], float] = time.time):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.table = table
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_after = burst / rate
+        self.prune_every = prune_every
+        self._clock = clock
+        self._lock = Lock()
+        self._checks = 0
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.fallbacks = 0
+        # Used only while the shared table can't be reached
+        self.local = TokenBucketLimiter(rate, burst, max_keys=max_keys)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                granted INTEGER NOT NULL
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_updated ON {table} (updated)")
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        """Take ``cost`` tokens from ``key``'s bucket if it has them"""
+        now = self._clock()
+        # Tokens in the bucket once refilled for the time since its last check
+        refilled = f"min(:burst, {self.table}.tokens + (:now - {self.table}.updated) * :rate)"
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"""INSERT INTO {self.table} (key, tokens, updated, granted) VALUES (:key, :burst - :cost, :now, 1)
+                        ON CONFLICT (key) DO UPDATE SET
+                            granted = {refilled} >= :cost,
+                            tokens = CASE WHEN {refilled} >= :cost THEN {refilled} - :cost ELSE {refilled} END,
+                            updated = :now
+                        RETURNING granted""",
+                    {"key": str(key), "burst": float(self.burst), "cost": cost, "now": now, "rate": self.rate},
+                ).fetchone()
+                self._checks += 1
+                if self._checks % self.prune_every == 0:
+                    self._prune(now)
+        except sqlite3.Error as e:
+            self.fallbacks += 1
+            log.warning("Shared rate limit check failed, using this process's buckets: %s", e,
+                        extra={"event": "rate_limit_fallback"})
+            return self.local.allow(key, cost)
+        granted = bool(row[0])
+        if granted:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return granted
+
+    def _prune(self, now: float) -> None:
+        idle = self._conn.execute(f"DELETE FROM {self.table} WHERE updated < ?", (now - self.idle_after,)).rowcount
+        over = self._conn.execute(
+            f"""DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY updated
+                    LIMIT max(0, (SELECT COUNT(*) FROM {self.table}) - ?))""",
+            (self.max_keys,),
+        ).rowcount
+        self.evicted += idle + over
+
+    def refund(self, key: Hashable, cost: float = 1.0) -> None:
+        """Give back tokens taken by ``allow`` when the request was turned away further on"""
+        try:
+            with self._lock:
+                self._conn.execute(f"UPDATE {self.table} SET tokens = min(?, tokens + ?) WHERE key = ?",
+                                   (float(self.burst), cost, str(key)))
+            self.allowed -= 1
+        except sqlite3.Error:
+            self.local.refund(key, cost)
+
+    def retry_after(self, key: Hashable, cost: float = 1.0) -> float:
+        """Seconds until ``key`` could spend ``cost`` tokens"""
+        try:
+            with self._lock:
+                row = self._conn.execute(f"SELECT tokens, updated FROM {self.table} WHERE key = ?",
+                                         (str(key),)).fetchone()
+        except sqlite3.Error:
+            return self.local.retry_after(key, cost)
+        if row is None:
+            return 0.0
+        tokens = min(self.burst, row[0] + (self._clock() - row[1]) * self.rate)
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def __len__(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        except sqlite3.Error:
+            return len(self.local)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "buckets": len(self),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "fallbacks": self.fallbacks,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class Admission(NamedTuple):
+    allowed: bool
+    scope: Optional[str] = None  # "user" or "guild" when rejected
+    retry_after: float = 0.0
+
+
+class AdmissionControl:
+    """Per-user and per-guild token buckets checked before a request costs an LLM call
+
+    A request has to get a token from both its user's and its guild's bucket.
+    If the guild is out of tokens the user's token is given back, so a busy
+    guild doesn't also use up its members' own allowance.
+    """
+
+    def __init__(self, user_limiter, guild_limiter):
+        self.users = user_limiter
+        self.guilds = guild_limiter
+
+    def admit(self, user_id: Optional[str], guild_id: Optional[str]) -> Admission:
+        user_key = user_id or "unknown"
+        if not self.users.allow(user_key):
+            return Admission(False, "user", self.users.retry_after(user_key))
+        if guild_id and not self.guilds.allow(guild_id):
+            self.users.refund(user_key)
+            return Admission(False, "guild", self.guilds.retry_after(guild_id))
+        return Admission(True)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {"user": self.users.stats(), "guild": self.guilds.stats()}
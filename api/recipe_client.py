@@ -1,152 +1,373 @@
 import os
-import aiohttp
 import asyncio
 import json
+import logging
 from fastapi import FastAPI, HTTPException
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from .cache import SharedCache, TieredCache, TTLCache
+from .ingredients import canonical_key
+from .recipe_store import RecipeStore, stable_recipe_id
+from .ingredient_index import IngredientIndex, recipe_ingredients
+from .singleflight import SingleFlight
+from .partial_json import parse_partial_json
+from .models import output_counts, parse_output, wire_fields
+from .providers import RecipeProvider, HedgedProvider, RecordingProvider, build_provider
+from .metrics import add_collector, span
 
 # Load environment variables
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 app = FastAPI()
 
-# Get OpenAI API key with better error handling
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    print("WARNING: OPENAI_API_KEY not found in environment variables!")
+# Where recipes come from: "openai" (default), "local" (deterministic generator, no API
+# key needed) or "replay" (answers recorded with RECIPE_RECORD_PATH, the rest generated locally)
+RECIPE_PROVIDER = os.getenv("RECIPE_PROVIDER", "openai")
+RECIPE_REPLAY_PATH = os.getenv("RECIPE_REPLAY_PATH", "recipes.replay.jsonl")
+RECIPE_RECORD_PATH = os.getenv("RECIPE_RECORD_PATH", "")
 
-# Initialize AsyncOpenAI client
-try:
-    client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    client = None
+# "combined" asks for the candidates and the top pick's instructions in one completion,
+# "two_call" searches first and then asks for the details separately
+RECIPE_MODE = os.getenv("RECIPE_MODE", "two_call")
+COMBINED_MAX_TOKENS = int(os.getenv("RECIPE_COMBINED_MAX_TOKENS", "1000"))
 
-async def search_recipes_by_ingredients(ingredients: str, limit: int = 5):
-    """Search for recipes based on provided ingredients using OpenAI"""
-    
-    if not client or not OPENAI_API_KEY:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured properly")
-    
+# Hedging: if the provider hasn't answered after RECIPE_HEDGE_DELAY seconds, ask
+# RECIPE_HEDGE_PROVIDER as well ("openai" for a duplicate request, or "local") and use
+# whichever answers first. Off unless a hedge provider is set
+RECIPE_HEDGE_PROVIDER = os.getenv("RECIPE_HEDGE_PROVIDER", "")
+RECIPE_HEDGE_DELAY = float(os.getenv("RECIPE_HEDGE_DELAY", "3.0"))
+
+def _make_provider(name: str) -> RecipeProvider:
+    if name == "openai":
+        return build_provider(name, combined_max_tokens=COMBINED_MAX_TOKENS)
+    return build_provider(name, replay_path=RECIPE_REPLAY_PATH)
+
+provider = _make_provider(RECIPE_PROVIDER)
+if RECIPE_RECORD_PATH:
+    provider = RecordingProvider(provider, RECIPE_RECORD_PATH)
+if RECIPE_HEDGE_PROVIDER:
+    provider = HedgedProvider(provider, _make_provider(RECIPE_HEDGE_PROVIDER), delay=RECIPE_HEDGE_DELAY)
+
+async def _generate(operation: str, *args):
+    """Ask the provider for recipe JSON, turning failures into a 500 for the endpoints"""
     try:
-        # Create a prompt for OpenAI
-        prompt = f"""Generate {limit} unique recipe ideas using these ingredients: {ingredients}. 
-        For each recipe, provide:
-        1. A title
-        2. A list of all ingredients with measurements (including the ones provided plus any additions)
-        3. A list of ingredients that weren't in the original list (as "missedIngredients")
-        4. A count of how many provided ingredients are used (as "usedIngredientCount")
-        5. A URL for an image that would represent this dish (as "image")
-        6. A unique ID for each recipe (a simple number between 10000 and 99999)
-
-        Format the response as a JSON array of recipe objects with this structure:
-        [
-          {{
-            "id": 12345,
-            "title": "Recipe Name",
-            "image": "https://example.com/image.jpg",
-            "usedIngredientCount": 3,
-            "missedIngredients": [
-              {{ "name": "ingredient1" }},
-              {{ "name": "ingredient2" }}
-            ]
-          }}
-        ]
-        """
-
-        # Call OpenAI API asynchronously
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates recipe ideas based on ingredients."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        # Extract and parse the JSON response
-        recipes_json = json.loads(response.choices[0].message.content)
-        
-        # If OpenAI returns a different structure, map it to match Spoonacular's format
-        if isinstance(recipes_json, dict) and "recipes" in recipes_json:
-            recipes = recipes_json["recipes"]
-        else:
-            recipes = recipes_json
-            
-        return recipes
-        
+        return await getattr(provider, operation)(*args)
     except Exception as e:
-        print(f"OpenAI API Error: {str(e)}")
+        log.error("Recipe provider error: %s", e, extra={"event": "provider_error"})
         raise HTTPException(status_code=500, detail=f"API Error: {str(e)}")
 
+# Cache of search results keyed by the canonical ingredient set, so that
+# "Chicken, rice" and "rice,chicken" only cost one OpenAI call
+RECIPE_CACHE_SIZE = int(os.getenv("RECIPE_CACHE_SIZE", "1024"))
+RECIPE_CACHE_TTL = float(os.getenv("RECIPE_CACHE_TTL", "86400"))
+
+# Persistent store of every recipe the search produced and every detail document generated
+RECIPE_DB_PATH = os.getenv("RECIPE_DB_PATH", "recipes.db")
+recipe_store = RecipeStore(RECIPE_DB_PATH)
+
+# With several worker processes (python -m api.serve --workers N) each one has its own
+# in-memory cache; the shared tier in the recipe database lets a search one worker
+# answered be a hit in all of them. An in-memory database can't be shared, so it's off there
+RECIPE_SHARED_CACHE = os.getenv("RECIPE_SHARED_CACHE", "true").lower() != "false" and RECIPE_DB_PATH != ":memory:"
+search_cache = TTLCache(maxsize=RECIPE_CACHE_SIZE, ttl=RECIPE_CACHE_TTL)
+if RECIPE_SHARED_CACHE:
+    search_cache = TieredCache(search_cache, SharedCache(RECIPE_DB_PATH, "search_cache", ttl=RECIPE_CACHE_TTL))
+
+# Inverted index over the ingredients of every stored recipe. A search is answered
+# locally when at least RECIPE_INDEX_MIN_RESULTS stored recipes (0 = the requested
+# limit) use at least RECIPE_INDEX_MIN_COVERAGE of the user's ingredients; only
+# otherwise is the provider asked. Set the coverage above 1 to always ask the provider
+RECIPE_INDEX_MIN_COVERAGE = float(os.getenv("RECIPE_INDEX_MIN_COVERAGE", "1.0"))
+RECIPE_INDEX_MIN_RESULTS = int(os.getenv("RECIPE_INDEX_MIN_RESULTS", "0"))
+ingredient_index = IngredientIndex()
+ingredient_index.rebuild(recipe_store.ingredient_rows())
+index_counts = {"answered": 0, "fallback": 0}
+
+# Concurrent identical requests share one in-flight OpenAI call
+inflight = SingleFlight()
+
+# Detail generation for the other top search hits runs in the background,
+# limited to a few concurrent OpenAI calls
+PREFETCH_TOP_K = int(os.getenv("RECIPE_PREFETCH_TOP_K", "3"))
+PREFETCH_CONCURRENCY = int(os.getenv("RECIPE_PREFETCH_CONCURRENCY", "4"))
+_prefetch_semaphore = None
+_prefetch_tasks = set()
+
+async def search_recipes_by_ingredients(ingredients: str, limit: int = 5):
+    """Search for recipes based on provided ingredients, using the cache before OpenAI
+
+    The returned list is shared with the cache, so callers should treat it as read-only.
+    """
+    key = (canonical_key(ingredients), limit)
+    recipes = search_cache.get(key)
+    if recipes is None:
+        recipes = _search_local(key)
+    if recipes is not None:
+        return recipes
+
+    return await inflight.do(("search", key), _search_and_store, key)
+
+def cached_recipe(ingredients: str, limit: int = 5):
+    """(recipes, top detail) if both can be answered without the provider, else None
+
+    Looks only at the search cache, the ingredient index and stored details,
+    so it is cheap enough to call inline while answering an interaction.
+    """
+    key = (canonical_key(ingredients), limit)
+    recipes = search_cache.get(key)
+    if recipes is None:
+        recipes = _search_local(key, count_fallback=False)
+    if not recipes:
+        return None
+    detail = recipe_store.get_detail(recipes[0]["id"])
+    if detail is None or not detail.get("instructions"):
+        return None
+    return recipes, detail
+
+def _search_local(key, count_fallback: bool = True):
+    """Answer a search from recipes we already have, or None if they don't cover it well enough"""
+    ingredients, limit = key
+    matches = ingredient_index.search(ingredients.split(","), limit, RECIPE_INDEX_MIN_COVERAGE)
+    if not matches or len(matches) < (RECIPE_INDEX_MIN_RESULTS or limit):
+        if count_fallback:
+            index_counts["fallback"] += 1
+        return None
+
+    summaries = recipe_store.get_recipes([match.recipe_id for match in matches], include_detail=False)
+    recipes = []
+    for match in matches:
+        if match.recipe_id in summaries:
+            # Used and missed ingredients are relative to this search, not the one that found the recipe
+            recipes.append({
+                **summaries[match.recipe_id],
+                "usedIngredientCount": match.used,
+                "missedIngredients": [{"name": name} for name in match.missed],
+            })
+    index_counts["answered"] += 1
+    search_cache.set(key, recipes)
+    return recipes
+
+def _store_recipes(ingredients: str, recipes):
+    """Save newly generated recipes and index them; blocks on the database, so run it in a thread"""
+    recipe_store.save_recipes(recipes)
+    _index_recipes(ingredients, recipes)
+
+def _index_recipes(ingredients: str, recipes):
+    """Remember which ingredients newly generated recipes use and add them to the index"""
+    query = ingredients.split(",") if ingredients else []
+    rows = {recipe["id"]: recipe_ingredients(recipe, query) for recipe in recipes}
+    recipe_store.save_ingredients(rows)
+    for recipe_id, items in rows.items():
+        ingredient_index.add(recipe_id, items)
+
+async def _search_and_store(key):
+    """Generate recipes for a canonical key and remember them in the store and cache"""
+    ingredients, limit = key
+    recipes = await _generate("search", ingredients.replace(",", ", "), limit)
+    recipes = _assign_stable_ids(recipes)
+    await asyncio.to_thread(_store_recipes, ingredients, recipes)
+    search_cache.set(key, recipes)
+    return recipes
+
+def _assign_stable_ids(recipes):
+    """Replace the model's made-up IDs with IDs derived from the title and drop duplicates"""
+    unique = {}
+    for recipe in recipes:
+        if isinstance(recipe, dict) and recipe.get("title"):
+            recipe["id"] = stable_recipe_id(recipe["title"])
+            unique.setdefault(recipe["id"], recipe)
+    return list(unique.values())
+
+def cache_stats():
+    """Hit, miss and eviction counters for the recipe search cache"""
+    return search_cache.stats()
+
+def coalescing_stats():
+    """How many OpenAI calls were saved by sharing in-flight requests"""
+    return inflight.stats()
+
+def index_stats():
+    """Size of the ingredient index and how often it answered a search on its own"""
+    return {**ingredient_index.stats(), **index_counts}
+
+def provider_stats():
+    """Which provider is answering, with its call, token and hedging counters"""
+    return {**provider.stats(), "output": dict(output_counts)}
+
+def _collect_metrics():
+    """Cache, coalescing and index gauges for /metrics, read when it is scraped"""
+    stats = search_cache.stats()
+    yield "recipe_cache_hit_ratio", "Hit rate of the recipe search cache", {}, stats["hit_rate"]
+    yield "recipe_cache_hits", "Recipe search cache hits", {}, stats["hits"]
+    yield "recipe_cache_misses", "Recipe search cache misses", {}, stats["misses"]
+    yield "recipe_cache_entries", "Entries in the recipe search cache", {}, stats["size"]
+    yield "recipe_provider_in_flight", "Distinct provider calls currently running", {}, inflight.stats()["in_flight"]
+    yield "recipe_provider_calls_saved", "Provider calls saved by sharing in-flight requests", {}, inflight.saved
+    for result, value in output_counts.items():
+        yield "recipe_model_outputs", "Model outputs by how they passed validation", {"result": result}, value
+    for name, value in index_counts.items():
+        yield "recipe_index_searches", "Searches by how the ingredient index answered them", {"result": name}, value
+
+add_collector(_collect_metrics)
+
 async def get_recipe_information(recipe_id: int):
-    """Get detailed information for a specific recipe using OpenAI"""
-    
-    if not client or not OPENAI_API_KEY:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured properly")
-    
+    """Get detailed information for a specific recipe, only asking OpenAI on a real miss"""
+    detail = recipe_store.get_detail(recipe_id)
+    if detail is not None:
+        return detail
+
+    return await inflight.do(("detail", recipe_id), _generate_and_store_detail, recipe_id)
+
+def prefetch_recipe_details(recipes, top_k: int = None):
+    """Start generating details for the top search hits without waiting for them
+
+    The work is bounded by PREFETCH_CONCURRENCY. Later lookups for these recipes
+    either hit the store or join the in-flight call.
+    """
+    global _prefetch_semaphore
+    if _prefetch_semaphore is None:
+        _prefetch_semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+    top_k = PREFETCH_TOP_K if top_k is None else top_k
+    for recipe in recipes[:top_k]:
+        if recipe_store.get_detail(recipe["id"]) is not None:
+            continue
+        task = asyncio.create_task(_prefetch_one(recipe["id"]))
+        # Keep a reference so the task isn't garbage collected while it runs
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+
+async def _prefetch_one(recipe_id: int):
+    async with _prefetch_semaphore:
+        try:
+            await get_recipe_information(recipe_id)
+        except Exception as e:
+            log.warning("Error prefetching recipe %s: %s", recipe_id, e, extra={"event": "prefetch_failed"})
+
+async def drain_prefetches():
+    """Wait for the background detail prefetches started so far, for batch jobs that exit afterwards"""
+    while _prefetch_tasks:
+        await asyncio.gather(*list(_prefetch_tasks), return_exceptions=True)
+
+async def get_top_recipe_information(recipes, top_k: int = None):
+    """Get details for the first recipe while the rest of the top hits warm up in the background"""
+    # The top pick is needed right away, so it doesn't wait for a prefetch slot
+    top = asyncio.ensure_future(get_recipe_information(recipes[0]["id"]))
+    prefetch_recipe_details(recipes[1:], (PREFETCH_TOP_K if top_k is None else top_k) - 1)
+    return await top
+
+async def find_recipe_with_details(ingredients: str, limit: int = 5, mode: str = None):
+    """Search for recipes and get details for the top pick, returns (recipes, top_detail)
+
+    ``mode`` is "combined" (one completion) or "two_call" and defaults to RECIPE_MODE.
+    """
+    mode = mode or RECIPE_MODE
+    if mode == "combined":
+        key = (canonical_key(ingredients), limit)
+        recipes = search_cache.get(key)
+        if recipes is None:
+            recipes = _search_local(key)
+        if recipes is None:
+            return await inflight.do(("combined", key), _combined_and_store, key)
+    else:
+        recipes = await search_recipes_by_ingredients(ingredients, limit)
+
+    if not recipes:
+        return recipes, None
+    return recipes, await get_top_recipe_information(recipes)
+
+async def _combined_and_store(key):
+    """Generate candidates plus the top pick's details in one call and store both"""
+    ingredients, limit = key
+    result = await _generate("combined", ingredients.replace(",", ", "), limit)
+    recipes = _assign_stable_ids(result.get("recipes", []) if isinstance(result, dict) else [])
+    await asyncio.to_thread(_store_recipes, ingredients, recipes)
+    search_cache.set(key, recipes)
+    if not recipes:
+        return recipes, None
+
+    top = recipes[0]
+    detail = result.get("top")
+    if isinstance(detail, dict) and detail.get("instructions"):
+        detail["id"] = top["id"]
+        detail["title"] = top["title"]
+        await asyncio.to_thread(recipe_store.save_detail, top["id"], detail)
+    else:
+        # The model left out the details, fall back to a separate call
+        detail = await get_recipe_information(top["id"])
+
+    prefetch_recipe_details(recipes[1:], PREFETCH_TOP_K - 1)
+    return recipes, detail
+
+async def stream_recipe(ingredients: str, limit: int = 5):
+    """Stream the top recipe and its instructions, yielding partial results as they arrive
+
+    Each item looks like {"top": {...}, "recipes": [...]}. The fields of "top" arrive
+    in order (title, image, usedIngredientCount, missedIngredients, then instructions),
+    so once "instructions" shows up everything before it is complete. The last item has
+    "done": True, uses stable IDs and has been saved to the store and cache.
+    """
+    key = (canonical_key(ingredients), limit)
+    recipes = search_cache.get(key)
+    if recipes is None:
+        recipes = _search_local(key)
+    if recipes:
+        detail = recipe_store.get_detail(recipes[0]["id"])
+        if detail is not None:
+            yield {"top": {**recipes[0], **detail}, "recipes": recipes, "done": True}
+            return
+
+    text = ""
     try:
-        prompt = f"""Create detailed information for a recipe with ID {recipe_id}.
-        Include a complete set of step-by-step instructions and a full ingredient list with measurements.
-        
-        Format the response as a JSON object with this structure:
-        {{
-          "id": {recipe_id},
-          "title": "Recipe Name",
-          "instructions": "Step-by-step instructions for preparing the dish...",
-          "extendedIngredients": [
-            {{
-              "original": "1 cup of ingredient"
-            }}
-          ],
-          "summary": "Brief description of the dish"
-        }}
-        """
-        
-        # Call OpenAI API asynchronously
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides detailed recipe information."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        # Extract and parse the JSON response
-        recipe_info = json.loads(response.choices[0].message.content)
-        return recipe_info
-        
+        async for delta in provider.stream(key[0].replace(",", ", "), limit):
+            text += delta
+            with span("model_parse_partial"):
+                partial = parse_partial_json(text)
+            if isinstance(partial, dict):
+                if isinstance(partial.get("top"), dict):
+                    partial["top"] = wire_fields(partial["top"])
+                yield partial
+        with span("model_parse"):
+            result = parse_output("stream", text)
     except Exception as e:
-        print(f"OpenAI API Error: {str(e)}")
+        log.error("Recipe provider error: %s", e, extra={"event": "provider_error"})
         raise HTTPException(status_code=500, detail=f"API Error: {str(e)}")
 
-# Simple mock response for testing - use this when you need a fast response
-async def mock_search_recipes(ingredients: str, limit: int = 5):
-    """Mock function that returns recipe data instantly for testing"""
-    return [
-        {
-            "id": 12345,
-            "title": "Quick Test Recipe",
-            "image": "https://via.placeholder.com/150",
-            "usedIngredientCount": 3,
-            "missedIngredients": [
-                {"name": "salt"},
-                {"name": "pepper"}
-            ]
-        }
-    ]
-
-async def mock_recipe_information(recipe_id: int):
-    """Mock function that returns recipe details instantly for testing"""
-    return {
-        "id": recipe_id,
-        "title": "Quick Test Recipe",
-        "instructions": "This is a test recipe for debugging purposes. Steps would go here.",
-        "extendedIngredients": [
-            {"original": "Test ingredient 1"},
-            {"original": "Test ingredient 2"}
-        ],
-        "summary": "A test recipe"
-    }
\ No newline at end of file
+    yield await _store_streamed_result(key, result)
+
+async def _store_streamed_result(key, result):
+    """Save a finished streamed completion like a combined search result"""
+    top = dict(result.get("top") or {})
+    instructions = top.pop("instructions", None)
+    recipes = _assign_stable_ids([top] + list(result.get("recipes") or []))
+    await asyncio.to_thread(_store_recipes, key[0], recipes)
+    search_cache.set(key, recipes)
+    if not recipes:
+        return {"top": {}, "recipes": [], "done": True}
+
+    # The instructions belong to the streamed top recipe, found by its title. Without one
+    # there's no telling which recipe they describe, so they are dropped rather than guessed
+    described = None
+    if instructions and top.get("title"):
+        top_id = stable_recipe_id(top["title"])
+        described = next((recipe for recipe in recipes if recipe["id"] == top_id), None)
+    if described is None:
+        return {"top": recipes[0], "recipes": recipes, "done": True}
+
+    await asyncio.to_thread(recipe_store.save_detail, described["id"], {
+        "id": described["id"],
+        "title": described["title"],
+        "instructions": instructions,
+    })
+    return {"top": {**described, "instructions": instructions}, "recipes": recipes, "done": True}
+
+async def _generate_and_store_detail(recipe_id: int):
+    # If the search produced this recipe, describe that dish instead of a bare number
+    summary = recipe_store.get_summary(recipe_id)
+    detail = await _generate("detail", recipe_id, summary)
+    detail["id"] = recipe_id
+    if summary and summary.get("title"):
+        detail["title"] = summary["title"]
+    await asyncio.to_thread(recipe_store.save_detail, recipe_id, detail)
+    return detail
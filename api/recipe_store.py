@@ -0,0 +1,183 @@
+import hashlib
+import json
+import sqlite3
+import time
+from itertools import groupby
+from operator import itemgetter
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ingredients import normalize_ingredient
+
+
+def stable_recipe_id(title: str) -> int:
+    """Derive a stable numeric ID from a recipe title.
+
+    OpenAI makes up a random ID for every search, so the same dish gets a new ID
+    each time. Hashing the normalized title gives the same ID for the same dish.
+    """
+    digest = hashlib.blake2b(normalize_ingredient(title).encode(), digest_size=6).digest()
+    return int.from_bytes(digest, "big")
+
+
+class RecipeStore:
+    """SQLite backed store of every recipe the search produced, plus generated details.
+
+    Lookups by ID are primary key point reads that never wait on writers in WAL
+    mode, so they run directly on the event loop. They use their own connection
+    with a ``busy_timeout`` of a few milliseconds; if that still finds the file
+    locked the lookup counts as a miss (``errors``) rather than stalling the loop.
+
+    Writes block on whichever ``api.serve`` worker holds the write lock, so they
+    go through a separate connection and callers on the event loop run the
+    ``save_*`` methods with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str = "recipes.db", busy_timeout: float = 0.05, write_timeout: float = 5.0):
+        self.path = path
+        self.errors = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        if path == ":memory:":
+            # Another connection would open a different database; nothing else can lock this one
+            self._write_lock, self._write_conn = self._lock, self._conn
+        else:
+            self._write_lock = Lock()
+            self._write_conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                               timeout=write_timeout)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        self._write_conn.execute(
+            """CREATE TABLE IF NOT EXISTS recipes (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                detail TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        # Which normalized ingredients each recipe uses, for the ingredient index
+        self._write_conn.execute(
+            """CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                recipe_id INTEGER NOT NULL,
+                ingredient TEXT NOT NULL,
+                PRIMARY KEY (recipe_id, ingredient)
+            ) WITHOUT ROWID"""
+        )
+        # Lists written before version 1 include guessed ingredients; drop them so the index starts clean
+        if self._write_conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self._write_conn.execute("DELETE FROM recipe_ingredients")
+            self._write_conn.execute("PRAGMA user_version = 1")
+
+    def save_recipes(self, recipes: Iterable[Dict[str, Any]]) -> None:
+        """Insert or refresh search results; existing details are kept"""
+        now = time.time()
+        rows = [(recipe["id"], recipe.get("title", ""), json.dumps(recipe), now, now) for recipe in recipes]
+        with self._write_lock:
+            self._write_conn.executemany(
+                """INSERT INTO recipes (id, title, summary, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at""",
+                rows,
+            )
+
+    def save_detail(self, recipe_id: int, detail: Dict[str, Any]) -> None:
+        """Store the generated detail document for a recipe"""
+        now = time.time()
+        summary = {"id": recipe_id, "title": detail.get("title", "")}
+        with self._write_lock:
+            self._write_conn.execute(
+                """INSERT INTO recipes (id, title, summary, detail, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET detail = excluded.detail, updated_at = excluded.updated_at""",
+                (recipe_id, summary["title"], json.dumps(summary), json.dumps(detail), now, now),
+            )
+
+    def save_ingredients(self, ingredients: Dict[int, Iterable[str]]) -> None:
+        """Replace the ingredient lists of these recipes"""
+        with self._write_lock:
+            self._write_conn.execute("BEGIN")
+            try:
+                self._write_conn.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?",
+                                             [(rid,) for rid in ingredients])
+                self._write_conn.executemany(
+                    "INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient) VALUES (?, ?)",
+                    [(recipe_id, item) for recipe_id, items in ingredients.items() for item in items],
+                )
+                self._write_conn.execute("COMMIT")
+            except Exception:
+                self._write_conn.execute("ROLLBACK")
+                raise
+
+    def ingredient_rows(self) -> Iterator[Tuple[int, List[str]]]:
+        """Every recipe's ingredient list as (recipe_id, ingredients), for rebuilding the index"""
+        # Read once at startup, where waiting out another worker's write is fine
+        with self._write_lock:
+            rows = self._write_conn.execute(
+                "SELECT recipe_id, ingredient FROM recipe_ingredients ORDER BY recipe_id"
+            ).fetchall()
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            yield recipe_id, [ingredient for _, ingredient in group]
+
+    def get_ingredients(self, recipe_ids: List[int]) -> Dict[int, List[str]]:
+        """Ingredient lists for several recipes; recipes we have no list for are left out"""
+        ingredients: Dict[int, List[str]] = {}
+        for start in range(0, len(recipe_ids), 500):
+            chunk = list(recipe_ids[start:start + 500])
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._fetch_all(
+                f"SELECT recipe_id, ingredient FROM recipe_ingredients WHERE recipe_id IN ({placeholders})", chunk
+            )
+            for recipe_id, ingredient in rows:
+                ingredients.setdefault(recipe_id, []).append(ingredient)
+        return ingredients
+
+    def get_summary(self, recipe_id: int) -> Optional[Dict[str, Any]]:
+        row = self._fetch_one("SELECT summary FROM recipes WHERE id = ?", recipe_id)
+        return json.loads(row[0]) if row else None
+
+    def get_detail(self, recipe_id: int) -> Optional[Dict[str, Any]]:
+        row = self._fetch_one("SELECT detail FROM recipes WHERE id = ?", recipe_id)
+        return json.loads(row[0]) if row and row[0] else None
+
+    def get_recipes(self, recipe_ids: List[int], include_detail: bool = True) -> Dict[int, Dict[str, Any]]:
+        """Look up several recipes at once, with their details merged in when we have them"""
+        detail_column = "detail" if include_detail else "NULL"
+        recipes = {}
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(recipe_ids), 500):
+            chunk = list(recipe_ids[start:start + 500])
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._fetch_all(f"SELECT id, summary, {detail_column} FROM recipes WHERE id IN ({placeholders})", chunk)
+            for recipe_id, summary, detail in rows:
+                recipe = json.loads(summary)
+                if detail:
+                    recipe.update(json.loads(detail))
+                recipes[recipe_id] = recipe
+        return recipes
+
+    def __len__(self) -> int:
+        with self._write_lock:
+            return self._write_conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        if self._write_conn is not self._conn:
+            with self._write_lock:
+                self._write_conn.close()
+
+    def _fetch_one(self, sql: str, *params):
+        with self._lock:
+            try:
+                return self._conn.execute(sql, params).fetchone()
+            except sqlite3.OperationalError:
+                self.errors += 1
+                return None
+
+    def _fetch_all(self, sql: str, params) -> list:
+        with self._lock:
+            try:
+                return self._conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                self.errors += 1
+                return []
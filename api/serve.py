@@ -0,0 +1,127 @@
+"""Production launcher for the API.
+
+Runs the app in several worker processes behind one listening socket:
+
+    python -m api.serve --workers 4 --port 8000
+    python -m api.serve --app main:app          # the /interactions app instead
+
+Workers use uvloop and httptools when they are installed
+(``pip install uvloop httptools``) and the standard asyncio loop and h11
+otherwise. On SIGTERM or Ctrl+C each worker stops accepting connections,
+waits up to ``--graceful-timeout`` seconds for in-flight requests, then runs
+the app's shutdown hooks, which drain the job queue and flush the stores.
+
+Workers share the recipe database (recipes, details and the shared search
+cache tier). Files only one process may write, like the job journal and the
+interaction log, are split per worker by ``worker_slot()``.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import uvicorn
+
+from .logs import configure_logging
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", str(os.cpu_count() or 1)))
+GRACEFUL_TIMEOUT = float(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+# Where workers take their slot locks
+WORKER_SLOT_DIR = os.getenv("WORKER_SLOT_DIR", ".")
+MAX_WORKER_SLOTS = 256
+
+log = logging.getLogger(__name__)
+
+_slot: Optional[int] = None
+_slot_file = None
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def event_loop() -> str:
+    return "uvloop" if _installed("uvloop") else "asyncio"
+
+
+def http_parser() -> str:
+    return "httptools" if _installed("httptools") else "h11"
+
+
+def worker_slot() -> int:
+    """A small number unique among the running workers: 0, 1, 2, ...
+
+    Each worker holds an exclusive lock on ``worker-<n>.lock`` for as long as
+    it runs. A restarted worker takes the lowest free slot again, so it picks
+    up the per-slot files (such as its job journal) a previous worker left.
+    Without fcntl (Windows) every process is slot 0.
+    """
+    global _slot, _slot_file
+    if _slot is not None:
+        return _slot
+    try:
+        import fcntl
+    except ImportError:
+        _slot = 0
+        return _slot
+
+    os.makedirs(WORKER_SLOT_DIR, exist_ok=True)
+    for slot in range(MAX_WORKER_SLOTS):
+        lock_file = open(os.path.join(WORKER_SLOT_DIR, f"worker-{slot}.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        # Keep the file open: the lock lasts as long as this process
+        _slot, _slot_file = slot, lock_file
+        return _slot
+    raise RuntimeError(f"All {MAX_WORKER_SLOTS} worker slots in {WORKER_SLOT_DIR} are taken")
+
+
+def slot_path(path: str) -> str:
+    """``path`` for worker slot 0, ``path.<n>`` for the others"""
+    slot = worker_slot()
+    return path if slot == 0 or not path else f"{path}.{slot}"
+
+
+def run(app: str = "api.main:app", host: str = API_HOST, port: int = API_PORT, workers: int = API_WORKERS,
+        graceful_timeout: float = GRACEFUL_TIMEOUT, reload: bool = False) -> None:
+    """Serve ``app`` (an import string, so each worker imports it itself)"""
+    if reload:
+        # The reloader watches files in a single process; only for development
+        workers = 1
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        reload=reload,
+        loop=event_loop(),
+        http=http_parser(),
+        timeout_graceful_shutdown=graceful_timeout,
+        access_log=False,  # the metrics middleware already times every request
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="api.main:app", help="import string of the app to serve")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="worker processes (default: CPU count)")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT,
+                        help="seconds to wait for in-flight requests on shutdown")
+    args = parser.parse_args()
+    configure_logging()
+    log.info("Serving %s on %s:%s with %d worker(s), %s event loop, %s HTTP parser",
+             args.app, args.host, args.port, args.workers, event_loop(), http_parser(),
+             extra={"event": "serve_start"})
+    run(args.app, args.host, args.port, args.workers, args.graceful_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task instead of starting their own. Results
+    and exceptions are delivered to every waiter and nothing is remembered once
+    the task finishes, so failures are never cached.
+
+    Cancelling one waiter does not affect the others. The shared task is only
+    cancelled when every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.saved = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+            self.executed += 1
+        else:
+            self.saved += 1
+
+        call.waiters += 1
+        try:
+            # shield() so that cancelling this waiter doesn't cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is waiting any more; stop the work and let the next caller start fresh
+                self._forget(key, call)
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executed": self.executed, "saved": self.saved}
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
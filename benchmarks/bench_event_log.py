@@ -0,0 +1,59 @@
+"""Benchmark the embedded interaction event log.
+
+Appends ``--events`` interaction-sized events from one thread, waits for them
+to be durable (group-committed and fsynced), then reads them back through a
+consumer group:
+
+    python -m benchmarks.bench_event_log --events 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from api.event_log import Consumer, open_topic
+
+
+def log_size(log) -> int:
+    return sum(os.path.getsize(os.path.join(log.directory, name))
+               for name in os.listdir(log.directory) if name.endswith(".log"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--segment-mb", type=int, default=16)
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync on each group commit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = open_topic(tmp, "interactions", segment_bytes=args.segment_mb * 1024 * 1024, fsync=not args.no_fsync)
+
+        start = time.perf_counter()
+        for i in range(args.events):
+            log.append({"type": "recipe_requested", "ts": time.time(), "user_id": str(100000 + i % 5000),
+                        "guild_id": str(i % 50), "ingredients": "chicken, rice, garlic"})
+        appended = time.perf_counter() - start
+        log.sync()
+        durable = time.perf_counter() - start
+        print(f"append: {args.events / appended:,.0f} events/s  "
+              f"durable: {args.events / durable:,.0f} events/s  "
+              f"({log.batches} group commits, {len(log.segments())} segments, {log_size(log) / 1e6:.1f} MB)")
+
+        consumer = Consumer(log, "bench")
+        start = time.perf_counter()
+        read = 0
+        while True:
+            records = consumer.poll(10_000)
+            if not records:
+                break
+            read += len(records)
+        consumer.commit()
+        elapsed = time.perf_counter() - start
+        print(f"consume: {read / elapsed:,.0f} events/s ({read:,} events, lag {consumer.lag()})")
+        consumer.close()
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
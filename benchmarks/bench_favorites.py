@@ -0,0 +1,90 @@
+"""Benchmark the SQLite favorites store at scale.
+
+Bulk-loads ``--users`` x ``--per-user`` favorites, then measures:
+  * list latency for random users (the /api/favorites/{user_id} read)
+  * duplicate checks through the unique (user_id, recipe_id) index
+  * throughput of the batched async ``add`` under a burst of reactions
+
+The default 100k users x 1k favorites is 100M rows (several GB on disk and a
+long load). Use smaller numbers for a quick run:
+
+    python -m benchmarks.bench_favorites --users 1000 --per-user 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from api.favorites_store import FavoritesStore
+
+
+def load(store: FavoritesStore, users: int, per_user: int, chunk_users: int = 1000):
+    start = time.perf_counter()
+    for first in range(0, users, chunk_users):
+        rows = [
+            (f"user{user}", recipe)
+            for user in range(first, min(first + chunk_users, users))
+            for recipe in range(per_user)
+        ]
+        store.add_many(rows)
+    elapsed = time.perf_counter() - start
+    total = users * per_user
+    print(f"loaded {total:,} favorites in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+def bench_reads(store: FavoritesStore, users: int, per_user: int, samples: int):
+    rng = random.Random(1)
+    timings = []
+    for _ in range(samples):
+        user = f"user{rng.randrange(users)}"
+        start = time.perf_counter()
+        ids = store.recipe_ids(user)
+        timings.append(time.perf_counter() - start)
+        assert len(ids) == per_user
+    timings.sort()
+    print(f"list favorites: p50 {statistics.median(timings) * 1e3:.2f} ms  "
+          f"p99 {timings[int(len(timings) * 0.99) - 1] * 1e3:.2f} ms  ({per_user} ids per user)")
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        store.contains(f"user{rng.randrange(users)}", rng.randrange(per_user))
+    print(f"duplicate check: {(time.perf_counter() - start) / samples * 1e6:.1f} us each")
+
+
+async def bench_adds(store: FavoritesStore, users: int, per_user: int, burst: int):
+    rng = random.Random(2)
+    # Half of the burst are new favorites, half are duplicates of existing ones
+    requests = [
+        (f"user{rng.randrange(users)}", per_user + i if i % 2 else rng.randrange(per_user))
+        for i in range(burst)
+    ]
+    batches_before = store.batches
+    start = time.perf_counter()
+    results = await asyncio.gather(*[store.add(user, recipe) for user, recipe in requests])
+    elapsed = time.perf_counter() - start
+    print(f"burst of {burst:,} adds: {burst / elapsed:,.0f} adds/s, {store.batches - batches_before} commits, "
+          f"{sum(results):,} new / {burst - sum(results):,} duplicates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--per-user", type=int, default=1_000)
+    parser.add_argument("--samples", type=int, default=1_000)
+    parser.add_argument("--burst", type=int, default=10_000)
+    parser.add_argument("--db", help="database file (defaults to a temporary file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FavoritesStore(args.db or os.path.join(tmp, "favorites.db"))
+        load(store, args.users, args.per_user)
+        bench_reads(store, args.users, args.per_user, args.samples)
+        asyncio.run(bench_adds(store, args.users, args.per_user, args.burst))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Tail latency with and without hedged requests.
+
+Uses the local provider with a heavy-tailed latency model (most answers come
+back in about a second, a few percent take ten times longer) and compares
+p50/p95/p99 for plain requests against HedgedProvider, which sends a backup
+request once the first one is slower than ``--delay``.
+
+    python -m benchmarks.bench_hedging --requests 400 --delay 1.5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from api.providers import HedgedProvider, LocalProvider
+
+
+class TailLatencyProvider(LocalProvider):
+    """LocalProvider whose answers take a random, occasionally very long time"""
+
+    def __init__(self, median: float, tail: float, tail_rate: float, seed: int):
+        super().__init__()
+        self.median = median
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self._latency_rng = random.Random(seed)
+
+    async def _wait(self) -> None:
+        self.calls += 1
+        slow = self._latency_rng.random() < self.tail_rate
+        await asyncio.sleep(self._latency_rng.lognormvariate(0, 0.25) * (self.tail if slow else self.median))
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(label, provider, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await provider.search(f"chicken, rice, item{i}", 5)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    print(f"{label:<8} p50 {statistics.median(latencies):5.2f}s  p95 {percentile(latencies, 0.95):5.2f}s  "
+          f"p99 {percentile(latencies, 0.99):5.2f}s  max {max(latencies):5.2f}s", end="")
+
+
+async def main_async(args):
+    def model(seed):
+        return TailLatencyProvider(args.median, args.tail, args.tail_rate, seed)
+
+    plain = model(1)
+    await run("plain", plain, args.requests, args.concurrency)
+    print(f"  | provider calls {plain.calls}")
+
+    hedged = HedgedProvider(model(1), model(2), delay=args.delay)
+    await run("hedged", hedged, args.requests, args.concurrency)
+    calls = hedged.primary.calls + hedged.backup.calls
+    print(f"  | provider calls {calls} (+{(calls - args.requests) / args.requests:.0%}), "
+          f"backup won {hedged.backup_wins}/{hedged.hedged} hedges")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--median", type=float, default=1.0, help="typical answer time in seconds")
+    parser.add_argument("--tail", type=float, default=10.0, help="answer time of a slow request")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="share of slow requests")
+    parser.add_argument("--delay", type=float, default=1.5, help="hedge after this many seconds")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark the ingredient inverted index.
+
+Builds an index over ``--recipes`` synthetic recipes whose ingredients follow
+a Zipf-like popularity curve (a few staples such as garlic show up in a large
+share of recipes), then times pantry queries of 2-6 ingredients at a strict
+and a loose coverage threshold, plus incremental adds.
+
+    python -m benchmarks.bench_index --recipes 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from api.ingredient_index import IngredientIndex
+
+
+def synthetic_recipes(count: int, vocabulary: int, rng: random.Random):
+    ingredients = [f"ingredient{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    for recipe_id in range(count):
+        yield recipe_id, set(rng.choices(ingredients, weights, k=rng.randint(4, 12)))
+
+
+def bench_queries(index: IngredientIndex, vocabulary: int, queries: int, coverage: float, rng: random.Random):
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    pantries = [
+        [f"ingredient{i}" for i in set(rng.choices(range(vocabulary), weights, k=rng.randint(2, 6)))]
+        for _ in range(queries)
+    ]
+    timings, answered = [], 0
+    for pantry in pantries:
+        start = time.perf_counter()
+        matches = index.search(pantry, 5, coverage)
+        timings.append(time.perf_counter() - start)
+        answered += len(matches) == 5
+    timings.sort()
+    print(f"coverage {coverage:.2f}: p50 {statistics.median(timings) * 1e6:6.0f} us  "
+          f"p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:6.0f} us  "
+          f"({answered / queries:.0%} of pantries got 5 local matches)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--adds", type=int, default=10_000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    rows = list(synthetic_recipes(args.recipes, args.vocabulary, rng))
+    index = IngredientIndex()
+    start = time.perf_counter()
+    index.rebuild(rows)
+    print(f"rebuild: {args.recipes:,} recipes in {time.perf_counter() - start:.2f}s  {index.stats()}")
+
+    for coverage in (1.0, 0.5):
+        bench_queries(index, args.vocabulary, args.queries, coverage, rng)
+
+    start = time.perf_counter()
+    for recipe_id, ingredients in synthetic_recipes(args.adds, args.vocabulary, rng):
+        index.add(args.recipes + recipe_id, ingredients)
+    elapsed = time.perf_counter() - start
+    print(f"incremental add: {args.adds / elapsed:,.0f} recipes/s")
+
+
+if __name__ == "__main__":
+    main()
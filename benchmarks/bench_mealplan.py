@@ -0,0 +1,67 @@
+"""Benchmark the meal-plan engine on a large favorites list.
+
+Builds ``--favorites`` synthetic saved recipes (Zipf-distributed ingredients,
+a handful of dish types), then times encoding the favorites, planning a week,
+planning with a diet filter and replacing single days.
+
+    python -m benchmarks.bench_mealplan --favorites 5000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from api.meal_plan import MealPlanner
+
+STAPLES = ["chicken", "beef", "salmon", "tofu", "rice", "pasta", "garlic", "onion", "tomato", "spinach",
+           "cheese", "egg", "lemon", "potato", "bean", "carrot", "butter", "flour", "mushroom", "pepper"]
+DISHES = ["Stew", "Salad", "Bake", "Curry", "Tacos", "Soup", "Bowl", "Skillet", "Pasta", "Risotto"]
+
+
+def synthetic_favorites(count: int, rng: random.Random):
+    vocabulary = STAPLES + [f"spice{i}" for i in range(300)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    recipes, ingredients = [], []
+    for recipe_id in range(count):
+        recipes.append({"id": recipe_id, "title": f"Favorite {recipe_id} {rng.choice(DISHES)}"})
+        ingredients.append(sorted(set(rng.choices(vocabulary, weights, k=rng.randint(5, 12)))))
+    return recipes, ingredients
+
+
+def timed(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings) * 1e3, max(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--favorites", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    recipes, ingredients = synthetic_favorites(args.favorites, random.Random(1))
+    planner, encode_ms, _ = timed(lambda: MealPlanner(recipes, ingredients), 1)
+    print(f"encode {args.favorites:,} favorites: {encode_ms:.1f} ms")
+
+    def fresh_plan(diet=()):
+        planner._pool_key = None  # include building the candidate pool every time
+        return planner.plan(args.days, diet)
+
+    plan, p50, worst = timed(fresh_plan, args.repeat)
+    print(f"plan {args.days} days:        p50 {p50:5.1f} ms  max {worst:5.1f} ms  score {plan.score:.1f}")
+    _, p50, worst = timed(lambda: fresh_plan(["vegetarian"]), args.repeat)
+    print(f"plan vegetarian:       p50 {p50:5.1f} ms  max {worst:5.1f} ms")
+    _, p50, worst = timed(lambda: planner.plan(args.days), args.repeat)
+    print(f"plan again (cached):   p50 {p50:5.1f} ms  max {worst:5.1f} ms")
+    _, p50, worst = timed(lambda: planner.replace(plan, random.randrange(args.days)), args.repeat * 5)
+    print(f"replace one day:       p50 {p50:5.2f} ms  max {worst:5.2f} ms")
+    print("shared ingredients:", ", ".join(planner.shared_ingredients(plan)[:8]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the cost of the metrics instrumentation.
+
+Times an empty ``span()`` block, a histogram observation and a full request
+through the instrumented /api/recipe/{id} route, once with metrics enabled and
+once with METRICS_ENABLED=false, so the overhead per request is visible.
+
+    python -m benchmarks.bench_metrics --iterations 200000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("RECIPE_DB_PATH", ":memory:")
+os.environ.setdefault("JOB_JOURNAL_PATH", "")
+os.environ.setdefault("RECIPE_PROVIDER", "local")
+
+from api import metrics
+
+
+def per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def empty_span():
+    with metrics.span("bench"):
+        pass
+
+
+def observation():
+    metrics.observe("bench", 0.003)
+
+
+def bench_requests(requests: int):
+    from fastapi.testclient import TestClient
+    from api.main import app
+
+    with TestClient(app) as client:
+        client.get("/api/recipe/1")
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get("/api/recipe/1")
+        return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for enabled in (True, False):
+        metrics.ENABLED = enabled
+        print(f"metrics {'enabled' if enabled else 'disabled'}:")
+        print(f"  span()     {per_call(empty_span, args.iterations) * 1e9:8.0f} ns")
+        print(f"  observe()  {per_call(observation, args.iterations) * 1e9:8.0f} ns")
+
+    # The middleware is attached when the app is imported, so this compares
+    # an instrumented app against the same app with recording switched off
+    metrics.ENABLED = True
+    enabled = bench_requests(args.requests)
+    metrics.ENABLED = False
+    disabled = bench_requests(args.requests)
+    print(f"request with metrics: {enabled * 1e6:.0f} us, recording off: {disabled * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the "two_call" and "combined" recipe generation modes.
+
+Measures end-to-end latency (search + top recipe details) and token usage per
+request. Uses the latency-simulating fake client by default; pass --real to
+hit the actual OpenAI API (needs OPENAI_API_KEY and costs money).
+
+    python -m benchmarks.bench_modes --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Keep benchmark runs out of the real recipe database
+os.environ.setdefault("RECIPE_DB_PATH", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from api import recipe_client
+from api.providers import OpenAIProvider
+from benchmarks.fake_openai import FakeOpenAI
+
+PANTRIES = [
+    "chicken, rice", "eggs, spinach", "beef, potato", "tofu, broccoli", "salmon, lemon",
+    "pasta, tomato", "chickpea, spinach", "pork, apple", "shrimp, garlic", "mushroom, barley",
+]
+
+
+def reset():
+    recipe_client.search_cache.clear()
+    recipe_client.recipe_store._conn.execute("DELETE FROM recipes")
+    for key in recipe_client.provider.usage:
+        recipe_client.provider.usage[key] = 0
+
+
+async def run_mode(mode: str, requests: int):
+    reset()
+    latencies = []
+    for i in range(requests):
+        pantry = f"{PANTRIES[i % len(PANTRIES)]}, item{i}"
+        start = time.perf_counter()
+        recipes, detail = await recipe_client.find_recipe_with_details(pantry, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        assert recipes and detail and detail.get("instructions")
+
+    usage = dict(recipe_client.provider.usage)
+    latencies.sort()
+    print(f"{mode:<9} p50 {statistics.median(latencies):6.2f}s  mean {statistics.mean(latencies):6.2f}s  "
+          f"max {latencies[-1]:6.2f}s | calls/request {usage['calls'] / requests:.1f}  "
+          f"prompt tokens/request {usage['prompt_tokens'] / requests:7.0f}  "
+          f"completion tokens/request {usage['completion_tokens'] / requests:7.0f}")
+
+
+async def main_async(args):
+    if not args.real:
+        recipe_client.provider = OpenAIProvider(FakeOpenAI(ttft=args.ttft, per_token=args.per_token),
+                                                structured_output=not args.json_mode)
+    elif args.json_mode:
+        recipe_client.provider.structured_output = False
+    # Background prefetch would add extra calls to the token counts, so turn it off here
+    recipe_client.PREFETCH_TOP_K = 1
+
+    for mode in ("two_call", "combined"):
+        await run_mode(mode, args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--real", action="store_true", help="use the real OpenAI API")
+    parser.add_argument("--json-mode", action="store_true",
+                        help="plain JSON mode instead of the compact structured output schemas")
+    parser.add_argument("--ttft", type=float, default=0.4, help="fake time to first token in seconds")
+    parser.add_argument("--per-token", type=float, default=0.005, help="fake generation time per token")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
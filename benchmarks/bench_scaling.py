@@ -0,0 +1,148 @@
+"""Benchmark throughput of the API as worker processes are added.
+
+Starts ``python -m api.serve`` with 1, 2, 4, ... workers (up to ``--max-workers``,
+default the CPU count) against a fresh recipe database, warms up a pool of
+ingredient lists, then drives POST /api/findrecipe from several client
+processes for ``--duration`` seconds and reports requests per second and
+latency percentiles for each worker count.
+
+Recipes come from the local provider, so no API key or network is needed.
+The search cache is shared between workers through the recipe database, so
+a warmed-up list is a hit whichever worker answers it.
+
+    python -m benchmarks.bench_scaling --max-workers 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+INGREDIENTS = ["chicken", "rice", "garlic", "tomato", "onion", "egg", "spinach", "beef", "potato",
+               "mushroom", "cheese", "pasta", "tofu", "carrot", "lemon", "salmon", "beans", "pepper"]
+
+
+def pantries(count: int):
+    rng = random.Random(0)
+    return [", ".join(rng.sample(INGREDIENTS, 3)) for _ in range(count)]
+
+
+async def drive(url: str, lists, concurrency: int, duration: float, seed: int):
+    """One client process: ``concurrency`` connections posting searches until the time is up"""
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                body = {"ingredients": rng.choice(lists), "user_id": str(rng.randrange(1000))}
+                start = time.perf_counter()
+                async with session.post(url + "/api/findrecipe", json=body) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors
+
+
+def client_process(args):
+    return asyncio.run(drive(*args))
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def warm_up(url: str, lists) -> None:
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            for ingredients in lists:
+                async with session.post(url + "/api/findrecipe", json={"ingredients": ingredients, "user_id": "0"}) as r:
+                    await r.read()
+    asyncio.run(run())
+
+
+def bench(workers: int, args, lists):
+    tmp = tempfile.mkdtemp(prefix="bench-scaling-")
+    env = {
+        **os.environ,
+        "RECIPE_PROVIDER": "local",
+        "RECIPE_DB_PATH": os.path.join(tmp, "recipes.db"),
+        "FAVORITES_DB_PATH": os.path.join(tmp, "recipes.db"),
+        "JOB_JOURNAL_PATH": os.path.join(tmp, "jobs.journal"),
+        "EVENT_LOG_DIR": os.path.join(tmp, "events"),
+        "WORKER_SLOT_DIR": tmp,
+        "LOG_LEVEL": "WARNING",
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(args.port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(url)
+        time.sleep(1.0)  # let every worker finish starting, not just the first
+        warm_up(url, lists)
+
+        jobs = [(url, lists, args.concurrency, args.duration, seed) for seed in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client_process, jobs)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies = sorted(sample for samples, _ in results for sample in samples)
+    errors = sum(count for _, count in results)
+    return len(latencies) / args.duration, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--distinct", type=int, default=200, help="number of distinct ingredient lists")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    lists = pantries(args.distinct)
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes x {args.concurrency} connections")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for workers in counts:
+        rate, latencies, errors = bench(workers, args, lists)
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:>9.0f} {rate / baseline:>7.2f}x {statistics.median(latencies) * 1e3:>8.1f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1e3:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
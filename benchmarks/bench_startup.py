@@ -0,0 +1,102 @@
+"""Benchmark cold start: how long a fresh process takes to import and to serve.
+
+For each entry point this starts ``--runs`` fresh interpreters and reports the
+median and worst time to import the module, and for the two apps the time
+from launching ``python -m api.serve`` until the first health check answers.
+``bot.py`` is timed with its command hash already stored, which is the usual
+restart: registration is skipped without touching the network.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def environment(tmp: str):
+    return {
+        **os.environ,
+        "RECIPE_PROVIDER": "local",
+        "RECIPE_DB_PATH": os.path.join(tmp, "recipes.db"),
+        "FAVORITES_DB_PATH": os.path.join(tmp, "recipes.db"),
+        "JOB_JOURNAL_PATH": os.path.join(tmp, "jobs.journal"),
+        "EVENT_LOG_DIR": os.path.join(tmp, "events"),
+        "WORKER_SLOT_DIR": tmp,
+        "COMMAND_HASH_PATH": os.path.join(tmp, "commands.hash"),
+        "DISCORD_BOT_TOKEN": os.environ.get("DISCORD_BOT_TOKEN", "benchmark"),
+        "DISCORD_APP_ID": os.environ.get("DISCORD_APP_ID", "1"),
+        "DISCORD_PUBLIC_KEY": os.environ.get("DISCORD_PUBLIC_KEY", "0" * 64),
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def time_import(module: str, env) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def time_ready(app: str, path: str, port: int, env) -> float:
+    """Seconds from launching the server until ``path`` answers"""
+    url = f"http://127.0.0.1:{port}{path}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--app", app, "--workers", "1", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < 60:
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError(f"{app} did not come up")
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def time_register(env) -> float:
+    """Seconds for a ``python bot.py`` run whose commands are already registered"""
+    store = "import config; " \
+            "config.write_command_hash(config.command_manifest_hash(config.load_commands(), config.DISCORD_APP_ID))"
+    subprocess.run([sys.executable, "-c", store], cwd=ROOT, env=env, check=True)
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "bot.py"], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def report(name: str, samples) -> None:
+    print(f"{name:<28} {statistics.median(samples) * 1e3:>9.0f} {max(samples) * 1e3:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-bot", action="store_true", help="don't time importing bot.main (needs discord.py)")
+    args = parser.parse_args()
+
+    env = environment(tempfile.mkdtemp(prefix="bench-startup-"))
+    modules = ["main", "api.main"] + ([] if args.skip_bot else ["bot.main"])
+
+    print(f"{'':<28} {'p50 ms':>9} {'max ms':>9}")
+    for module in modules:
+        report(f"import {module}", [time_import(module, env) for _ in range(args.runs)])
+    report("ready main:app", [time_ready("main:app", "/", args.port, env) for _ in range(args.runs)])
+    report("ready api.main:app", [time_ready("api.main:app", "/health", args.port, env) for _ in range(args.runs)])
+    report("bot.py, commands unchanged", [time_register(env) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
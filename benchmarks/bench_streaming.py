@@ -0,0 +1,69 @@
+"""Time to first useful content: deferred follow-up vs streaming follow-up.
+
+Runs both background paths of the /findrecipe interaction against the fake
+OpenAI client (streaming chunks) and the local fake Discord webhook server,
+and reports when the first embed and the complete embed reached Discord.
+
+    python -m benchmarks.bench_streaming --requests 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("RECIPE_DB_PATH", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from api import main as api_main
+from api import recipe_client
+from api.discord_client import DiscordWebhookClient
+from benchmarks.fake_discord import FakeDiscord
+from api.providers import OpenAIProvider
+from benchmarks.fake_openai import FakeOpenAI
+
+
+async def run_path(name, process, fake, requests):
+    first, complete = [], []
+    for i in range(requests):
+        token = f"{name}-{i}"
+        start = time.monotonic()
+        await process(ingredients=f"chicken, rice, item{i}", user_id="1", application_id="app", token=token)
+        # The fake records arrival times; the last write (POST or PATCH) holds the full instructions
+        posts = [at for message_id, payload, at in fake.messages if at >= start]
+        edits = [at for message_id, payload, at in fake.edits if at >= start]
+        first.append(min(posts) - start)
+        complete.append(max(posts + edits) - start)
+    print(f"{name:<10} first content p50 {statistics.median(first):5.2f}s | complete p50 {statistics.median(complete):5.2f}s")
+
+
+async def main_async(args):
+    recipe_client.provider = OpenAIProvider(FakeOpenAI(ttft=args.ttft, per_token=args.per_token))
+    recipe_client.RECIPE_MODE = "combined"
+    recipe_client.PREFETCH_TOP_K = 1
+    api_main.STREAM_EDIT_INTERVAL = args.edit_interval
+
+    fake = FakeDiscord(limit=50, window=1.0)
+    url = await fake.start()
+    api_main.webhook_client = DiscordWebhookClient(base_url=url)
+
+    await run_path("deferred", api_main.process_recipe_request, fake, args.requests)
+    recipe_client.search_cache.clear()
+    await run_path("streaming", api_main.process_recipe_request_streaming, fake, args.requests)
+    print(f"edits sent while streaming: {len(fake.edits)}")
+
+    await api_main.webhook_client.close()
+    await fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--ttft", type=float, default=0.4, help="fake time to first token in seconds")
+    parser.add_argument("--per-token", type=float, default=0.005, help="fake generation time per token")
+    parser.add_argument("--edit-interval", type=float, default=1.0, help="seconds between message edits")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Micro-benchmark for Discord signature verification.
+
+Compares the old per-request path (build a VerifyKey from hex, then parse the
+body a second time) with the shared InteractionVerifier.
+
+Run from the repository root:
+    python -m benchmarks.bench_verify --iterations 20000
+"""
+import argparse
+import json
+import time
+
+import nacl.signing
+
+from api.interactions import InteractionVerifier
+
+
+def make_signed_ping():
+    """Create a throwaway keypair and a signed PING interaction"""
+    signing_key = nacl.signing.SigningKey.generate()
+    public_key_hex = signing_key.verify_key.encode().hex()
+    body = json.dumps({"type": 1, "id": "1", "application_id": "1", "token": "t"}).encode()
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    return public_key_hex, signature, timestamp, body
+
+
+def verify_per_request(public_key_hex, signature, timestamp, body):
+    """The original hot path: new key per request, body decoded twice"""
+    verify_key = nacl.signing.VerifyKey(bytes.fromhex(public_key_hex))
+    verify_key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+    json.loads(body)
+    return json.loads(body)
+
+
+def run(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    rate = iterations / elapsed
+    print(f"{label:<28} {rate:>12,.0f} verifications/s  ({elapsed * 1e6 / iterations:.1f} us each)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    public_key_hex, signature, timestamp, body = make_signed_ping()
+    verifier = InteractionVerifier(public_key_hex)
+
+    before = run("before (key per request)", lambda: verify_per_request(public_key_hex, signature, timestamp, body), args.iterations)
+    after = run("after (cached verifier)", lambda: verifier.verify_and_decode(signature, timestamp, body), args.iterations)
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Local fake of Discord's webhook API, with per-webhook rate limit buckets.
+
+It answers follow-up POSTs and message PATCHes, sends the same rate limit
+headers Discord does, and returns 429 once a bucket is exhausted. Running it
+directly pushes a burst of follow-ups through DiscordWebhookClient:
+
+    python -m benchmarks.fake_discord --messages 40 --limit 5 --window 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+from aiohttp import web
+
+from api.discord_client import DiscordWebhookClient
+
+
+class FakeDiscord:
+    def __init__(self, limit: int = 5, window: float = 1.0, latency: float = 0.0):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.messages = []
+        self.edits = []
+        self.rejected = 0
+        self.first_delivery = {}  # interaction token -> arrival time of its first follow-up
+        self._windows = {}
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.url = None
+
+    def _check_bucket(self, key):
+        """Returns (allowed, remaining, reset_after) for a fixed window bucket"""
+        now = time.monotonic()
+        started, used = self._windows.get(key, (now, 0))
+        if now - started >= self.window:
+            started, used = now, 0
+        reset_after = self.window - (now - started)
+        if used >= self.limit:
+            return False, 0, reset_after
+        self._windows[key] = (started, used + 1)
+        return True, self.limit - used - 1, reset_after
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        key = (request.method, request.match_info["app_id"], request.match_info["token"])
+        allowed, remaining, reset_after = self._check_bucket(key)
+        headers = {
+            "X-RateLimit-Bucket": f"fake-{request.method.lower()}",
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if not allowed:
+            self.rejected += 1
+            return web.json_response({"message": "You are being rate limited.", "retry_after": reset_after,
+                                      "global": False}, status=429, headers=headers)
+
+        payload = await request.json()
+        if request.method == "PATCH":
+            self.edits.append((request.match_info["message_id"], payload, time.monotonic()))
+            message_id = request.match_info["message_id"]
+        else:
+            message_id = str(next(self._ids))
+            self.messages.append((message_id, payload, time.monotonic()))
+            self.first_delivery.setdefault(request.match_info["token"], time.monotonic())
+        if request.method == "POST" and request.query.get("wait") != "true":
+            return web.Response(status=204, headers=headers)
+        return web.json_response({"id": message_id, **payload}, headers=headers)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/webhooks/{app_id}/{token}", self._handle)
+        app.router.add_patch("/webhooks/{app_id}/{token}/messages/{message_id}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def run(messages: int, tokens: int, limit: int, window: float):
+    fake = FakeDiscord(limit=limit, window=window)
+    url = await fake.start()
+    client = DiscordWebhookClient(base_url=url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client.send_follow_up("app", f"token{i % tokens}", {"content": f"message {i}"})
+        for i in range(messages)
+    ])
+    elapsed = time.perf_counter() - start
+
+    await client.close()
+    await fake.stop()
+    print(f"delivered {len(fake.messages)}/{messages} messages in {elapsed:.2f}s")
+    print(f"server rejected {fake.rejected} requests with 429; client stats: {client.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--tokens", type=int, default=2, help="number of distinct interaction tokens")
+    parser.add_argument("--limit", type=int, default=5, help="requests per bucket per window")
+    parser.add_argument("--window", type=float, default=0.5, help="bucket window in seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.tokens, args.limit, args.window))
+
+
+if __name__ == "__main__":
+    main()
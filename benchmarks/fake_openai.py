@@ -0,0 +1,155 @@
+"""Latency-simulating stand-in for the AsyncOpenAI client.
+
+Answers the recipe client's prompts with plausible JSON, in one piece or as a
+stream of chunks. Latency follows a simple model: a fixed time to first token
+plus a per-token generation time. Token counts are estimated at ~4 characters
+per token and reported through ``usage`` just like the real API.
+"""
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+WORDS = ["chop", "stir", "simmer", "season", "fold", "whisk", "roast", "sear", "toss", "serve", "bake", "drain"]
+EXTRAS = ["garlic", "onion", "olive oil", "butter", "lemon", "parsley", "paprika", "cream", "thyme", "ginger"]
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _instructions(rng: random.Random, chars: int) -> str:
+    steps = []
+    while sum(len(step) for step in steps) < chars:
+        steps.append(f"{len(steps) + 1}. " + " ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+    return " ".join(steps)[:chars]
+
+
+class FakeCompletions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self._owner = owner
+
+    async def create(self, model, messages, response_format=None, max_tokens=None, stream=False, **kwargs):
+        schema = (response_format or {}).get("json_schema", {}).get("name")
+        return await self._owner._complete(messages, max_tokens, stream, schema)
+
+
+class FakeOpenAI:
+    """Drop-in replacement for ``AsyncOpenAI`` in benchmarks and local runs"""
+
+    def __init__(self, ttft: float = 0.4, per_token: float = 0.01, detail_chars: int = 2600, seed: int = 0):
+        self.ttft = ttft
+        self.per_token = per_token
+        self.detail_chars = detail_chars
+        self.seed = seed
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=FakeCompletions(self))
+
+    def _recipes(self, rng: random.Random, ingredients, limit):
+        recipes = []
+        for i in range(limit):
+            main = ingredients[i % len(ingredients)] if ingredients else "pantry"
+            title = f"{rng.choice(['Rustic', 'Quick', 'Spicy', 'Creamy', 'Crispy'])} {main.title()} {rng.choice(['Bowl', 'Skillet', 'Stew', 'Salad', 'Bake'])} {i + 1}"
+            recipes.append({
+                "id": rng.randint(10000, 99999),
+                "title": title,
+                "image": "https://example.com/image.jpg",
+                "usedIngredientCount": min(len(ingredients), rng.randint(1, 4)),
+                "missedIngredients": [{"name": name} for name in rng.sample(EXTRAS, 2)],
+            })
+        return recipes
+
+    def _detail(self, rng: random.Random, chars: int):
+        return {
+            "title": "Recipe",
+            "instructions": _instructions(rng, chars),
+            "extendedIngredients": [{"original": f"1 cup {name}"} for name in rng.sample(EXTRAS, 5)],
+            "summary": "A tasty dish made from what you have at home.",
+        }
+
+    def _compact(self, recipe):
+        return {"title": recipe["title"], "uses": recipe["usedIngredientCount"],
+                "missing": [ing["name"] for ing in recipe["missedIngredients"]]}
+
+    def _structured_answer(self, schema: str, rng: random.Random, ingredients, limit):
+        """What a structured-output completion for each of the client's schemas looks like"""
+        chars = min(self.detail_chars, 1800)
+        if schema == "recipe_stream":
+            ideas = [self._compact(recipe) for recipe in self._recipes(rng, ingredients, limit)]
+            return {"top": {**ideas[0], "instructions": _instructions(rng, chars)}, "recipes": ideas[1:]}
+        if schema == "recipe_combined":
+            ideas = [self._compact(recipe) for recipe in self._recipes(rng, ingredients, limit)]
+            return {"recipes": ideas, "top": {"instructions": _instructions(rng, chars)}}
+        if schema == "recipe_search":
+            return {"recipes": [self._compact(recipe) for recipe in self._recipes(rng, ingredients, limit)]}
+        return {"instructions": _instructions(rng, chars)}
+
+    def _answer(self, prompt: str, max_tokens, schema=None):
+        rng = random.Random(f"{self.seed}:{prompt}")
+        match = re.search(r"using these ingredients: (.*?)\.\n", prompt)
+        ingredients = [part.strip() for part in match.group(1).split(",")] if match else []
+        limit_match = re.search(r"Generate (\d+)", prompt)
+        limit = int(limit_match.group(1)) if limit_match else 5
+
+        if schema:
+            answer = self._structured_answer(schema, rng, ingredients, limit)
+        elif '"top"' in prompt and prompt.find('"top"') < prompt.find('"recipes"'):
+            # Streaming shape: the best recipe first, with its instructions last
+            chars = min(self.detail_chars, 1800)
+            top = self._recipes(rng, ingredients, 1)[0]
+            top["instructions"] = _instructions(rng, chars)
+            answer = {"top": top, "recipes": self._recipes(rng, ingredients, limit)[1:]}
+        elif '"top"' in prompt:
+            chars = min(self.detail_chars, 1800)
+            answer = {"recipes": self._recipes(rng, ingredients, limit), "top": self._detail(rng, chars)}
+        elif "recipe ideas" in prompt:
+            answer = {"recipes": self._recipes(rng, ingredients, limit)}
+        else:
+            answer = self._detail(rng, self.detail_chars)
+
+        content = json.dumps(answer)
+        if max_tokens and _tokens(content) > max_tokens:
+            # A real model would be cut off here; shorten the instructions instead of emitting broken JSON
+            target = answer["top"] if "top" in answer else answer
+            overflow = (_tokens(content) - max_tokens) * 4
+            target["instructions"] = target["instructions"][: max(0, len(target["instructions"]) - overflow)]
+            content = json.dumps(answer)
+        return content
+
+    async def _complete(self, messages, max_tokens, stream, schema=None):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        content = self._answer(prompt, max_tokens, schema)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(_tokens(message["content"]) for message in messages),
+            completion_tokens=_tokens(content),
+        )
+        if stream:
+            return FakeStream(content, usage, self.ttft, self.per_token)
+        await asyncio.sleep(self.ttft + usage.completion_tokens * self.per_token)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeStream:
+    """Async iterator of streaming chunks, shaped like the OpenAI SDK's"""
+
+    def __init__(self, content: str, usage, ttft: float, per_token: float, chunk_chars: int = 16):
+        self._content = content
+        self._usage = usage
+        self._ttft = ttft
+        self._per_token = per_token
+        self._chunk_chars = chunk_chars
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(self._ttft)
+        for start in range(0, len(self._content), self._chunk_chars):
+            piece = self._content[start:start + self._chunk_chars]
+            await asyncio.sleep(_tokens(piece) * self._per_token)
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=self._usage)
@@ -0,0 +1,273 @@
+"""Load test for the interaction endpoints.
+
+Generates Discord interactions (PING, /findrecipe and an unknown command)
+signed with a throwaway Ed25519 keypair and fires them at the app in-process
+at a fixed concurrency. Recipe generation goes to the latency-simulating fake
+OpenAI client and follow-ups to the local fake Discord webhook server, so the
+whole path runs without network access or API keys.
+
+Latency is reported per stage with p50/p95/p99:
+  * ``http <kind>``  request in, response out (signature check + routing)
+  * ``queued``       request sent until a worker picked up its job
+  * ``generation``   time the worker spent on the job
+  * ``follow-up``    request sent until its follow-up reached Discord
+
+Examples:
+
+    python -m benchmarks.loadtest --requests 500 --concurrency 50
+    python -m benchmarks.loadtest --target root --mix ping=1,unknown=1
+    python -m benchmarks.loadtest --requests 200 --record traffic.jsonl
+    python -m benchmarks.loadtest --replay traffic.jsonl
+
+Recorded traffic uses the requests.jsonl layout, one request per line:
+``{"request_id": ..., "title": <path>, "body": <raw JSON body>}``.
+Interactions are signed again with the test key when they are replayed.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+import nacl.signing
+
+# Sign with a throwaway key and keep all state in memory / temp files.
+# This has to happen before the apps are imported, they read it at import time
+SIGNING_KEY = nacl.signing.SigningKey.generate()
+os.environ["DISCORD_PUBLIC_KEY"] = SIGNING_KEY.verify_key.encode().hex()
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("RECIPE_DB_PATH", ":memory:")
+os.environ.setdefault("JOB_JOURNAL_PATH", "")
+# Measure the pipeline, not the per-user rate limits
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "events"))
+
+import httpx
+
+from api.discord_client import DiscordWebhookClient
+from benchmarks.fake_discord import FakeDiscord
+from api.providers import OpenAIProvider
+from benchmarks.fake_openai import FakeOpenAI
+
+TARGET_PATHS = {"api": "/api/discord-interactions", "root": "/interactions"}
+INGREDIENTS = ["chicken", "rice", "garlic", "tomato", "onion", "egg", "spinach", "beef", "potato",
+               "mushroom", "cheese", "pasta", "tofu", "carrot", "lemon", "salmon", "beans", "pepper"]
+
+
+def interaction(kind: str, index: int, rng: random.Random, distinct: int) -> dict:
+    """Build a synthetic interaction payload of the given kind"""
+    payload = {
+        "id": str(10 ** 17 + index),
+        "application_id": "1000",
+        "token": f"loadtest-{index}",
+        "guild_id": str(rng.randrange(20)),
+        "member": {"user": {"id": str(rng.randrange(1000))}},
+    }
+    if kind == "ping":
+        return {"type": 1, **payload}
+    if kind == "findrecipe":
+        # A small pool of ingredient lists means repeats, i.e. cache hits
+        pick = random.Random(rng.randrange(distinct))
+        ingredients = ", ".join(pick.sample(INGREDIENTS, 3))
+        options = [{"name": "ingredients", "type": 3, "value": ingredients}]
+        return {"type": 2, "data": {"name": "findrecipe", "options": options}, **payload}
+    return {"type": 2, "data": {"name": "unknowncommand", "options": []}, **payload}
+
+
+def kind_of(path: str, body: dict) -> str:
+    if path == "/api/findrecipe":
+        return "api-findrecipe"
+    if body.get("type") == 1:
+        return "ping"
+    name = (body.get("data") or {}).get("name")
+    return name if name in ("findrecipe", "ping") else "unknown"
+
+
+def generate(args):
+    """Synthetic traffic as (request_id, path, body) tuples"""
+    rng = random.Random(args.seed)
+    kinds, weights = zip(*args.mix.items())
+    path = TARGET_PATHS[args.target]
+    traffic = []
+    for i in range(args.requests):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "api-findrecipe":
+            pick = random.Random(rng.randrange(args.distinct))
+            body = {"ingredients": ", ".join(pick.sample(INGREDIENTS, 3)), "user_id": str(rng.randrange(1000))}
+            traffic.append((f"load-{i:06d}", "/api/findrecipe", body))
+        else:
+            traffic.append((f"load-{i:06d}", path, interaction(kind, i, rng, args.distinct)))
+    return traffic
+
+
+def load_replay(path: str):
+    """Read recorded traffic in the requests.jsonl layout"""
+    traffic = []
+    with open(path, encoding="utf-8") as replay:
+        for number, line in enumerate(replay, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = record["body"]
+            if isinstance(body, str):
+                body = json.loads(body)
+            traffic.append((record.get("request_id", f"replay-{number}"), record.get("title") or TARGET_PATHS["api"], body))
+    return traffic
+
+
+def save_replay(path: str, traffic) -> None:
+    with open(path, "w", encoding="utf-8") as replay:
+        for request_id, target, body in traffic:
+            replay.write(json.dumps({"request_id": request_id, "title": target, "body": json.dumps(body)}) + "\n")
+
+
+def signed_headers(body: bytes) -> dict:
+    timestamp = str(int(time.time()))
+    signature = SIGNING_KEY.sign(timestamp.encode() + body).signature.hex()
+    return {"X-Signature-Ed25519": signature, "X-Signature-Timestamp": timestamp, "Content-Type": "application/json"}
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(timings, elapsed: float, errors) -> None:
+    print(f"{'stage':<22} {'count':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, samples in timings.items():
+        if not samples:
+            continue
+        print(f"{stage:<22} {len(samples):>7} {len(samples) / elapsed:>9.1f} "
+              f"{percentile(samples, 0.50) * 1e3:>9.1f} {percentile(samples, 0.95) * 1e3:>9.1f} "
+              f"{percentile(samples, 0.99) * 1e3:>9.1f}")
+    for status, count in sorted(errors.items()):
+        print(f"HTTP {status}: {count} responses")
+
+
+async def wait_for_jobs(job_queue, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while (job_queue.depth or job_queue.in_progress) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def run(args, traffic) -> None:
+    if args.target == "root":
+        import main as root_main
+        app, api_main = root_main.app, None
+    else:
+        from api import main as api_main
+        from api import recipe_client
+        app = api_main.app
+        recipe_client.provider = OpenAIProvider(FakeOpenAI(ttft=args.ttft, per_token=args.per_token))
+
+    fake = FakeDiscord(limit=args.discord_limit, window=1.0, latency=args.discord_latency)
+    await fake.start()
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    sent_at = {}
+
+    if api_main is not None:
+        api_main.webhook_client = DiscordWebhookClient(base_url=fake.url)
+        handler = api_main.job_queue.handlers["findrecipe"]
+
+        async def timed_handler(**payload):
+            started = time.monotonic()
+            token = payload["token"]
+            if token in sent_at:
+                timings["queued"].append(started - sent_at[token])
+            try:
+                await handler(**payload)
+            finally:
+                timings["generation"].append(time.monotonic() - started)
+
+        api_main.job_queue.handlers["findrecipe"] = timed_handler
+
+    # ASGITransport doesn't send lifespan events, so run the startup/shutdown hooks here
+    lifespan = app.router.lifespan_context(app)
+    await lifespan.__aenter__()
+
+    pending = iter(traffic)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as http:
+        async def worker():
+            for request_id, path, body in pending:
+                raw = json.dumps(body).encode()
+                headers = signed_headers(raw) if path != "/api/findrecipe" else {"Content-Type": "application/json"}
+                token = body.get("token")
+                started = time.monotonic()
+                if token:
+                    sent_at[token] = started
+                response = await http.post(path, content=raw, headers=headers)
+                finished = time.monotonic()
+                timings[f"http {kind_of(path, body)}"].append(finished - started)
+                if response.status_code != 200:
+                    errors[response.status_code] += 1
+
+        # Keep the apps' own logging out of the report
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            start = time.monotonic()
+            await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+            if api_main is not None:
+                await wait_for_jobs(api_main.job_queue, args.drain_timeout)
+            elapsed = time.monotonic() - start
+
+    for token, delivered in fake.first_delivery.items():
+        if token in sent_at:
+            timings["follow-up"].append(delivered - sent_at[token])
+
+    print(f"{len(traffic)} requests against {args.target} at concurrency {args.concurrency} in {elapsed:.2f}s")
+    report(timings, elapsed, errors)
+    if api_main is not None:
+        print(f"queue: {api_main.job_queue.stats()}")
+    await lifespan.__aexit__(None, None, None)
+    await fake.stop()
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    unknown = set(mix) - {"ping", "findrecipe", "unknown", "api-findrecipe"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown request kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(TARGET_PATHS), default="api",
+                        help="api = api/main.py, root = main.py /interactions")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("ping=1,findrecipe=8,unknown=1"),
+                        help="weighted request kinds: ping, findrecipe, unknown, api-findrecipe")
+    parser.add_argument("--distinct", type=int, default=50, help="number of distinct ingredient lists")
+    parser.add_argument("--ttft", type=float, default=0.4, help="fake OpenAI time to first token in seconds")
+    parser.add_argument("--per-token", type=float, default=0.002, help="fake OpenAI generation time per token")
+    parser.add_argument("--discord-latency", type=float, default=0.02, help="fake Discord response time")
+    parser.add_argument("--discord-limit", type=int, default=5, help="fake Discord requests per token per second")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="seconds to wait for queued jobs")
+    parser.add_argument("--replay", help="replay recorded traffic from a requests.jsonl-style file")
+    parser.add_argument("--record", help="write the generated traffic to a requests.jsonl-style file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the apps' own output")
+    args = parser.parse_args()
+
+    traffic = load_replay(args.replay) if args.replay else generate(args)
+    if args.record:
+        save_replay(args.record, traffic)
+    asyncio.run(run(args, traffic))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,24 @@
-import requests
-import json
-import time
+import sys
 import config
 from config import validate_config
 
-def register_commands():
-    """Register slash commands with Discord."""
+# Every slash command of the application, shared with the gateway bot (bot/main.py)
+COMMANDS = config.load_commands()
+
+def register_commands(force: bool = False):
+    """Register slash commands with Discord, skipped when they haven't changed since the last run."""
     # Validate configuration
     validate_config()
     
-    # Define the commands to register
-    commands = [
-        {
-            "name": "ping",
-            "description": "Check if the bot is working",
-            "type": 1  # CHAT_INPUT
-        }
-    ]
+    digest = config.command_manifest_hash(COMMANDS, config.DISCORD_APP_ID)
+    if not force and config.read_command_hash() == digest:
+        print("Commands unchanged since the last registration, nothing to do")
+        return True
+    
+    # Only needed when there is something to send
+    import requests
     
-    # Discord API endpoint for registering global commands
+    # Discord API endpoint for global commands; PUT overwrites them all in one request
     url = f"https://discord.com/api/v10/applications/{config.DISCORD_APP_ID}/commands"
     
     # Set up headers with authorization
@@ -27,23 +27,25 @@ def register_commands():
         "Content-Type": "application/json"
     }
     
-    # Register each command
-    for command in commands:
-        response = requests.post(url, headers=headers, json=command)
-        
-        if response.status_code in (200, 201):
-            print(f"Successfully registered command: {command['name']}")
-        else:
-            print(f"Failed to register command {command['name']}: {response.status_code}")
-            try:
-                print(f"Error: {response.json()}")
-            except:
-                print(f"Response: {response.text}")
+    response = requests.put(url, headers=headers, json=COMMANDS, timeout=30)
+    if response.status_code != 200:
+        print(f"Failed to register commands: {response.status_code}")
+        try:
+            print(f"Error: {response.json()}")
+        except ValueError:
+            print(f"Response: {response.text}")
+        return False
+    
+    config.write_command_hash(digest)
+    print(f"Successfully registered {len(COMMANDS)} command(s): {', '.join(c['name'] for c in COMMANDS)}")
+    return True
 
 def main():
     """Main function to set up the Discord bot."""
     print("Registering Discord commands...")
-    register_commands()
+    # --force registers even if the stored hash matches (e.g. after deleting commands by hand)
+    if not register_commands(force="--force" in sys.argv[1:]):
+        sys.exit(1)
     print("Commands registered. You can now start the FastAPI server using 'python main.py'")
     print("Then, expose it using ngrok with 'ngrok http 8000'")
     print("Finally, update your Discord application's interactions endpoint URL in the Developer Portal")
@@ -1,12 +1,25 @@
+import time
+
+# Measured from here to the first on_ready, logged as the bot's startup time
+PROCESS_STARTED = time.perf_counter()
+
 import os
+import sys
+import logging
+import logging.handlers
+import queue
 import discord
 from discord import app_commands
 from discord.ext import commands
-import requests
+import aiohttp
 import json
 import asyncio
 from dotenv import load_dotenv
 
+# config.py, with the command manifest shared with bot.py, lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
 # Load environment variables
 load_dotenv()
 
@@ -15,48 +28,154 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 BOT_PREFIX = "!"
 FASTAPI_URL = "http://localhost:8000"  # Your FastAPI server URL
 
+# Logging goes through a queue so formatting and writing happen on a background
+# thread instead of the gateway event loop. discord.py's own logs use it too
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+log = logging.getLogger("recipebot")
+
+def setup_logging():
+    log_queue = queue.Queue(10000)
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    return listener
+
+
+class BackendError(Exception):
+    """Raised when the FastAPI backend fails, times out or can't be reached"""
+
+
+class BackendClient:
+    """Long-lived async HTTP client for the FastAPI backend.
+
+    One session (and connection pool) is reused for every call so the bot never
+    blocks the gateway event loop, and each call has its own deadline.
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 50,
+                 search_timeout: float = 30.0, default_timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.search_timeout = search_timeout
+        self.default_timeout = default_timeout
+        self._session = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def find_recipes(self, ingredients: str, user_id: str):
+        # OpenAI can take a while, so the search gets a longer deadline
+        return await self._request("POST", "/api/findrecipe", timeout=self.search_timeout,
+                                   json={"ingredients": ingredients, "user_id": user_id})
+
+    async def get_recipe(self, recipe_id):
+        return await self._request("GET", f"/api/recipe/{recipe_id}", timeout=self.search_timeout)
+
+    async def add_favorite(self, recipe_data, user_id: str):
+        return await self._request("POST", "/api/favorites/add", json=recipe_data, params={"user_id": user_id})
+
+    async def get_favorites(self, user_id: str, limit: int = 10, after: str = None):
+        params = {"limit": str(limit)}
+        if after:
+            params["after"] = after
+        return await self._request("GET", f"/api/favorites/{user_id}", params=params)
+
+    async def create_meal_plan(self, user_id: str, days: int = 7, diet=None):
+        return await self._request("POST", "/api/mealplan",
+                                   json={"user_id": user_id, "days": days, "diet": diet or []})
+
+    async def replace_meal(self, user_id: str, day: int):
+        return await self._request("POST", f"/api/mealplan/{user_id}/replace", params={"day": str(day)})
+
+    async def _request(self, method: str, path: str, timeout: float = None, **kwargs):
+        await self.start()
+        deadline = aiohttp.ClientTimeout(total=timeout or self.default_timeout)
+        try:
+            async with self._session.request(method, self.base_url + path, timeout=deadline, **kwargs) as response:
+                response.raise_for_status()
+                return await response.json()
+        except asyncio.TimeoutError:
+            raise BackendError(f"{method} {path} timed out after {deadline.total:g}s")
+        except aiohttp.ClientError as e:
+            raise BackendError(f"{method} {path} failed: {e}")
+
+
+class RecipeBot(commands.Bot):
+    """Bot that owns one backend client for its whole lifetime"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backend = BackendClient(FASTAPI_URL)
+        self.ready_logged = False
+
+    async def setup_hook(self):
+        await self.backend.start()
+        # Once per process rather than on every reconnect (on_ready fires after each one)
+        await self.sync_commands()
+
+    async def sync_commands(self):
+        """Overwrite the global slash commands with the manifest in one request, only if it changed"""
+        commands = config.load_commands()
+        missing = {command.name for command in self.tree.get_commands()} - {command["name"] for command in commands}
+        if missing:
+            log.warning("Commands missing from %s, they won't be registered: %s",
+                        config.COMMANDS_PATH, ", ".join(sorted(missing)))
+        # Commands are only sent to Discord when the manifest changed since bot.py or this bot last did
+        digest = config.command_manifest_hash(commands, self.application_id)
+        if config.read_command_hash() == digest:
+            log.info("Slash commands unchanged, skipping sync")
+            return
+        try:
+            # The whole manifest, not just this tree, so commands served elsewhere aren't deleted
+            synced = await self.http.bulk_upsert_global_commands(self.application_id, commands)
+        except Exception as e:
+            log.error("Failed to sync commands: %s", e)
+            return
+        config.write_command_hash(digest)
+        log.info("Synced %d command(s)", len(synced))
+
+    async def close(self):
+        await self.backend.close()
+        await super().close()
+
+
 intents = discord.Intents.default()
 intents.message_content = True
 intents.reactions = True
-bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents)
+bot = RecipeBot(command_prefix=BOT_PREFIX, intents=intents)
 
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+    log.info("%s has connected to Discord!", bot.user)
+    if not bot.ready_logged:
+        bot.ready_logged = True
+        log.info("Ready %.2fs after starting", time.perf_counter() - PROCESS_STARTED)
 
 # Define the slash command
 @bot.tree.command(name="findrecipe", description="Find recipes based on ingredients")
 async def find_recipe(interaction: discord.Interaction, ingredients: str):
     # Defer the response immediately to prevent timeout
     await interaction.response.defer(thinking=True)
-    print(f"Received request for ingredients: {ingredients}")
+    log.debug("Received request for ingredients: %s", ingredients)
     
     try:
-        # Call FastAPI backend with a separate async function to avoid blocking
-        async def fetch_recipes():
-            try:
-                # Set a timeout for the request
-                response = requests.post(
-                    f"{FASTAPI_URL}/api/findrecipe",
-                    json={"ingredients": ingredients, "user_id": str(interaction.user.id)},
-                    timeout=30  # Increase timeout to allow for OpenAI processing
-                )
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.Timeout:
-                print("Request to FastAPI timed out")
-                return None
-            except Exception as e:
-                print(f"Error in fetch_recipes: {e}")
-                return None
-        
-        # Run the fetch in a non-blocking way
-        recipes = await asyncio.to_thread(fetch_recipes)
+        # Call the FastAPI backend without blocking the gateway event loop
+        try:
+            recipes = await bot.backend.find_recipes(ingredients, str(interaction.user.id))
+        except BackendError as e:
+            log.warning("Error in fetch_recipes: %s", e)
+            recipes = None
         
         if not recipes:
             await interaction.followup.send("The recipe search timed out or no recipes were found. Please try again with different ingredients.")
@@ -65,21 +184,12 @@ async def find_recipe(interaction: discord.Interaction, ingredients: str):
         # Format and send the first recipe
         recipe = recipes[0]  # Get the first recipe
         
-        # Get detailed recipe information with a separate async function
-        async def fetch_recipe_details():
-            try:
-                detailed_response = requests.get(
-                    f"{FASTAPI_URL}/api/recipe/{recipe['id']}",
-                    timeout=30
-                )
-                detailed_response.raise_for_status()
-                return detailed_response.json()
-            except Exception as e:
-                print(f"Error fetching recipe details: {e}")
-                return None
-        
-        # Run the details fetch in a non-blocking way
-        detailed_recipe = await asyncio.to_thread(fetch_recipe_details)
+        # Get detailed recipe information
+        try:
+            detailed_recipe = await bot.backend.get_recipe(recipe['id'])
+        except BackendError as e:
+            log.warning("Error fetching recipe details: %s", e)
+            detailed_recipe = None
         
         embed = discord.Embed(
             title=recipe["title"],
@@ -90,17 +200,7 @@ async def find_recipe(interaction: discord.Interaction, ingredients: str):
         if "image" in recipe:
             embed.set_thumbnail(url=recipe["image"])
         
-        # Handle missing ingredients - could be in different formats
-        missing_ingredients = recipe.get("missedIngredients", [])
-        missing_ingredient_text = "None"
-        
-        if missing_ingredients:
-            # Handle both potential formats
-            if isinstance(missing_ingredients[0], dict) and "name" in missing_ingredients[0]:
-                missing_ingredient_text = ", ".join([ing["name"] for ing in missing_ingredients])
-            elif isinstance(missing_ingredients, list) and all(isinstance(item, str) for item in missing_ingredients):
-                missing_ingredient_text = ", ".join(missing_ingredients)
-        
+        missing_ingredient_text = ", ".join(ing["name"] for ing in recipe.get("missedIngredients") or []) or "None"
         embed.add_field(name="Missing Ingredients", value=missing_ingredient_text, inline=False)
         
         if detailed_recipe and "instructions" in detailed_recipe:
@@ -122,7 +222,7 @@ async def find_recipe(interaction: discord.Interaction, ingredients: str):
         await message.add_reaction("👍")
         
     except Exception as e:
-        print(f"Error in find_recipe command: {e}")
+        log.error("Error in find_recipe command: %s", e)
         await interaction.followup.send(f"Error finding recipes: {str(e)}")
 
 @bot.event
@@ -145,20 +245,148 @@ async def on_reaction_add(reaction, user):
                 recipe_id = footer_text.split("Recipe ID:")[1].split("|")[0].strip()
             
             if recipe_id:
-                response = requests.get(f"{FASTAPI_URL}/api/recipe/{recipe_id}")
-                recipe_data = response.json()
-                
-                requests.post(
-                    f"{FASTAPI_URL}/api/favorites/add",
-                    json=recipe_data,
-                    params={"user_id": str(user.id)}
-                )
+                # The backend stores a reference to the recipe, so the ID and title are enough
+                await bot.backend.add_favorite({"id": int(recipe_id), "title": recipe_title}, str(user.id))
                 
                 # Notify the user
                 await user.send(f"Added '{recipe_title}' to your favorites!")
         except Exception as e:
-            print(f"Error saving favorite: {e}")
+            log.warning("Error saving favorite: %s", e)
+
+FAVORITES_PAGE_SIZE = 10
+
+
+class FavoritesView(discord.ui.View):
+    """Previous/Next buttons for browsing favorites one page at a time
+
+    Pages are fetched lazily with the backend's cursors. The cursor that starts
+    each page we've seen is remembered so going back doesn't refetch from the start.
+    """
+
+    def __init__(self, user: discord.abc.User):
+        super().__init__(timeout=300)
+        self.user = user
+        self.page_cursors = [None]  # cursor that starts each page; page 0 starts at the beginning
+        self.page_index = 0
+        self.next_cursor = None
+
+    async def load_page(self):
+        page = await bot.backend.get_favorites(str(self.user.id), FAVORITES_PAGE_SIZE, self.page_cursors[self.page_index])
+        self.next_cursor = page.get("next_cursor")
+        self.previous_page.disabled = self.page_index == 0
+        self.next_page.disabled = self.next_cursor is None
+        return self.build_embed(page.get("items", []))
+
+    def build_embed(self, items):
+        embed = discord.Embed(title=f"{self.user.display_name}'s favorite recipes", color=discord.Color.green())
+        if not items:
+            embed.description = "No favorites yet. React with 👍 on a recipe to save it!"
+        for recipe in items:
+            embed.add_field(name=recipe.get("title", "Untitled recipe"), value=f"Recipe ID: {recipe['id']}", inline=False)
+        embed.set_footer(text=f"Page {self.page_index + 1}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Only the person who ran /favorites can page through it
+        return interaction.user.id == self.user.id
+
+    async def show(self, interaction: discord.Interaction):
+        try:
+            embed = await self.load_page()
+        except BackendError as e:
+            log.warning("Error loading favorites: %s", e)
+            await interaction.response.send_message("Couldn't load your favorites right now, please try again.", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_index = max(0, self.page_index - 1)
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is None:
+            return
+        if self.page_index + 1 == len(self.page_cursors):
+            self.page_cursors.append(self.next_cursor)
+        self.page_index += 1
+        await self.show(interaction)
+
+
+@bot.tree.command(name="favorites", description="Browse your saved recipes")
+async def favorites(interaction: discord.Interaction):
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    view = FavoritesView(interaction.user)
+    try:
+        embed = await view.load_page()
+    except BackendError as e:
+        log.warning("Error loading favorites: %s", e)
+        await interaction.followup.send("Couldn't load your favorites right now, please try again.")
+        return
+    await interaction.followup.send(embed=embed, view=view)
+
+DIET_CHOICES = ["vegetarian", "vegan", "pescatarian", "gluten-free", "dairy-free"]
+
+
+def build_meal_plan_embed(user: discord.abc.User, plan):
+    embed = discord.Embed(title=f"{user.display_name}'s meal plan", color=discord.Color.green())
+    if plan.get("diet"):
+        embed.description = "Diet: " + ", ".join(plan["diet"])
+    for entry in plan.get("days", []):
+        recipe = entry["recipe"]
+        embed.add_field(name=f"Day {entry['day']}", value=f"{recipe.get('title', 'Untitled recipe')} (ID: {recipe['id']})", inline=False)
+    shared = plan.get("shared_ingredients", [])
+    if shared:
+        embed.set_footer(text="Shared across the week: " + ", ".join(shared[:10]))
+    return embed
+
+
+class MealPlanView(discord.ui.View):
+    """A menu for swapping out one day of the meal plan"""
+
+    def __init__(self, user: discord.abc.User, plan):
+        super().__init__(timeout=600)
+        self.user = user
+        self.swap_day.options = [
+            discord.SelectOption(label=f"Day {entry['day']}: {entry['recipe'].get('title', 'Untitled')}"[:100], value=str(entry["day"]))
+            for entry in plan.get("days", [])
+        ]
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Only the person who made the plan can change it
+        return interaction.user.id == self.user.id
+
+    @discord.ui.select(placeholder="Swap a day for another recipe")
+    async def swap_day(self, interaction: discord.Interaction, select: discord.ui.Select):
+        try:
+            plan = await bot.backend.replace_meal(str(self.user.id), int(select.values[0]))
+        except BackendError as e:
+            log.warning("Error replacing meal: %s", e)
+            await interaction.response.send_message("Couldn't swap that day right now, please try again.", ephemeral=True)
+            return
+        new_view = MealPlanView(self.user, plan)
+        await interaction.response.edit_message(embed=build_meal_plan_embed(self.user, plan), view=new_view)
+
+
+@bot.tree.command(name="mealplan", description="Plan a week of meals from your saved recipes")
+@app_commands.describe(diet="Only use recipes that fit this diet", days="Number of days to plan (1-14)")
+@app_commands.choices(diet=[app_commands.Choice(name=name, value=name) for name in DIET_CHOICES])
+async def mealplan(interaction: discord.Interaction, diet: app_commands.Choice[str] = None, days: app_commands.Range[int, 1, 14] = 7):
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    try:
+        plan = await bot.backend.create_meal_plan(str(interaction.user.id), days, [diet.value] if diet else [])
+    except BackendError as e:
+        log.warning("Error creating meal plan: %s", e)
+        await interaction.followup.send("Couldn't make a meal plan. Save a few more recipes with 👍 and try again!")
+        return
+    await interaction.followup.send(embed=build_meal_plan_embed(interaction.user, plan), view=MealPlanView(interaction.user, plan))
 
 # Only run the bot when this file is executed directly
 if __name__ == "__main__":
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    listener = setup_logging()
+    try:
+        # log_handler=None: don't let discord.py install a second, synchronous handler
+        bot.run(DISCORD_TOKEN, log_handler=None)
+    finally:
+        listener.stop()
\ No newline at end of file
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
 
@@ -12,6 +14,37 @@ DISCORD_PUBLIC_KEY = os.getenv('DISCORD_PUBLIC_KEY')
 # Server configuration
 API_HOST = os.getenv('API_HOST', '0.0.0.0')
 API_PORT = int(os.getenv('API_PORT', '8000'))
+# More than one worker process for production (see api/serve.py); auto-reload is for
+# development and only applies with a single worker
+API_WORKERS = int(os.getenv('API_WORKERS', '1'))
+API_RELOAD = os.getenv('API_RELOAD', 'true').lower() == 'true'
+
+# The slash command manifest, and the hash of the last one registered. bot.py and the
+# gateway bot (bot/main.py) share both and only call Discord when the hash changes
+COMMANDS_PATH = os.getenv('COMMANDS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'commands.json'))
+COMMAND_HASH_PATH = os.getenv('COMMAND_HASH_PATH', '.commands.hash')
+
+def load_commands():
+    """Every slash command of the application; registering replaces all global commands with this list"""
+    with open(COMMANDS_PATH) as f:
+        return json.load(f)
+
+def command_manifest_hash(commands, app_id) -> str:
+    """Content hash of a command list for one application"""
+    manifest = json.dumps({'app_id': str(app_id), 'commands': commands}, sort_keys=True)
+    return hashlib.sha256(manifest.encode()).hexdigest()
+
+def read_command_hash():
+    """Hash of the last registered manifest, or None if nothing was registered yet"""
+    try:
+        with open(COMMAND_HASH_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_command_hash(digest: str):
+    with open(COMMAND_HASH_PATH, 'w') as f:
+        f.write(digest + '\n')
 
 # Ensure all required environment variables are set
 def validate_config():
@@ -1,43 +1,35 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
-from fastapi.responses import JSONResponse
-import uvicorn
-import hmac
-import hashlib
+from fastapi.responses import JSONResponse, Response
 import json
 import time
+import logging
 
 import config
 from config import validate_config
+from api.interactions import InteractionVerifier, Interaction
+from api.interactions import PING, APPLICATION_COMMAND, PONG_RESPONSE
+from api.metrics import instrument_app
+from api.logs import configure_logging
+from api import serve
+
+# Log records are formatted and written on a background thread (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE)
+configure_logging()
+log = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(title="Discord Bot API")
 
+# Request timings plus GET /metrics for Prometheus (METRICS_ENABLED=false turns it off)
+instrument_app(app)
+
+# Build the signature verifier once at startup instead of on every request
+verifier = InteractionVerifier(config.DISCORD_PUBLIC_KEY)
+
 # Verify Discord signature
-async def verify_signature(request: Request):
-    # Get Discord signature and timestamp
-    signature = request.headers.get('X-Signature-Ed25519')
-    timestamp = request.headers.get('X-Signature-Timestamp')
-    
-    if not signature or not timestamp:
-        raise HTTPException(status_code=401, detail="Missing signature or timestamp")
-    
-    # Get raw request body
-    body = await request.body()
-    
-    # Verify signature
-    message = timestamp.encode() + body
-    
+async def verify_signature(request: Request) -> Interaction:
     try:
-        # Convert hex strings to bytes
-        signature_bytes = bytes.fromhex(signature)
-        public_key_bytes = bytes.fromhex(config.DISCORD_PUBLIC_KEY)
-        
-        # Use nacl's verify_key to verify the signature
-        import nacl.signing
-        verify_key = nacl.signing.VerifyKey(public_key_bytes)
-        verify_key.verify(message, signature_bytes)
-        
-        return await request.json()
+        # Verify against the raw body, then decode it once into an Interaction
+        return await verifier.verify_request(request)
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid signature: {str(e)}")
 
@@ -47,20 +39,22 @@ async def root():
     return {"status": "ok", "message": "Discord bot API is running"}
 
 @app.post("/interactions")
-async def interactions(data: dict = Depends(verify_signature)):
+async def interactions(interaction: Interaction = Depends(verify_signature)):
     """Handle Discord interactions."""
     
-    # Log the incoming data for debugging
-    print(f"Received interaction: {data}")
+    # Log the incoming interaction; the full payload only at DEBUG, tokens are redacted by the writer
+    log.info("Received interaction", extra={"event": "interaction_received", "type": interaction.type,
+                                            "command": interaction.command_name})
+    log.debug("Interaction payload: %s", interaction.raw)
     
     # Interaction type 1: PING (used by Discord to verify the endpoint)
-    if data.get("type") == 1:
-        print("Responding to PING with PONG")
-        return JSONResponse(content={"type": 1})  # Type 1: PONG response
+    if interaction.type == PING:
+        log.debug("Responding to PING with PONG")
+        return Response(content=PONG_RESPONSE, media_type="application/json")  # Type 1: PONG response
     
     # Interaction type 2: APPLICATION_COMMAND (slash commands)
-    elif data.get("type") == 2:
-        command_name = data.get("data", {}).get("name", "")
+    elif interaction.type == APPLICATION_COMMAND:
+        command_name = interaction.command_name or ""
         
         if command_name == "ping":
             return JSONResponse(content={
@@ -91,12 +85,14 @@ def start_api():
     # Validate configuration
     validate_config()
     
-    # Start the server
-    uvicorn.run(
+    # Start the server: API_WORKERS processes with uvloop/httptools when installed,
+    # or a single auto-reloading process for development
+    serve.run(
         "main:app",
         host=config.API_HOST,
         port=config.API_PORT,
-        reload=True
+        workers=config.API_WORKERS,
+        reload=config.API_RELOAD and config.API_WORKERS == 1
     )
 
 if __name__ == "__main__":
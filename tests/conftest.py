@@ -0,0 +1,6 @@
+import os
+
+# api.recipe_client and api.main open their stores on import; keep them in memory and off the network
+os.environ.setdefault("RECIPE_PROVIDER", "local")
+os.environ.setdefault("RECIPE_DB_PATH", ":memory:")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
@@ -0,0 +1,70 @@
+from api.cache import SharedCache, TieredCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now += 10
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert "b" not in cache
+    clock.now += 60
+    assert cache.get("a", "gone") == "gone"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 2, 2, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # b is now the least recently used
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_shared_cache_is_visible_across_connections(tmp_path):
+    path = str(tmp_path / "cache.db")
+    clock = FakeClock()
+    first = SharedCache(path, ttl=60, clock=clock)
+    second = SharedCache(path, ttl=60, clock=clock)
+
+    first.set(("chicken", "rice"), [{"id": 1}])
+    # JSON round trip: tuples come back as lists
+    assert second.get(("chicken", "rice")) == [{"id": 1}]
+    clock.now += 61
+    assert second.get(("chicken", "rice")) is None
+    assert second.stats()["hits"] == 1
+    first.close()
+    second.close()
+
+
+def test_tiered_cache_promotes_shared_hits_into_the_local_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    worker_a = TieredCache(TTLCache(ttl=60), SharedCache(path, ttl=60))
+    worker_b = TieredCache(TTLCache(ttl=60), SharedCache(path, ttl=60))
+
+    worker_a.set("key", "value")
+    assert "key" not in worker_b.local
+    assert worker_b.get("key") == "value"
+    assert "key" in worker_b.local
+    assert worker_b.get("key") == "value"
+    # One miss then one hit locally, the miss was a hit in the shared tier
+    assert worker_b.local.stats()["hits"] == 1
+    assert worker_b.shared.stats()["hits"] == 1
+    assert worker_b.stats()["hits"] == 2
+
+    worker_b.pop("key")
+    assert worker_a.shared.get("key") is None
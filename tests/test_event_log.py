@@ -0,0 +1,66 @@
+import os
+import threading
+
+import pytest
+
+from api.event_log import Consumer, EventLog
+
+
+def test_group_commit_makes_appends_durable_and_readable(tmp_path):
+    log = EventLog(str(tmp_path), flush_interval=0.01)
+    threads = [threading.Thread(target=lambda i=i: [log.append({"n": i * 100 + j}) for j in range(100)])
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert log.sync(timeout=5)
+    assert log.durable_offset == 400
+    # Many appends share each write and fsync
+    assert log.batches < 400
+    records = Consumer(log, "test").poll(max_records=1000)
+    assert [offset for offset, _ in records] == list(range(400))
+    assert sorted(event["n"] for _, event in records) == list(range(400))
+    log.close()
+
+
+def test_reopen_cuts_off_a_torn_record(tmp_path):
+    log = EventLog(str(tmp_path))
+    for n in range(3):
+        log.append({"n": n})
+    log.close()
+    segment = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x00\x00\x10{\"n\"")  # a crash halfway through the next record
+
+    log = EventLog(str(tmp_path))
+    assert log.next_offset == 3
+    assert log.append({"n": 3}) == 3
+    log.sync(timeout=5)
+    assert [event["n"] for _, event in Consumer(log, "test").poll()] == [0, 1, 2, 3]
+    log.close()
+
+
+def test_failed_write_stops_the_writer_and_fails_fast(tmp_path):
+    log = EventLog(str(tmp_path))
+    log._file.close()  # every write from now on raises
+
+    log.append({"n": 0})
+    with pytest.raises(RuntimeError, match="stopped"):
+        log.sync(timeout=5)
+    with pytest.raises(RuntimeError, match="stopped"):
+        log.append({"n": 1})
+    log.close()
+
+
+def test_append_refuses_past_max_pending(tmp_path):
+    # The writer waits out its group-commit window before taking the batch, so nothing drains meanwhile
+    log = EventLog(str(tmp_path), flush_interval=0.5, max_pending=2)
+    log.append({"n": 0})
+    log.append({"n": 1})
+    with pytest.raises(RuntimeError, match="waiting to be written"):
+        log.append({"n": 2})
+    assert log.sync(timeout=5)
+    assert log.append({"n": 2}) == 2
+    log.close()
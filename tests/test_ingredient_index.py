@@ -0,0 +1,62 @@
+from api.ingredient_index import IngredientIndex, recipe_ingredients
+
+RECIPES = {
+    1: ["chicken", "rice", "garlic"],
+    2: ["chicken", "rice"],
+    3: ["chicken", "pasta", "garlic", "tomato"],
+    4: ["tofu", "rice"],
+}
+
+
+def build():
+    index = IngredientIndex()
+    index.rebuild(RECIPES.items())
+    return index
+
+
+def test_full_coverage_ranks_fewest_missed_first():
+    matches = build().search(["Chicken", "rice"], limit=5)
+    assert [(match.recipe_id, match.used, match.missed) for match in matches] == [
+        (2, 2, []),
+        (1, 2, ["garlic"]),
+    ]
+
+
+def test_partial_coverage_ranks_most_used_first():
+    matches = build().search(["chicken", "rice", "tomatoes"], limit=5, min_coverage=0.5)
+    # Two of three is enough; tofu and rice (one of three) is not
+    assert [(match.recipe_id, match.used) for match in matches] == [(2, 2), (1, 2), (3, 2)]
+
+
+def test_many_query_ingredients_count_correctly():
+    # More than one bit plane: counts up to 4 have to add up right
+    index = IngredientIndex()
+    index.rebuild([(n, ["a", "b", "c", "d"][:n]) for n in range(1, 5)])
+    matches = index.search(["a", "b", "c", "d"], limit=10, min_coverage=0.25)
+    assert [(match.recipe_id, match.used) for match in matches] == [(4, 4), (3, 3), (2, 2), (1, 1)]
+
+
+def test_re_adding_a_recipe_replaces_its_ingredients():
+    index = build()
+    index.add(2, ["chicken", "noodle"])
+    assert [match.recipe_id for match in index.search(["chicken", "rice"])] == [1]
+    assert [match.recipe_id for match in index.search(["noodles"])] == [2]
+    index.remove(2)
+    assert index.search(["noodle"]) == []
+    assert len(index) == 3
+
+
+def test_unknown_ingredients_and_empty_queries_find_nothing():
+    index = build()
+    assert index.search(["saffron"]) == []
+    assert index.search([]) == []
+    assert index.search(["chicken"], limit=0) == []
+
+
+def test_recipe_ingredients_only_keeps_what_the_recipe_names():
+    recipe = {"title": "Garlic Chicken with Tomatoes", "usedIngredientCount": 3,
+              "missedIngredients": [{"name": "Olive Oil"}]}
+    # Three query ingredients are "used", but only two are named; rice isn't guessed in
+    assert recipe_ingredients(recipe, ["chicken", "rice", "tomato"]) == ["chicken", "olive oil", "tomato"]
+    # Whole words only: eggplant is not egg
+    assert recipe_ingredients({"title": "Eggplant Stir Fry"}, ["egg"]) == []
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from api.jobs import JobQueue, QueueFull
+
+
+def read_journal(path):
+    with open(path, encoding="utf-8") as journal:
+        return [json.loads(line) for line in journal]
+
+
+def test_replay_resumes_unfinished_jobs_after_a_crash(tmp_path):
+    path = str(tmp_path / "jobs.journal")
+    now = time.time()
+    unfinished = {"kind": "work", "payload": {"n": 1}, "guild_id": "g", "id": "a", "enqueued_at": now}
+    finished = {**unfinished, "payload": {"n": 2}, "id": "b"}
+    expired = {**unfinished, "payload": {"n": 3}, "id": "c", "enqueued_at": now - 3600}
+    with open(path, "w", encoding="utf-8") as journal:
+        for job in (unfinished, finished, expired):
+            journal.write(json.dumps({"op": "enqueue", "job": job}) + "\n")
+        journal.write(json.dumps({"op": "done", "id": "b"}) + "\n")
+        journal.write('{"op": "enqueue", "job": {"kind"')  # torn by the crash
+
+    ran = []
+
+    async def work(n):
+        ran.append(n)
+
+    async def main():
+        queue = JobQueue({"work": work}, workers=2, journal_path=path)
+        await queue.start()
+        assert queue.resumed == 1
+        while queue.completed < 1:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(main())
+    assert ran == [1]
+    # Replaying compacted the journal down to the job it resumed, which then finished
+    assert [record["op"] for record in read_journal(path)] == ["enqueue", "done"]
+
+
+def test_compaction_keeps_only_unfinished_jobs(tmp_path):
+    path = str(tmp_path / "jobs.journal")
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def work(n):
+            if n == "slow":
+                await gate.wait()
+
+        queue = JobQueue({"work": work}, workers=2, journal_path=path, compact_every=10, fsync_delay=0)
+        await queue.start()
+        queue.submit("work", {"n": "slow"})
+        for n in range(25):
+            queue.submit("work", {"n": n})
+        while queue.completed < 25:
+            await asyncio.sleep(0.01)
+        records = read_journal(path)
+        gate.set()
+        await queue.stop()
+        return records
+
+    records = asyncio.run(main())
+    # 20 finished jobs were compacted away; the slow job is still there, plus the last 5 finished
+    enqueued = [record["job"]["payload"]["n"] for record in records if record["op"] == "enqueue"]
+    assert enqueued[0] == "slow"
+    assert len(records) < 26 * 2
+    assert len([record for record in records if record["op"] == "done"]) == 5
+
+
+def test_submit_sheds_load_past_max_depth():
+    async def main():
+        queue = JobQueue({"work": asyncio.sleep}, workers=1, max_depth=2)
+        queue.submit("work", {"delay": 0})
+        queue.submit("work", {"delay": 0})
+        with pytest.raises(QueueFull):
+            queue.submit("work", {"delay": 0})
+        assert queue.stats()["shed"] == 1
+
+    asyncio.run(main())
+
+
+def test_guilds_are_served_round_robin():
+    order = []
+
+    async def work(guild):
+        order.append(guild)
+
+    async def main():
+        queue = JobQueue({"work": work}, workers=1)
+        for _ in range(3):
+            queue.submit("work", {"guild": "busy"}, guild_id="busy")
+        queue.submit("work", {"guild": "quiet"}, guild_id="quiet")
+        await queue.start()
+        while queue.completed < 4:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(main())
+    assert order == ["busy", "quiet", "busy", "busy"]
@@ -0,0 +1,41 @@
+import pytest
+
+from api.meal_plan import MealPlanner
+
+RECIPES = [
+    {"id": 100, "title": "Chicken Rice Bowl"},
+    {"id": 101, "title": "Tomato Pasta"},
+    {"id": 102, "title": "Garlic Tofu Stir Fry"},
+    {"id": 103, "title": "Beef Potato Stew"},
+]
+INGREDIENTS = [
+    ["chicken", "rice", "garlic"],
+    ["tomato", "pasta", "garlic"],
+    ["tofu", "garlic", "rice"],
+    ["beef", "potato", "onion"],
+]
+
+
+def test_replace_without_alternative_leaves_plan_unchanged():
+    # As many recipes as days: every recipe is already in the week
+    planner = MealPlanner(RECIPES, INGREDIENTS)
+    plan = planner.plan(days=4, seed=0)
+    before = (list(plan.recipe_ids), list(plan.members), plan.score, set(plan.rejected))
+
+    with pytest.raises(ValueError):
+        planner.replace(plan, 2)
+
+    assert (list(plan.recipe_ids), list(plan.members), plan.score, set(plan.rejected)) == before
+    assert len(set(plan.recipe_ids)) == 4
+
+
+def test_replace_picks_a_recipe_not_in_the_week():
+    planner = MealPlanner(RECIPES, INGREDIENTS)
+    plan = planner.plan(days=3, seed=0)
+    old = plan.recipe_ids[1]
+
+    planner.replace(plan, 1)
+
+    assert plan.recipe_ids[1] != old
+    assert len(set(plan.recipe_ids)) == 3
+    assert plan.score > float("-inf")
@@ -0,0 +1,77 @@
+import sqlite3
+
+from api.ratelimit import AdmissionControl, SharedTokenBucketLimiter, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, clock=clock)
+    assert [limiter.allow("u") for _ in range(3)] == [True, True, False]
+    assert limiter.retry_after("u") == 1.0
+    clock.now += 1
+    assert limiter.allow("u")
+    assert not limiter.allow("u")
+
+
+def test_two_connections_share_one_budget(tmp_path):
+    path = str(tmp_path / "limits.db")
+    clock = FakeClock()
+    # Two workers, each with its own connection to the same file
+    first = SharedTokenBucketLimiter(path, "buckets", rate=1.0, burst=3, clock=clock)
+    second = SharedTokenBucketLimiter(path, "buckets", rate=1.0, burst=3, clock=clock)
+
+    granted = [limiter.allow("u") for limiter in (first, second, first, second)]
+    assert granted == [True, True, True, False]
+    assert second.retry_after("u") == 1.0
+    clock.now += 1
+    assert second.allow("u")
+    assert not first.allow("u")
+    assert first.allow("other user")
+
+
+def test_shared_refund_gives_the_token_back(tmp_path):
+    clock = FakeClock()
+    users = SharedTokenBucketLimiter(str(tmp_path / "limits.db"), "users", rate=1.0, burst=1, clock=clock)
+    guilds = SharedTokenBucketLimiter(str(tmp_path / "limits.db"), "guilds", rate=1.0, burst=1, clock=clock)
+    admission = AdmissionControl(users, guilds)
+
+    assert admission.admit("u1", "g").allowed
+    rejected = admission.admit("u2", "g")
+    assert (rejected.allowed, rejected.scope) == (False, "guild")
+    # u2's token went back, so only the guild is holding u2 up
+    assert users.allow("u2")
+
+
+def test_shared_buckets_are_pruned_to_max_keys(tmp_path):
+    clock = FakeClock()
+    limiter = SharedTokenBucketLimiter(str(tmp_path / "limits.db"), "buckets", rate=0.001, burst=1,
+                                       max_keys=10, prune_every=25, clock=clock)
+    for n in range(100):
+        clock.now += 0.01
+        limiter.allow(f"user-{n}")
+    assert len(limiter) <= 10 + 25
+    assert limiter.stats()["evicted"] >= 100 - 10 - 25
+    # The most recently used buckets survive
+    assert not limiter.allow("user-99")
+
+
+def test_locked_database_falls_back_to_local_buckets(tmp_path):
+    path = str(tmp_path / "limits.db")
+    limiter = SharedTokenBucketLimiter(path, "buckets", rate=1.0, burst=2, busy_timeout=0.01)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        assert [limiter.allow("u") for _ in range(3)] == [True, True, False]
+        assert limiter.stats()["fallbacks"] == 3
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert limiter.allow("u")
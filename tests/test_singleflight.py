@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from api.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fetch, "k") for _ in range(5)), flight.do("j", fetch, "j"))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["K"] * 5 + ["J"]
+    assert sorted(calls) == ["j", "k"]
+    assert flight.stats() == {"in_flight": 0, "executed": 2, "saved": 4}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ValueError("upstream down")
+        return "ok"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", flaky) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        # The failure is forgotten, so the next call runs again
+        assert await flight.do("k", flaky) == "ok"
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+
+
+def test_cancelling_one_waiter_leaves_the_others_running():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_work_is_cancelled_when_every_waiter_goes_away():
+    state = {"cancelled": False}
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def main():
+        flight = SingleFlight()
+        waiter = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
+    assert state["cancelled"]
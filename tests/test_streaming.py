@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from api import recipe_client
+from api.partial_json import parse_partial_json
+from api.recipe_store import stable_recipe_id
+
+
+def test_partial_json_closes_open_containers():
+    assert parse_partial_json("") is None
+    assert parse_partial_json("{") == {}
+    assert parse_partial_json('{"recipes": [{"title": "Egg Fried Rice"}, {"ti') == {"recipes": [{"title": "Egg Fried Rice"}, {}]}
+
+
+def test_partial_json_keeps_a_string_being_written_but_not_a_number():
+    # The number may still have digits to come, the string is shown as far as it goes
+    assert parse_partial_json('{"top": {"title": "Egg Fr') == {"top": {"title": "Egg Fr"}}
+    assert parse_partial_json('{"top": {"title": "Egg", "uses": 1') == {"top": {"title": "Egg"}}
+    assert parse_partial_json('{"a": "say \\"hi') == {"a": 'say "hi'}
+
+
+def test_partial_json_of_every_prefix_never_raises():
+    text = json.dumps({"top": {"title": "Tofu Stir Fry", "uses": 2, "missing": ["soy sauce"],
+                               "instructions": "Fry the tofu.\nAdd the sauce."},
+                       "recipes": [{"title": "Tofu Soup", "uses": 1, "missing": []}]})
+    for end in range(len(text)):
+        parse_partial_json(text[:end])
+    assert parse_partial_json(text) == json.loads(text)
+
+
+def store(result, ingredients="tofu,rice"):
+    return asyncio.run(recipe_client._store_streamed_result((ingredients, 5), result))
+
+
+def test_streamed_instructions_are_stored_for_the_top_recipe():
+    final = store({"top": {"title": "Tofu Rice Bowl", "instructions": "Cook the rice."},
+                   "recipes": [{"title": "Tofu Soup"}]})
+    top_id = stable_recipe_id("Tofu Rice Bowl")
+    assert final["top"]["id"] == top_id
+    assert final["top"]["instructions"] == "Cook the rice."
+    assert recipe_client.recipe_store.get_detail(top_id)["instructions"] == "Cook the rice."
+
+
+def test_streamed_instructions_without_a_title_are_dropped():
+    final = store({"top": {"instructions": "Which dish is this?"}, "recipes": [{"title": "Plain Congee"}]},
+                  ingredients="rice")
+    assert final["top"]["title"] == "Plain Congee"
+    assert "instructions" not in final["top"]
+    assert recipe_client.recipe_store.get_detail(stable_recipe_id("Plain Congee")) is None